@@ -36,6 +36,7 @@ class NetworkConfig:
     retry_max_seconds: int = 300
     connect_timeout_seconds: int = 5
     read_timeout_seconds: int = 10
+    wire_format: str = "json"
 
     def timeout_seconds(self) -> int:
         return max(self.connect_timeout_seconds, self.read_timeout_seconds)
@@ -100,6 +101,8 @@ class AppConfig:
             raise ValueError("At least one sensor is required")
         if self.runtime.state_source not in {"device", "server"}:
             raise ValueError("runtime.state_source must be 'device' or 'server'")
+        if self.network.wire_format not in {"json", "packed"}:
+            raise ValueError("network.wire_format must be 'json' or 'packed'")
 
 
 def _load_device(data: Dict[str, Any]) -> DeviceConfig:
@@ -120,6 +123,7 @@ def _load_network(data: Dict[str, Any]) -> NetworkConfig:
         retry_max_seconds=int(data.get("retry_max_seconds", 300)),
         connect_timeout_seconds=int(data.get("connect_timeout_seconds", 5)),
         read_timeout_seconds=int(data.get("read_timeout_seconds", 10)),
+        wire_format=str(data.get("wire_format", "json")).lower(),
     )
 
 
@@ -11,7 +11,7 @@ from smart_inventory.config import AppConfig, load_config
 from smart_inventory.processing import SensorProcessor
 from smart_inventory.queue import ReadingQueue
 from smart_inventory.sensors import create_sensor
-from smart_inventory.transport import TransportError, post_readings_batch
+from smart_inventory.transport import TransportClient, TransportError
 
 
 class DeviceService:
@@ -30,6 +30,14 @@ class DeviceService:
         self._retry_delay = 1.0
         self._upload_thread: Optional[threading.Thread] = None
         self._sensor_meta: List[Dict[str, object]] = []
+        self._transport = TransportClient(
+            config.network.base_url,
+            api_token=config.network.api_token,
+            ca_cert_path=config.network.ca_cert_path,
+            connect_timeout_seconds=config.network.connect_timeout_seconds,
+            read_timeout_seconds=config.network.read_timeout_seconds,
+            wire_format=config.network.wire_format,
+        )
 
         for sensor_cfg in config.sensors:
             try:
@@ -99,6 +107,7 @@ class DeviceService:
 
         if self._upload_thread:
             self._upload_thread.join(timeout=2.0)
+        self._transport.close()
         logging.info("Smart Inventory device service stopped")
 
     def _upload_loop(self) -> None:
@@ -134,17 +143,12 @@ class DeviceService:
             payload["sensor_meta"] = self._sensor_meta
 
         try:
-            response = post_readings_batch(
-                base_url=self._config.network.base_url,
-                payload=payload,
-                api_token=self._config.network.api_token,
-                ca_cert_path=self._config.network.ca_cert_path,
-                timeout_seconds=self._config.network.timeout_seconds(),
-            )
+            response = self._transport.post_readings_batch(payload)
         except TransportError as exc:
             logging.warning("Upload failed: %s", exc)
             self._schedule_retry(now)
             return
+        logging.debug("Upload timings: %s", self._transport.stats()["last_upload"])
 
         ack_seq = response.get("ack_seq_id")
         if ack_seq is None and batch:
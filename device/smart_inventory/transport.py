@@ -1,41 +1,188 @@
+import http.client
 import json
+import socket
 import ssl
-import urllib.error
-import urllib.request
-from typing import Any, Dict, Optional
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Optional, Tuple
+
+from smart_inventory.wire import PACKED_CONTENT_TYPE, encode_packed_batch
+
+_USER_AGENT = "smart-inventory-device/0.1.0"
 
 
 class TransportError(RuntimeError):
     pass
 
 
+def _encode_payload(payload: Dict[str, Any], wire_format: str) -> Tuple[str, bytes, str]:
+    if wire_format == "packed":
+        try:
+            return "/packed", encode_packed_batch(payload), PACKED_CONTENT_TYPE
+        except (KeyError, ValueError) as exc:
+            raise TransportError(f"Unable to encode packed batch: {exc}") from exc
+    return "", json.dumps(payload).encode("utf-8"), "application/json"
+
+
+def _decode_response(body: bytes) -> Dict[str, Any]:
+    if not body:
+        return {}
+    try:
+        return json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise TransportError("Invalid JSON response") from exc
+
+
+class TransportClient:
+    def __init__(
+        self,
+        base_url: str,
+        api_token: Optional[str] = None,
+        ca_cert_path: Optional[str] = None,
+        connect_timeout_seconds: float = 5,
+        read_timeout_seconds: float = 10,
+        wire_format: str = "json",
+    ) -> None:
+        parsed = urllib.parse.urlsplit(base_url)
+        if parsed.scheme not in {"http", "https"} or not parsed.hostname:
+            raise ValueError(f"Unsupported base_url: {base_url}")
+        self._host = parsed.hostname
+        self._port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self._path = parsed.path.rstrip("/") + "/api/v1/readings/batch"
+        self._api_token = api_token
+        self._connect_timeout = connect_timeout_seconds
+        self._read_timeout = read_timeout_seconds
+        self._wire_format = wire_format
+        self._context: Optional[ssl.SSLContext] = None
+        if parsed.scheme == "https":
+            self._context = (
+                ssl.create_default_context(cafile=ca_cert_path)
+                if ca_cert_path
+                else ssl.create_default_context()
+            )
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._tls_session: Optional[ssl.SSLSession] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "uploads": 0,
+            "failures": 0,
+            "connections": 0,
+            "tls_resumed": 0,
+            "last_upload": None,
+        }
+
+    def post_readings_batch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        suffix, data, content_type = _encode_payload(payload, self._wire_format)
+        headers = {
+            "Content-Type": content_type,
+            "User-Agent": _USER_AGENT,
+        }
+        if self._api_token:
+            headers["Authorization"] = f"Bearer {self._api_token}"
+
+        with self._lock:
+            timings = {"connect_ms": 0.0, "handshake_ms": 0.0, "request_ms": 0.0}
+            try:
+                status, reason, body = self._send(self._path + suffix, data, headers, timings)
+            except (OSError, http.client.HTTPException) as exc:
+                self._close_connection()
+                self._stats["failures"] += 1
+                raise TransportError(str(exc) or exc.__class__.__name__) from exc
+            self._stats["last_upload"] = {
+                key: round(value, 3) for key, value in timings.items()
+            }
+            if status >= 400:
+                self._stats["failures"] += 1
+                raise TransportError(f"HTTP Error {status}: {reason}")
+            self._stats["uploads"] += 1
+        return _decode_response(body)
+
+    def _send(
+        self, path: str, data: bytes, headers: Dict[str, str], timings: Dict[str, float]
+    ) -> Tuple[int, str, bytes]:
+        reused = self._conn is not None
+        conn = self._conn or self._open_connection(timings)
+        started = time.perf_counter()
+        try:
+            conn.request("POST", path, body=data, headers=headers)
+            response = conn.getresponse()
+        except (ConnectionError, http.client.RemoteDisconnected, http.client.BadStatusLine):
+            if not reused:
+                raise
+            # The server dropped the idle keep-alive connection. Readings are
+            # deduplicated server-side, so resending the batch is safe.
+            self._close_connection()
+            conn = self._open_connection(timings)
+            started = time.perf_counter()
+            conn.request("POST", path, body=data, headers=headers)
+            response = conn.getresponse()
+        body = response.read()
+        timings["request_ms"] = (time.perf_counter() - started) * 1000.0
+        if response.will_close:
+            self._close_connection()
+        return response.status, response.reason, body
+
+    def _open_connection(self, timings: Dict[str, float]) -> http.client.HTTPConnection:
+        started = time.perf_counter()
+        sock = socket.create_connection((self._host, self._port), timeout=self._connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected = time.perf_counter()
+        timings["connect_ms"] = (connected - started) * 1000.0
+        if self._context is not None:
+            try:
+                sock = self._context.wrap_socket(
+                    sock, server_hostname=self._host, session=self._tls_session
+                )
+            except OSError:
+                sock.close()
+                raise
+            timings["handshake_ms"] = (time.perf_counter() - connected) * 1000.0
+            if sock.session_reused:
+                self._stats["tls_resumed"] += 1
+            self._tls_session = sock.session
+        sock.settimeout(self._read_timeout)
+        conn = http.client.HTTPConnection(self._host, self._port)
+        conn.sock = sock
+        self._conn = conn
+        self._stats["connections"] += 1
+        return conn
+
+    def _close_connection(self) -> None:
+        if self._conn is not None:
+            # TLS 1.3 tickets arrive after the handshake; keep the latest one.
+            sock = self._conn.sock
+            if isinstance(sock, ssl.SSLSocket) and sock.session is not None:
+                self._tls_session = sock.session
+            self._conn.close()
+            self._conn = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_connection()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+
 def post_readings_batch(
     base_url: str,
     payload: Dict[str, Any],
     api_token: Optional[str] = None,
     ca_cert_path: Optional[str] = None,
     timeout_seconds: int = 10,
+    wire_format: str = "json",
 ) -> Dict[str, Any]:
-    url = base_url.rstrip("/") + "/api/v1/readings/batch"
-    data = json.dumps(payload).encode("utf-8")
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": "smart-inventory-device/0.1.0",
-    }
-    if api_token:
-        headers["Authorization"] = f"Bearer {api_token}"
-
-    context = ssl.create_default_context(cafile=ca_cert_path) if ca_cert_path else ssl.create_default_context()
-    request = urllib.request.Request(url, data=data, headers=headers, method="POST")
-    try:
-        with urllib.request.urlopen(request, timeout=timeout_seconds, context=context) as response:
-            body = response.read().decode("utf-8")
-    except urllib.error.URLError as exc:
-        raise TransportError(str(exc)) from exc
-
-    if not body:
-        return {}
+    client = TransportClient(
+        base_url,
+        api_token=api_token,
+        ca_cert_path=ca_cert_path,
+        connect_timeout_seconds=timeout_seconds,
+        read_timeout_seconds=timeout_seconds,
+        wire_format=wire_format,
+    )
     try:
-        return json.loads(body)
-    except json.JSONDecodeError as exc:
-        raise TransportError("Invalid JSON response") from exc
+        return client.post_readings_batch(payload)
+    finally:
+        client.close()
@@ -0,0 +1,119 @@
+import datetime as dt
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PACKED_CONTENT_TYPE = "application/x-inventory-batch"
+
+_MAGIC = b"SIB1"
+_NULL_STRING = 0xFFFF
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+_INT_RANGES = (
+    ("b", -(1 << 7), (1 << 7) - 1),
+    ("h", -(1 << 15), (1 << 15) - 1),
+    ("i", -(1 << 31), (1 << 31) - 1),
+    ("q", -(1 << 63), (1 << 63) - 1),
+)
+
+
+def ts_to_micros(value: str) -> int:
+    normalized = value.strip()
+    if normalized.endswith("Z"):
+        normalized = normalized[:-1] + "+00:00"
+    parsed = dt.datetime.fromisoformat(normalized)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pack_string(value: Optional[str]) -> bytes:
+    if value is None:
+        return struct.pack("<H", _NULL_STRING)
+    encoded = value.encode("utf-8")
+    if len(encoded) >= _NULL_STRING:
+        raise ValueError("String too long for packed batch")
+    return struct.pack("<H", len(encoded)) + encoded
+
+
+def _pack_strings(values: Sequence[str]) -> bytes:
+    return struct.pack("<H", len(values)) + b"".join(_pack_string(value) for value in values)
+
+
+def _pack_ints(values: Sequence[int]) -> bytes:
+    low = min(values, default=0)
+    high = max(values, default=0)
+    for typecode, type_low, type_high in _INT_RANGES:
+        if type_low <= low and high <= type_high:
+            break
+    else:
+        raise ValueError("Integer out of range for packed batch")
+    return typecode.encode("ascii") + _little_endian(array(typecode, values))
+
+
+def _pack_floats(values: Sequence[Optional[float]]) -> bytes:
+    present = [float(value) for value in values if value is not None]
+    if not present:
+        return b"n"
+    single = array("f", present)
+    kind = "f" if list(single) == present else "d"
+    packed = single if kind == "f" else array("d", present)
+    if len(present) == len(values):
+        return kind.encode("ascii") + _little_endian(packed)
+    bitmap = bytearray((len(values) + 7) // 8)
+    for index, value in enumerate(values):
+        if value is not None:
+            bitmap[index >> 3] |= 1 << (index & 7)
+    return kind.upper().encode("ascii") + bytes(bitmap) + _little_endian(packed)
+
+
+def _deltas(values: Sequence[int]) -> List[int]:
+    return [current - previous for previous, current in zip(values, values[1:])]
+
+
+def _index(values: Iterable[str]) -> Tuple[List[str], List[int]]:
+    lookup: Dict[str, int] = {}
+    indexes = [lookup.setdefault(value, len(lookup)) for value in values]
+    return list(lookup), indexes
+
+
+def encode_packed_batch(payload: Dict[str, Any]) -> bytes:
+    readings = payload.get("readings") or []
+    sensor_meta = payload.get("sensor_meta")
+    seq_ids = [int(reading["seq_id"]) for reading in readings]
+    timestamps = [ts_to_micros(reading["ts"]) for reading in readings]
+    sensors, sensor_index = _index(reading["sensor_id"] for reading in readings)
+    states, state_index = _index(reading["state"] for reading in readings)
+
+    parts = [
+        _MAGIC,
+        _pack_string(payload["device_id"]),
+        _pack_string(payload.get("firmware")),
+        _pack_string(payload.get("sent_at")),
+        _pack_string(json.dumps(sensor_meta) if sensor_meta is not None else None),
+        struct.pack("<I", len(readings)),
+        _pack_strings(sensors),
+        _pack_strings(states),
+    ]
+    if readings:
+        parts.extend(
+            [
+                struct.pack("<qq", seq_ids[0], timestamps[0]),
+                _pack_ints(_deltas(seq_ids)),
+                _pack_ints(_deltas(timestamps)),
+                _pack_ints(sensor_index),
+                _pack_ints(state_index),
+                _pack_floats([reading.get("raw_value") for reading in readings]),
+                _pack_floats([reading.get("normalized_value") for reading in readings]),
+            ]
+        )
+    return b"".join(parts)
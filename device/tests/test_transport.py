@@ -0,0 +1,104 @@
+import json
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEVICE_ROOT = Path(__file__).resolve().parents[1]
+if str(DEVICE_ROOT) not in sys.path:
+    sys.path.insert(0, str(DEVICE_ROOT))
+
+from smart_inventory.transport import TransportClient, TransportError  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        server.requests.append((self.path, self.client_address[1], body))
+        if server.fail_next:
+            server.fail_next = False
+            self.send_error(503)
+            return
+        payload = json.dumps({"ack_seq_id": len(server.requests)}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if server.close_after:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *_args) -> None:
+        pass
+
+
+class TestTransportClient(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = []
+        self.server.fail_next = False
+        self.server.close_after = False
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self.thread.start()
+        host, port = self.server.server_address
+        self.client = TransportClient(f"http://{host}:{port}/", api_token="token")
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_connection(self) -> None:
+        first = self.client.post_readings_batch({"device_id": "dev", "readings": []})
+        second = self.client.post_readings_batch({"device_id": "dev", "readings": []})
+
+        self.assertEqual(first, {"ack_seq_id": 1})
+        self.assertEqual(second, {"ack_seq_id": 2})
+        self.assertEqual(self.server.requests[0][0], "/api/v1/readings/batch")
+        self.assertEqual(self.server.requests[0][1], self.server.requests[1][1])
+        stats = self.client.stats()
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["uploads"], 2)
+        self.assertEqual(stats["last_upload"]["connect_ms"], 0.0)
+
+    def test_reconnects_after_server_closes(self) -> None:
+        self.server.close_after = True
+        self.client.post_readings_batch({"device_id": "dev", "readings": []})
+        self.server.close_after = False
+        self.client.post_readings_batch({"device_id": "dev", "readings": []})
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.client.stats()["connections"], 2)
+
+    def test_http_error_raises(self) -> None:
+        self.server.fail_next = True
+        with self.assertRaises(TransportError):
+            self.client.post_readings_batch({"device_id": "dev", "readings": []})
+
+        response = self.client.post_readings_batch({"device_id": "dev", "readings": []})
+        self.assertEqual(response, {"ack_seq_id": 2})
+        self.assertEqual(self.client.stats()["failures"], 1)
+
+    def test_packed_format_uses_packed_endpoint(self) -> None:
+        host, port = self.server.server_address
+        client = TransportClient(f"http://{host}:{port}", wire_format="packed")
+        try:
+            client.post_readings_batch({"device_id": "dev", "readings": []})
+        finally:
+            client.close()
+
+        path, _, body = self.server.requests[0]
+        self.assertEqual(path, "/api/v1/readings/batch/packed")
+        self.assertTrue(body.startswith(b"SIB1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import datetime as dt
+import json
+import struct
+import sys
+import unittest
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEVICE_ROOT = Path(__file__).resolve().parents[1]
+if str(DEVICE_ROOT) not in sys.path:
+    sys.path.insert(0, str(DEVICE_ROOT))
+
+from smart_inventory.wire import encode_packed_batch  # noqa: E402
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+# A decoder for round-trip checks only; the server's app/wire.py is the one
+# that validates uploads.
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def take(self, size: int) -> memoryview:
+        end = self._offset + size
+        if end > len(self._data):
+            raise ValueError("Truncated packed batch")
+        chunk = self._data[self._offset : end]
+        self._offset = end
+        return chunk
+
+    def unpack(self, fmt: str) -> Tuple[Any, ...]:
+        return struct.unpack(fmt, self.take(struct.calcsize(fmt)))
+
+    def string(self) -> Optional[str]:
+        (length,) = self.unpack("<H")
+        if length == 0xFFFF:
+            return None
+        return bytes(self.take(length)).decode("utf-8")
+
+    def strings(self) -> List[str]:
+        (count,) = self.unpack("<H")
+        return [self.string() or "" for _ in range(count)]
+
+    def array(self, typecode: str, count: int) -> array:
+        values = array(typecode)
+        values.frombytes(self.take(values.itemsize * count))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def ints(self, count: int) -> array:
+        return self.array(bytes(self.take(1)).decode("ascii"), count)
+
+    def floats(self, count: int) -> List[Optional[float]]:
+        kind = bytes(self.take(1)).decode("ascii")
+        if kind == "n":
+            return [None] * count
+        present = [True] * count
+        if kind.isupper():
+            bitmap = self.take((count + 7) // 8)
+            present = [bool(bitmap[index >> 3] & (1 << (index & 7))) for index in range(count)]
+        values = iter(self.array(kind.lower(), sum(present)))
+        return [next(values) if flag else None for flag in present]
+
+
+def _running_sum(first: int, deltas: Iterable[int]) -> List[int]:
+    values = [first]
+    for delta in deltas:
+        first += delta
+        values.append(first)
+    return values
+
+
+def decode_packed_batch(data: bytes) -> Dict[str, Any]:
+    reader = _Reader(data)
+    if bytes(reader.take(4)) != b"SIB1":
+        raise ValueError("Unsupported packed batch version")
+    payload: Dict[str, Any] = {
+        "device_id": reader.string(),
+        "firmware": reader.string(),
+        "sent_at": reader.string(),
+    }
+    sensor_meta = reader.string()
+    (count,) = reader.unpack("<I")
+    sensors = reader.strings()
+    states = reader.strings()
+    readings: List[Dict[str, Any]] = []
+    if count:
+        first_seq, first_ts = reader.unpack("<qq")
+        seq_ids = _running_sum(first_seq, reader.ints(count - 1))
+        timestamps = _running_sum(first_ts, reader.ints(count - 1))
+        sensor_index = reader.ints(count)
+        state_index = reader.ints(count)
+        raw_values = reader.floats(count)
+        normalized_values = reader.floats(count)
+        readings = [
+            {
+                "seq_id": seq_ids[index],
+                "sensor_id": sensors[sensor_index[index]],
+                "ts": (_EPOCH + dt.timedelta(microseconds=timestamps[index])).isoformat(),
+                "raw_value": raw_values[index],
+                "normalized_value": normalized_values[index],
+                "state": states[state_index[index]],
+            }
+            for index in range(count)
+        ]
+    payload["readings"] = readings
+    if sensor_meta is not None:
+        payload["sensor_meta"] = json.loads(sensor_meta)
+    return payload
+
+
+def _payload(count: int) -> dict:
+    readings = []
+    for index in range(count):
+        readings.append(
+            {
+                "seq_id": 1000 + index,
+                "sensor_id": f"loadcell-{index % 3:02d}",
+                "ts": f"2026-01-17T00:{index // 60:02d}:{index % 60:02d}.250000+00:00",
+                "raw_value": float(8423912 + index),
+                "normalized_value": 180.25 - index * 0.1,
+                "state": "ok" if index % 5 else "low",
+            }
+        )
+    return {
+        "device_id": "pi-kitchen-01",
+        "firmware": "0.1.0",
+        "sent_at": "2026-01-17T01:00:00+00:00",
+        "readings": readings,
+        "sensor_meta": [{"sensor_id": "loadcell-00", "thresholds": {"low": 150, "ok": 200}}],
+    }
+
+
+class TestPackedBatch(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        payload = _payload(50)
+
+        decoded = decode_packed_batch(encode_packed_batch(payload))
+
+        self.assertEqual(decoded, payload)
+
+    def test_missing_values_and_empty_batch(self) -> None:
+        payload = _payload(10)
+        payload["readings"][3]["raw_value"] = None
+        for reading in payload["readings"]:
+            reading["normalized_value"] = None
+        payload["firmware"] = None
+        del payload["sensor_meta"]
+
+        self.assertEqual(decode_packed_batch(encode_packed_batch(payload)), payload)
+
+        empty = {"device_id": "pi-kitchen-01", "firmware": None, "sent_at": None, "readings": []}
+        self.assertEqual(decode_packed_batch(encode_packed_batch(empty)), empty)
+
+    def test_normalizes_timestamps_to_utc(self) -> None:
+        payload = _payload(2)
+        payload["readings"][0]["ts"] = "2026-01-17T02:00:00+02:00"
+        payload["readings"][1]["ts"] = "2026-01-17T00:00:01Z"
+
+        decoded = decode_packed_batch(encode_packed_batch(payload))
+
+        self.assertEqual(
+            [reading["ts"] for reading in decoded["readings"]],
+            ["2026-01-17T00:00:00+00:00", "2026-01-17T00:00:01+00:00"],
+        )
+
+    def test_smaller_than_json(self) -> None:
+        payload = _payload(100)
+
+        packed = encode_packed_batch(payload)
+
+        self.assertLess(len(packed) * 4, len(json.dumps(payload).encode("utf-8")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+import dataclasses
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .db import loads_json
+
+_SQL_CHUNK_SIZE = 500
+
+
+@dataclass
+class ItemMetadata:
+    id: str
+    sensor_id: Optional[str]
+    name: str
+    thresholds: Optional[Dict[str, float]]
+    unit: Optional[str]
+    image_url: Optional[str]
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+
+@dataclass
+class SensorMetadata:
+    sensor_id: str
+    device_id: Optional[str]
+    type: Optional[str]
+    thresholds: Optional[Dict[str, float]]
+    state_map: Optional[Dict[str, str]]
+    last_state: Optional[str]
+    last_value: Optional[float]
+    last_update: Optional[int]
+    item: Optional[ItemMetadata] = None
+
+    def effective_thresholds(self) -> Optional[Dict[str, float]]:
+        if self.item and self.item.thresholds is not None:
+            return self.item.thresholds
+        return self.thresholds
+
+
+def _item_from_row(row: Any) -> ItemMetadata:
+    return ItemMetadata(
+        id=row["id"],
+        sensor_id=row["sensor_id"],
+        name=row["name"],
+        thresholds=loads_json(row["thresholds"]),
+        unit=row["unit"],
+        image_url=row["image_url"],
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+    )
+
+
+def load_items(conn, item_ids: Optional[Sequence[str]] = None) -> List[ItemMetadata]:
+    query = """
+        SELECT id, sensor_id, name, thresholds, unit, image_url, created_at, updated_at
+        FROM items
+    """
+    if item_ids is None:
+        rows = conn.execute(query + " ORDER BY name ASC;").fetchall()
+        return [_item_from_row(row) for row in rows]
+    items: List[ItemMetadata] = []
+    for start in range(0, len(item_ids), _SQL_CHUNK_SIZE):
+        params = list(item_ids[start : start + _SQL_CHUNK_SIZE])
+        sql = query + f" WHERE id IN ({', '.join('?' for _ in params)});"
+        items.extend(_item_from_row(row) for row in conn.execute(sql, params).fetchall())
+    items.sort(key=lambda item: item.name)
+    return items
+
+
+def load_sensor_metadata(
+    conn, sensor_ids: Optional[Sequence[str]] = None
+) -> Dict[str, SensorMetadata]:
+    query = """
+        SELECT sensors.id, sensors.device_id, sensors.type, sensors.thresholds,
+               sensors.state_map, sensors.last_state, sensors.last_value,
+               sensors.last_update,
+               items.id AS item_id, items.name AS item_name,
+               items.thresholds AS item_thresholds, items.unit AS item_unit,
+               items.image_url AS item_image_url,
+               items.created_at AS item_created_at,
+               items.updated_at AS item_updated_at
+        FROM sensors
+        LEFT JOIN items ON items.sensor_id = sensors.id
+    """
+    if sensor_ids is None:
+        batches: List[List[Any]] = [[]]
+    else:
+        batches = [
+            list(sensor_ids[start : start + _SQL_CHUNK_SIZE])
+            for start in range(0, len(sensor_ids), _SQL_CHUNK_SIZE)
+        ]
+    metadata: Dict[str, SensorMetadata] = {}
+    for params in batches:
+        sql = query
+        if sensor_ids is not None:
+            sql += f" WHERE sensors.id IN ({', '.join('?' for _ in params)})"
+        for row in conn.execute(sql + " ORDER BY sensors.id;", params).fetchall():
+            if row["id"] in metadata:
+                continue
+            item = None
+            if row["item_id"] is not None:
+                item = ItemMetadata(
+                    id=row["item_id"],
+                    sensor_id=row["id"],
+                    name=row["item_name"],
+                    thresholds=loads_json(row["item_thresholds"]),
+                    unit=row["item_unit"],
+                    image_url=row["item_image_url"],
+                    created_at=row["item_created_at"],
+                    updated_at=row["item_updated_at"],
+                )
+            metadata[row["id"]] = SensorMetadata(
+                sensor_id=row["id"],
+                device_id=row["device_id"],
+                type=row["type"],
+                thresholds=loads_json(row["thresholds"]),
+                state_map=loads_json(row["state_map"]),
+                last_state=row["last_state"],
+                last_value=row["last_value"],
+                last_update=row["last_update"],
+                item=item,
+            )
+    return metadata
+
+
+class MetadataCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sensors: Dict[str, SensorMetadata] = {}
+        self._sensors_complete = False
+        self._items: Optional[List[ItemMetadata]] = None
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self.write_lock = threading.RLock()
+
+    def get_sensors(
+        self, conn, sensor_ids: Sequence[str]
+    ) -> Dict[str, SensorMetadata]:
+        with self._lock:
+            found = {
+                sensor_id: self._sensors[sensor_id]
+                for sensor_id in sensor_ids
+                if sensor_id in self._sensors
+            }
+            missing = [sensor_id for sensor_id in sensor_ids if sensor_id not in found]
+            self._hits += len(found)
+            self._misses += len(missing)
+            generation = self._generation
+        if missing:
+            loaded = load_sensor_metadata(conn, missing)
+            with self._lock:
+                if generation == self._generation:
+                    self._sensors.update(loaded)
+            found.update(loaded)
+        return {sensor_id: dataclasses.replace(meta) for sensor_id, meta in found.items()}
+
+    def all_sensors(self, conn) -> List[SensorMetadata]:
+        with self._lock:
+            if self._sensors_complete:
+                self._hits += 1
+                return sorted(self._sensors.values(), key=lambda meta: meta.sensor_id)
+            self._misses += 1
+            generation = self._generation
+        loaded = load_sensor_metadata(conn)
+        with self._lock:
+            if generation == self._generation:
+                self._sensors = dict(loaded)
+                self._sensors_complete = True
+        return list(loaded.values())
+
+    def all_items(self, conn) -> List[ItemMetadata]:
+        with self._lock:
+            if self._items is not None:
+                self._hits += 1
+                return list(self._items)
+            self._misses += 1
+            generation = self._generation
+        loaded = load_items(conn)
+        with self._lock:
+            if generation == self._generation:
+                self._items = loaded
+        return list(loaded)
+
+    def store_sensors(self, entries: Iterable[SensorMetadata]) -> None:
+        with self._lock:
+            for meta in entries:
+                self._sensors[meta.sensor_id] = meta
+            self._generation += 1
+
+    def invalidate(self, sensor_ids: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            if sensor_ids is None:
+                self._sensors.clear()
+                self._items = None
+            else:
+                for sensor_id in sensor_ids:
+                    self._sensors.pop(sensor_id, None)
+            self._sensors_complete = False
+            self._generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "sensors": len(self._sensors),
+                "items": len(self._items) if self._items is not None else 0,
+            }
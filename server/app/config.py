@@ -21,12 +21,29 @@ class AppConfig:
     device_tokens: List[str]
     ui_token: Optional[str]
     allow_unauth: bool
-    event_queue_size: int
+    event_log_size: int
+    event_bus: str
+    event_poll_interval_ms: int
     event_retention_seconds: int
     event_max_rows: int
     event_replay_limit: int
+    event_prune_interval_seconds: int
     history_limit: int
+    page_limit: int
     cors_origins: List[str]
+    db_reader_count: int
+    db_busy_timeout_ms: int
+    db_synchronous: str
+    db_mmap_size: int
+    db_cache_size: int
+    ingest_mode: str
+    ingest_commit_window_ms: int
+    ingest_group_max_readings: int
+    ingest_workers: int
+    readings_retention_days: int
+    rollup_interval_seconds: int
+    rollup_chunk_size: int
+    recent_readings: int
 
 
 def load_config() -> AppConfig:
@@ -35,12 +52,41 @@ def load_config() -> AppConfig:
         device_tokens=_parse_list(os.getenv("INVENTORY_DEVICE_TOKENS")),
         ui_token=os.getenv("INVENTORY_UI_TOKEN"),
         allow_unauth=_parse_bool(os.getenv("INVENTORY_ALLOW_UNAUTH"), default=False),
-        event_queue_size=int(os.getenv("INVENTORY_EVENT_QUEUE_SIZE", "100")),
+        # INVENTORY_EVENT_QUEUE_SIZE is the name from before the shared event log.
+        event_log_size=int(
+            os.getenv("INVENTORY_EVENT_LOG_SIZE")
+            or os.getenv("INVENTORY_EVENT_QUEUE_SIZE", "1024")
+        ),
+        event_bus=os.getenv("INVENTORY_EVENT_BUS", "local").strip().lower(),
+        event_poll_interval_ms=int(os.getenv("INVENTORY_EVENT_POLL_INTERVAL_MS", "100")),
         event_retention_seconds=int(
             os.getenv("INVENTORY_EVENT_RETENTION_SECONDS", "604800")
         ),
         event_max_rows=int(os.getenv("INVENTORY_EVENT_MAX_ROWS", "10000")),
         event_replay_limit=int(os.getenv("INVENTORY_EVENT_REPLAY_LIMIT", "500")),
+        event_prune_interval_seconds=int(
+            os.getenv("INVENTORY_EVENT_PRUNE_INTERVAL_SECONDS", "60")
+        ),
         history_limit=int(os.getenv("INVENTORY_HISTORY_LIMIT", "2000")),
+        page_limit=int(os.getenv("INVENTORY_PAGE_LIMIT", "500")),
         cors_origins=_parse_list(os.getenv("INVENTORY_CORS_ORIGINS")),
+        db_reader_count=int(os.getenv("INVENTORY_DB_READER_COUNT", "4")),
+        db_busy_timeout_ms=int(os.getenv("INVENTORY_DB_BUSY_TIMEOUT_MS", "5000")),
+        db_synchronous=os.getenv("INVENTORY_DB_SYNCHRONOUS", "NORMAL").upper(),
+        db_mmap_size=int(os.getenv("INVENTORY_DB_MMAP_SIZE", "67108864")),
+        db_cache_size=int(os.getenv("INVENTORY_DB_CACHE_SIZE", "-8000")),
+        ingest_mode=os.getenv("INVENTORY_INGEST_MODE", "direct").strip().lower(),
+        ingest_commit_window_ms=int(
+            os.getenv("INVENTORY_INGEST_COMMIT_WINDOW_MS", "20")
+        ),
+        ingest_group_max_readings=int(
+            os.getenv("INVENTORY_INGEST_GROUP_MAX_READINGS", "5000")
+        ),
+        ingest_workers=int(os.getenv("INVENTORY_INGEST_WORKERS", str(os.cpu_count() or 1))),
+        readings_retention_days=int(
+            os.getenv("INVENTORY_READINGS_RETENTION_DAYS", "0")
+        ),
+        rollup_interval_seconds=int(os.getenv("INVENTORY_ROLLUP_INTERVAL_SECONDS", "60")),
+        rollup_chunk_size=int(os.getenv("INVENTORY_ROLLUP_CHUNK_SIZE", "5000")),
+        recent_readings=int(os.getenv("INVENTORY_RECENT_READINGS", "256")),
     )
@@ -1,11 +1,28 @@
-import datetime as dt
 import json
+import logging
 import os
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from typing import Any, Dict, Iterator, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
 
 from .config import AppConfig
+from .events import (
+    EventDraft,
+    EventFilter,
+    EventFrame,
+    draft_event,
+    encode_frame,
+    frame_from_draft,
+)
+from .timestamps import MICROS_PER_SECOND, coerce_micros
 
 
 def _ensure_directory(db_path: str) -> None:
@@ -14,6 +31,9 @@ def _ensure_directory(db_path: str) -> None:
         os.makedirs(directory, exist_ok=True)
 
 
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
 def _connect(db_path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
@@ -21,6 +41,152 @@ def _connect(db_path: str) -> sqlite3.Connection:
     return conn
 
 
+def _connect_tuned(config: AppConfig, read_only: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        config.db_path,
+        timeout=max(0, config.db_busy_timeout_ms) / 1000.0,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    synchronous = config.db_synchronous
+    if synchronous not in _SYNCHRONOUS_MODES:
+        synchronous = "NORMAL"
+    conn.execute(f"PRAGMA busy_timeout = {int(config.db_busy_timeout_ms)};")
+    if not read_only:
+        conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute(f"PRAGMA synchronous = {synchronous};")
+    conn.execute(f"PRAGMA mmap_size = {int(config.db_mmap_size)};")
+    conn.execute(f"PRAGMA cache_size = {int(config.db_cache_size)};")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+
+class _WaitStats:
+    def __init__(self) -> None:
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float) -> None:
+        self.acquired += 1
+        self.total_wait += waited
+        if waited > self.max_wait:
+            self.max_wait = waited
+
+    def snapshot(self) -> Dict[str, float]:
+        average = self.total_wait / self.acquired if self.acquired else 0.0
+        return {
+            "acquired": self.acquired,
+            "wait_ms_total": round(self.total_wait * 1000.0, 3),
+            "wait_ms_avg": round(average * 1000.0, 3),
+            "wait_ms_max": round(self.max_wait * 1000.0, 3),
+        }
+
+
+class ConnectionPool:
+    def __init__(self, config: AppConfig) -> None:
+        self._config = config
+        self._size = max(1, config.db_reader_count)
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all_readers: List[sqlite3.Connection] = []
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reader_stats = _WaitStats()
+        self._writer_stats = _WaitStats()
+        self._prepared = False
+
+    def _prepare(self) -> None:
+        if not self._prepared:
+            _ensure_directory(self._config.db_path)
+            self._prepared = True
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._stats_lock:
+            can_open = len(self._all_readers) < self._size
+            if can_open:
+                self._prepare()
+                conn = _connect_tuned(self._config, read_only=True)
+                self._all_readers.append(conn)
+        if can_open:
+            return conn
+        return self._readers.get()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        started = time.perf_counter()
+        conn = self._acquire_reader()
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._reader_stats.record(waited)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def detached_reader(self) -> Iterator[sqlite3.Connection]:
+        # For long-running reads such as exports, which would otherwise hold
+        # one of the pooled readers for their whole duration.
+        self._prepare()
+        conn = _connect_tuned(self._config, read_only=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        started = time.perf_counter()
+        with self._writer_lock:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self._writer_stats.record(waited)
+            if self._writer is None:
+                self._prepare()
+                self._writer = _connect_tuned(self._config, read_only=False)
+            conn = self._writer
+            # Take the write lock up front so event ids read inside the
+            # transaction follow commit order across server processes.
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "readers_open": len(self._all_readers),
+                "readers_idle": self._readers.qsize(),
+                "reader_limit": self._size,
+                "reader": self._reader_stats.snapshot(),
+                "writer": self._writer_stats.snapshot(),
+            }
+
+    def close(self) -> None:
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._stats_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers = []
+            self._readers = queue.LifoQueue()
+
+
 def _table_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
     rows = conn.execute(f"PRAGMA table_info({table_name});").fetchall()
     return [row["name"] for row in rows]
@@ -38,6 +204,155 @@ def _unique_index_columns(conn: sqlite3.Connection, table_name: str) -> List[Lis
     return indexes
 
 
+_TABLE_SCHEMAS: Dict[str, str] = {
+    "devices": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id TEXT PRIMARY KEY,
+            name TEXT,
+            location TEXT,
+            firmware TEXT,
+            last_seen INTEGER
+        );
+    """,
+    "sensors": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id TEXT PRIMARY KEY,
+            device_id TEXT,
+            type TEXT,
+            thresholds TEXT,
+            state_map TEXT,
+            last_state TEXT,
+            last_value REAL,
+            last_update INTEGER,
+            FOREIGN KEY(device_id) REFERENCES devices(id)
+        );
+    """,
+    "items": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id TEXT PRIMARY KEY,
+            sensor_id TEXT,
+            name TEXT NOT NULL,
+            thresholds TEXT,
+            unit TEXT,
+            image_url TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+        );
+    """,
+    "readings": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device_id TEXT NOT NULL,
+            seq_id INTEGER,
+            sensor_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            raw_value REAL,
+            normalized_value REAL,
+            state TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            UNIQUE(device_id, sensor_id, seq_id, ts),
+            FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+        );
+    """,
+    "alerts": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id TEXT,
+            sensor_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at INTEGER NOT NULL,
+            resolved_at INTEGER,
+            FOREIGN KEY(item_id) REFERENCES items(id),
+            FOREIGN KEY(sensor_id) REFERENCES sensors(id)
+        );
+    """,
+    "events": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            frame BLOB,
+            item_id TEXT,
+            sensor_id TEXT,
+            device_id TEXT
+        );
+    """,
+    "maintenance_state": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        );
+    """,
+    "sync_rows": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            kind TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (kind, row_id)
+        ) WITHOUT ROWID;
+    """,
+    "rollup_cursors": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            sensor_id TEXT PRIMARY KEY,
+            ts INTEGER NOT NULL,
+            state TEXT NOT NULL
+        );
+    """,
+}
+
+for _tier in ("minute", "hour", "day"):
+    _TABLE_SCHEMAS[f"readings_rollup_{_tier}"] = """
+        CREATE TABLE IF NOT EXISTS {name} (
+            sensor_id TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            value_count INTEGER NOT NULL,
+            min_value REAL,
+            max_value REAL,
+            sum_value REAL,
+            last_ts INTEGER,
+            last_value REAL,
+            last_state TEXT,
+            state_durations TEXT,
+            PRIMARY KEY (sensor_id, bucket_start)
+        ) WITHOUT ROWID;
+    """
+
+# Columns holding epoch microseconds; older databases stored ISO-8601 text.
+_TIMESTAMP_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "devices": ("last_seen",),
+    "sensors": ("last_update",),
+    "readings": ("ts", "created_at"),
+    "alerts": ("created_at", "resolved_at"),
+    "events": ("created_at",),
+    "rollup_cursors": ("ts",),
+    "readings_rollup_minute": ("bucket_start", "last_ts"),
+    "readings_rollup_hour": ("bucket_start", "last_ts"),
+    "readings_rollup_day": ("bucket_start", "last_ts"),
+}
+
+
+SYNC_VERSION_KEY = "sync_version"
+
+# Tables whose rows are served by `since_version` delta sync, and the kind
+# their changes are recorded under in `sync_rows`.
+_SYNC_TABLES = {"items": "item", "sensors": "sensor"}
+
+
+def _create_table(conn: sqlite3.Connection, table: str, name: Optional[str] = None) -> None:
+    conn.execute(_TABLE_SCHEMAS[table].format(name=name or table))
+
+
+def _column_types(conn: sqlite3.Connection, table_name: str) -> Dict[str, str]:
+    rows = conn.execute(f"PRAGMA table_info({table_name});").fetchall()
+    return {row["name"]: (row["type"] or "").upper() for row in rows}
+
+
 def _needs_readings_migration(conn: sqlite3.Connection) -> bool:
     columns = _table_columns(conn, "readings")
     if "device_id" not in columns:
@@ -55,23 +370,7 @@ def _migrate_readings_table(conn: sqlite3.Connection) -> None:
         return
     conn.execute("PRAGMA foreign_keys = OFF;")
     conn.execute("ALTER TABLE readings RENAME TO readings_old;")
-    conn.execute(
-        """
-        CREATE TABLE readings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            device_id TEXT NOT NULL,
-            seq_id INTEGER,
-            sensor_id TEXT NOT NULL,
-            ts TEXT NOT NULL,
-            raw_value REAL,
-            normalized_value REAL,
-            state TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            UNIQUE(device_id, sensor_id, seq_id, ts),
-            FOREIGN KEY(sensor_id) REFERENCES sensors(id)
-        );
-        """
-    )
+    _create_table(conn, "readings")
     conn.execute(
         """
         INSERT INTO readings (id, device_id, seq_id, sensor_id, ts, raw_value, normalized_value, state, created_at)
@@ -79,22 +378,126 @@ def _migrate_readings_table(conn: sqlite3.Connection) -> None:
                COALESCE(s.device_id, 'unknown') AS device_id,
                r.seq_id,
                r.sensor_id,
-               r.ts,
+               to_micros(r.ts),
                r.raw_value,
                r.normalized_value,
                r.state,
-               r.created_at
+               to_micros(r.created_at)
         FROM readings_old r
         LEFT JOIN sensors s ON s.id = r.sensor_id;
         """
     )
     conn.execute("DROP TABLE readings_old;")
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = ON;")
+
+
+def _ensure_column(
+    conn: sqlite3.Connection, table: str, column: str, definition: str
+) -> None:
+    if column not in _table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+
+
+def _migrate_event_columns(conn: sqlite3.Connection) -> None:
+    for column, definition in (
+        ("frame", "BLOB"),
+        ("item_id", "TEXT"),
+        ("sensor_id", "TEXT"),
+        ("device_id", "TEXT"),
+    ):
+        _ensure_column(conn, "events", column, definition)
+    # Rows written before frames existed carry routing keys only in the payload.
     conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_readings_sensor_ts ON readings(sensor_id, ts);"
+        """
+        UPDATE events
+        SET item_id = json_extract(payload, '$.item_id'),
+            sensor_id = json_extract(payload, '$.sensor_id'),
+            device_id = (
+                SELECT sensors.device_id FROM sensors
+                WHERE sensors.id = json_extract(events.payload, '$.sensor_id')
+            )
+        WHERE frame IS NULL AND sensor_id IS NULL AND json_valid(payload);
+        """
     )
+
+
+def _needs_timestamp_migration(conn: sqlite3.Connection, table: str) -> bool:
+    types = _column_types(conn, table)
+    return any(types.get(column) != "INTEGER" for column in _TIMESTAMP_COLUMNS[table])
+
+
+def _migrate_timestamp_columns(conn: sqlite3.Connection) -> None:
+    pending = [
+        table for table in _TIMESTAMP_COLUMNS if _needs_timestamp_migration(conn, table)
+    ]
+    if not pending:
+        return
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    for table in pending:
+        logging.info("Converting %s timestamps to epoch microseconds", table)
+        converted = set(_TIMESTAMP_COLUMNS[table])
+        columns = _table_columns(conn, table)
+        sequence = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = ?;", (table,)
+        ).fetchone()
+        _create_table(conn, table, f"{table}_new")
+        select = ", ".join(
+            f"to_micros({column})" if column in converted else column
+            for column in columns
+        )
+        conn.execute(
+            f"INSERT INTO {table}_new ({', '.join(columns)}) SELECT {select} FROM {table};"
+        )
+        conn.execute(f"DROP TABLE {table};")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table};")
+        if sequence is not None:
+            # Keep AUTOINCREMENT ids monotonic so SSE clients can resume.
+            cursor = conn.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?;",
+                (sequence["seq"], table),
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?);",
+                    (table, sequence["seq"]),
+                )
+    conn.commit()
     conn.execute("PRAGMA foreign_keys = ON;")
 
 
+def _create_sync_triggers(conn: sqlite3.Connection) -> None:
+    # Triggers cover every write path, and since writers take the write lock
+    # up front, versions are assigned in commit order like event ids.
+    for table, kind in _SYNC_TABLES.items():
+        for operation, row, deleted in (
+            ("INSERT", "NEW", 0),
+            ("UPDATE", "NEW", 0),
+            ("DELETE", "OLD", 1),
+        ):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS sync_{table}_{operation.lower()}
+                AFTER {operation} ON {table}
+                BEGIN
+                    INSERT INTO maintenance_state (key, value)
+                    VALUES ('{SYNC_VERSION_KEY}', 1)
+                    ON CONFLICT(key) DO UPDATE SET value = value + 1;
+                    INSERT INTO sync_rows (kind, row_id, version, deleted)
+                    VALUES (
+                        '{kind}',
+                        {row}.id,
+                        (SELECT value FROM maintenance_state WHERE key = '{SYNC_VERSION_KEY}'),
+                        {deleted}
+                    )
+                    ON CONFLICT(kind, row_id) DO UPDATE
+                    SET version = excluded.version, deleted = excluded.deleted;
+                END;
+                """
+            )
+
+
 @contextmanager
 def get_db(config: AppConfig) -> Iterator[sqlite3.Connection]:
     _ensure_directory(config.db_path)
@@ -109,102 +512,56 @@ def get_db(config: AppConfig) -> Iterator[sqlite3.Connection]:
         conn.close()
 
 
+@contextmanager
+def _init_lock(db_path: str) -> Iterator[None]:
+    # Server workers start together; only one may run migrations at a time.
+    if fcntl is None:
+        yield
+        return
+    with open(f"{db_path}.init-lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
 def init_db(config: AppConfig) -> None:
-    with get_db(config) as conn:
+    _ensure_directory(config.db_path)
+    with _init_lock(config.db_path), get_db(config) as conn:
+        conn.create_function("to_micros", 1, coerce_micros, deterministic=True)
+        for table in ("devices", "sensors", "items", "readings", "alerts"):
+            _create_table(conn, table)
+        _migrate_readings_table(conn)
+        for table in _TABLE_SCHEMAS:
+            _create_table(conn, table)
+        _migrate_timestamp_columns(conn)
+        _migrate_event_columns(conn)
+        _create_sync_triggers(conn)
         cursor = conn.cursor()
         cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS devices (
-                id TEXT PRIMARY KEY,
-                name TEXT,
-                location TEXT,
-                firmware TEXT,
-                last_seen TEXT
-            );
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS sensors (
-                id TEXT PRIMARY KEY,
-                device_id TEXT,
-                type TEXT,
-                thresholds TEXT,
-                state_map TEXT,
-                last_state TEXT,
-                last_value REAL,
-                last_update TEXT,
-                FOREIGN KEY(device_id) REFERENCES devices(id)
-            );
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS items (
-                id TEXT PRIMARY KEY,
-                sensor_id TEXT,
-                name TEXT NOT NULL,
-                thresholds TEXT,
-                unit TEXT,
-                image_url TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                FOREIGN KEY(sensor_id) REFERENCES sensors(id)
-            );
-            """
+            "CREATE INDEX IF NOT EXISTS idx_readings_sensor_ts ON readings(sensor_id, ts);"
         )
+        # Retention deletes expired readings oldest first.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings(ts);")
         cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS readings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                device_id TEXT NOT NULL,
-                seq_id INTEGER,
-                sensor_id TEXT NOT NULL,
-                ts TEXT NOT NULL,
-                raw_value REAL,
-                normalized_value REAL,
-                state TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                UNIQUE(device_id, sensor_id, seq_id, ts),
-                FOREIGN KEY(sensor_id) REFERENCES sensors(id)
-            );
-            """
+            "CREATE INDEX IF NOT EXISTS idx_items_sensor_id ON items(sensor_id);"
         )
+        # Keyset pages walk (status, created_at, id); the rowid rides along in
+        # every index, so (sensor_id, ts) likewise serves (ts, id) cursors.
+        cursor.execute("DROP INDEX IF EXISTS idx_alerts_status;")
         cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_id TEXT,
-                sensor_id TEXT NOT NULL,
-                type TEXT NOT NULL,
-                status TEXT NOT NULL,
-                message TEXT,
-                created_at TEXT NOT NULL,
-                resolved_at TEXT,
-                FOREIGN KEY(item_id) REFERENCES items(id),
-                FOREIGN KEY(sensor_id) REFERENCES sensors(id)
-            );
-            """
+            "CREATE INDEX IF NOT EXISTS idx_alerts_status_created "
+            "ON alerts(status, created_at);"
         )
-        _migrate_readings_table(conn)
         cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                payload TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            );
-            """
+            "CREATE INDEX IF NOT EXISTS idx_alerts_sensor_status ON alerts(sensor_id, status);"
         )
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_readings_sensor_ts ON readings(sensor_id, ts);"
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts(status);"
+            "CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at);"
         )
         cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at);"
+            "CREATE INDEX IF NOT EXISTS idx_sync_rows_version ON sync_rows(kind, version);"
         )
 
 
@@ -220,57 +577,141 @@ def loads_json(value: Optional[str]) -> Optional[Dict[str, Any]]:
     return json.loads(value)
 
 
-def record_event(
-    conn: sqlite3.Connection, event: Dict[str, Any], created_at: str
-) -> int:
-    payload = dumps_json(event) or "{}"
-    event_type = event.get("type") or "unknown"
-    cursor = conn.execute(
+def _next_event_id(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
         """
-        INSERT INTO events (type, payload, created_at)
-        VALUES (?, ?, ?);
+        SELECT MAX(
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'events'), 0),
+            COALESCE((SELECT MAX(id) FROM events), 0)
+        ) AS id;
+        """
+    ).fetchone()
+    return int(row["id"]) + 1
+
+
+def record_events(
+    conn: sqlite3.Connection,
+    events: Sequence[Union[Dict[str, Any], EventDraft]],
+    created_at: int,
+    device_id: Optional[str] = None,
+    sensor_id: Optional[str] = None,
+    item_id: Optional[str] = None,
+) -> List[EventFrame]:
+    if not events:
+        return []
+    first_id = _next_event_id(conn)
+    frames: List[EventFrame] = []
+    rows = []
+    for offset, event in enumerate(events):
+        draft = event if isinstance(event, EventDraft) else draft_event(event)
+        payload, frame = frame_from_draft(
+            draft, first_id + offset, device_id=device_id, sensor_id=sensor_id, item_id=item_id
+        )
+        frames.append(frame)
+        rows.append(
+            (
+                frame.event_id,
+                frame.type,
+                payload,
+                created_at,
+                frame.data,
+                frame.item_id,
+                frame.sensor_id,
+                frame.device_id,
+            )
+        )
+    conn.executemany(
+        """
+        INSERT INTO events
+        (id, type, payload, created_at, frame, item_id, sensor_id, device_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?);
         """,
-        (event_type, payload, created_at),
+        rows,
     )
-    return int(cursor.lastrowid)
+    return frames
 
 
 def load_events_since(
-    conn: sqlite3.Connection, last_event_id: int, limit: int
-) -> List[Dict[str, Any]]:
+    conn: sqlite3.Connection,
+    last_event_id: int,
+    limit: int,
+    event_filter: Optional[EventFilter] = None,
+) -> List[EventFrame]:
+    clauses = ["id > ?"]
+    params: List[Any] = [last_event_id]
+    if event_filter is not None:
+        for column in ("item_id", "sensor_id", "device_id", "type"):
+            values = getattr(event_filter, column)
+            if values is not None:
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(sorted(values))
+    params.append(limit)
     rows = conn.execute(
-        """
-        SELECT id, payload
+        f"""
+        SELECT id, type, payload, frame, item_id, sensor_id, device_id
         FROM events
-        WHERE id > ?
+        WHERE {' AND '.join(clauses)}
         ORDER BY id ASC
         LIMIT ?;
         """,
-        (last_event_id, limit),
+        params,
     ).fetchall()
-    events: List[Dict[str, Any]] = []
-    for row in rows:
-        payload = loads_json(row["payload"]) or {}
-        payload["event_id"] = row["id"]
-        events.append(payload)
-    return events
+    return [_event_frame(row) for row in rows]
+
+
+def load_recent_events(conn: sqlite3.Connection, limit: int) -> List[EventFrame]:
+    rows = conn.execute(
+        """
+        SELECT id, type, payload, frame, item_id, sensor_id, device_id
+        FROM events
+        ORDER BY id DESC
+        LIMIT ?;
+        """,
+        (limit,),
+    ).fetchall()
+    return [_event_frame(row) for row in reversed(rows)]
+
+
+def _event_frame(row: sqlite3.Row) -> EventFrame:
+    if row["frame"] is not None:
+        return EventFrame(
+            event_id=row["id"],
+            type=row["type"],
+            data=bytes(row["frame"]),
+            item_id=row["item_id"],
+            sensor_id=row["sensor_id"],
+            device_id=row["device_id"],
+        )
+    payload = loads_json(row["payload"]) or {}
+    payload["event_id"] = row["id"]
+    return encode_frame(payload, device_id=row["device_id"])
+
+
+def count_events(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT COUNT(*) AS count FROM events;").fetchone()
+    return int(row["count"]) if row else 0
 
 
 def prune_events(
-    conn: sqlite3.Connection, retention_seconds: int, max_rows: int, now: str
-) -> None:
+    conn: sqlite3.Connection,
+    retention_seconds: int,
+    max_rows: int,
+    now: int,
+    row_count: Optional[int] = None,
+) -> int:
+    deleted = 0
     if retention_seconds > 0:
-        cutoff = (
-            dt.datetime.fromisoformat(now)
-            - dt.timedelta(seconds=retention_seconds)
-        ).isoformat()
-        conn.execute("DELETE FROM events WHERE created_at < ?;", (cutoff,))
+        cutoff = now - retention_seconds * MICROS_PER_SECOND
+        cursor = conn.execute("DELETE FROM events WHERE created_at < ?;", (cutoff,))
+        deleted += max(0, cursor.rowcount)
     if max_rows > 0:
-        row = conn.execute("SELECT COUNT(*) AS count FROM events;").fetchone()
-        count = int(row["count"]) if row else 0
+        if row_count is None:
+            count = count_events(conn)
+        else:
+            count = max(0, row_count - deleted)
         if count > max_rows:
             excess = count - max_rows
-            conn.execute(
+            cursor = conn.execute(
                 """
                 DELETE FROM events
                 WHERE id IN (
@@ -281,3 +722,5 @@ def prune_events(
                 """,
                 (excess,),
             )
+            deleted += max(0, cursor.rowcount)
+    return deleted
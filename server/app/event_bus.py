@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from .cache import MetadataCache
+from .db import ConnectionPool, load_events_since
+from .events import EventBroadcaster, EventFrame
+from .ingest_shards import ShardedIngest
+from .listings import ListingCache, changed_by_events
+from .maintenance import EventPruner
+from .recent import RecentReadings
+from .sync import load_changed_ids
+
+
+# With several server processes on one database, each process publishes by
+# tailing the `events` table instead of from its own request handlers, so
+# every SSE client sees every worker's events in event-id order. Ids are
+# assigned under the SQLite write lock, so commit order matches id order and
+# tailing `id > cursor` never skips a row. Item and sensor writes that
+# record no event (item edits, thresholds, sensor_meta) are picked up the
+# same way from `sync_rows`, so cached metadata and listings follow them.
+class EventTailer:
+    def __init__(
+        self,
+        db: ConnectionPool,
+        broadcaster: EventBroadcaster,
+        cache: MetadataCache,
+        pruner: EventPruner,
+        listings: ListingCache,
+        recent: Optional[RecentReadings],
+        shards: Optional[ShardedIngest] = None,
+        poll_interval_ms: int = 100,
+        batch_size: int = 500,
+    ) -> None:
+        self._db = db
+        self._broadcaster = broadcaster
+        self._cache = cache
+        self._pruner = pruner
+        self._listings = listings
+        self._recent = recent
+        self._shards = shards
+        self._poll_interval = max(10, poll_interval_ms) / 1000.0
+        self._batch_size = max(1, batch_size)
+        self._cursor = 0
+        self._sync_version = 0
+        self._lock = threading.Lock()
+        self._local_ids: Set[int] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._polls = 0
+        self._published = 0
+        self._foreign = 0
+
+    def start_after(self, event_id: int, sync_version: int) -> None:
+        self._cursor = event_id
+        self._sync_version = sync_version
+
+    def note_local(self, frames: List[EventFrame]) -> None:
+        with self._lock:
+            self._local_ids.update(frame.event_id for frame in frames)
+        # Our own events need not wait for the next poll.
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                frames = await self._loop.run_in_executor(None, self._poll)
+            except Exception:  # noqa: BLE001 - retry on the next poll
+                logging.exception("Event tailing failed")
+                continue
+            if not frames:
+                continue
+            self._broadcaster.publish_many(frames)
+            if len(frames) == self._batch_size:
+                self._wakeup.set()
+
+    def _poll(self) -> List[EventFrame]:
+        with self._db.reader() as conn:
+            frames = load_events_since(conn, self._cursor, self._batch_size)
+            version, changed_items, changed_sensors = load_changed_ids(
+                conn, self._sync_version
+            )
+        self._sync_version = version
+        self._drop_changed(changed_items, changed_sensors)
+        with self._lock:
+            self._polls += 1
+            if not frames:
+                return frames
+            foreign = [
+                frame for frame in frames if frame.event_id not in self._local_ids
+            ]
+            self._local_ids.difference_update(frame.event_id for frame in frames)
+            self._published += len(frames)
+            self._foreign += len(foreign)
+        if foreign:
+            self._pruner.note_recorded(len(foreign))
+            # Another worker changed these sensors; drop our cached copies.
+            sensor_ids = {frame.sensor_id for frame in foreign if frame.sensor_id}
+            if sensor_ids:
+                self._cache.invalidate(sensor_ids)
+                if self._recent is not None:
+                    self._recent.invalidate(sorted(sensor_ids))
+            self._listings.bump(changed_by_events(foreign))
+        self._cursor = frames[-1].event_id
+        return frames
+
+    def _drop_changed(self, item_ids: List[str], sensor_ids: List[str]) -> None:
+        # Our own writes come back here too; dropping them again only costs a
+        # reload.
+        if item_ids:
+            # Items carry thresholds into their sensors and names into alerts.
+            self._cache.invalidate()
+            if self._shards is not None:
+                self._shards.invalidate()
+            self._listings.bump(("items", "sensors", "alerts"))
+        elif sensor_ids:
+            self._cache.invalidate(sensor_ids)
+            if self._shards is not None:
+                self._shards.invalidate(sensor_ids)
+            self._listings.bump(("items", "sensors"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cursor": self._cursor,
+                "polls": self._polls,
+                "published": self._published,
+                "foreign": self._foreign,
+            }
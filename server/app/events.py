@@ -1,31 +1,341 @@
 import asyncio
-from typing import Any, Dict, List
+import json
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+KEEPALIVE_INTERVAL_SECONDS = 15
+
+EVENT_TYPES = frozenset(
+    {"item_status_update", "alert_created", "alert_resolved", "alert_acknowledged"}
+)
+
+# Most selective first: a filtered subscription is indexed under the first
+# field it constrains.
+_ROUTING_FIELDS = ("item_id", "sensor_id", "device_id", "type")
+
+
+@dataclass(frozen=True)
+class EventFrame:
+    event_id: int
+    type: str
+    data: bytes
+    item_id: Optional[str] = None
+    sensor_id: Optional[str] = None
+    device_id: Optional[str] = None
+
+
+# Sent without an id so the client's Last-Event-ID still points at the last
+# event it actually received.
+RESYNC_FRAME = EventFrame(event_id=0, type="resync", data=b'data: {"type": "resync"}\n\n')
+
+
+def encode_frame(
+    event: Dict[str, Any],
+    device_id: Optional[str] = None,
+    sensor_id: Optional[str] = None,
+    item_id: Optional[str] = None,
+) -> EventFrame:
+    event_id = int(event["event_id"])
+    payload = json.dumps(event, ensure_ascii=True)
+    return EventFrame(
+        event_id=event_id,
+        type=event.get("type") or "unknown",
+        data=f"id: {event_id}\ndata: {payload}\n\n".encode("ascii"),
+        item_id=event.get("item_id") or item_id,
+        sensor_id=event.get("sensor_id") or sensor_id,
+        device_id=device_id,
+    )
+
+
+class EventDraft(NamedTuple):
+    type: str
+    item_id: Optional[str]
+    sensor_id: Optional[str]
+    # Event JSON without its closing brace; the id is appended once assigned.
+    body: str
+
+
+def draft_event(event: Dict[str, Any]) -> EventDraft:
+    return EventDraft(
+        type=event.get("type") or "unknown",
+        item_id=event.get("item_id"),
+        sensor_id=event.get("sensor_id"),
+        body=json.dumps(event, ensure_ascii=True)[:-1],
+    )
+
+
+def frame_from_draft(
+    draft: EventDraft,
+    event_id: int,
+    device_id: Optional[str] = None,
+    sensor_id: Optional[str] = None,
+    item_id: Optional[str] = None,
+) -> Tuple[str, EventFrame]:
+    payload = f'{draft.body}, "event_id": {event_id}}}'
+    frame = EventFrame(
+        event_id=event_id,
+        type=draft.type,
+        data=f"id: {event_id}\ndata: {payload}\n\n".encode("ascii"),
+        item_id=draft.item_id or item_id,
+        sensor_id=draft.sensor_id or sensor_id,
+        device_id=device_id,
+    )
+    return payload, frame
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    item_id: Optional[FrozenSet[str]] = None
+    sensor_id: Optional[FrozenSet[str]] = None
+    device_id: Optional[FrozenSet[str]] = None
+    type: Optional[FrozenSet[str]] = None
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, field) is None for field in _ROUTING_FIELDS)
+
+    def index_key(self) -> Optional[Tuple[str, FrozenSet[str]]]:
+        for field in _ROUTING_FIELDS:
+            values = getattr(self, field)
+            if values is not None:
+                return field, values
+        return None
+
+    def matches(self, frame: EventFrame) -> bool:
+        for field in _ROUTING_FIELDS:
+            values = getattr(self, field)
+            if values is not None and getattr(frame, field) not in values:
+                return False
+        return True
+
+
+ReplayKey = Tuple[int, int, Optional[EventFilter]]
+
+
+class Subscription:
+    def __init__(
+        self, broadcaster: "EventBroadcaster", event_filter: Optional[EventFilter], cursor: int
+    ) -> None:
+        self.event_filter = event_filter
+        self.cursor = cursor
+        # Filtered subscribers are handed the ring positions of matching
+        # frames at publish time instead of scanning everything in between.
+        self._pending: Deque[int] = deque()
+        self._lagged = False
+        self._broadcaster = broadcaster
+        self._wakeup = asyncio.Event()
+
+    async def read(self) -> List[EventFrame]:
+        self._wakeup.clear()
+        frames = self._broadcaster._read(self)
+        if frames:
+            return frames
+        if self.event_filter is None:
+            await self._broadcaster._signal.wait()
+        else:
+            await self._wakeup.wait()
+        self._wakeup.clear()
+        # Empty after a keepalive tick with nothing new.
+        return self._broadcaster._read(self)
 
 
 class EventBroadcaster:
-    def __init__(self, queue_size: int = 100) -> None:
-        self._queue_size = max(10, queue_size)
-        self._queues: List[asyncio.Queue] = []
-        self._lock = asyncio.Lock()
-
-    async def subscribe(self) -> asyncio.Queue:
-        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
-        async with self._lock:
-            self._queues.append(queue)
-        return queue
-
-    async def unsubscribe(self, queue: asyncio.Queue) -> None:
-        async with self._lock:
-            if queue in self._queues:
-                self._queues.remove(queue)
-
-    async def publish(self, event: Dict[str, Any]) -> None:
-        async with self._lock:
-            queues = list(self._queues)
-        for queue in queues:
-            if queue.full():
-                try:
-                    queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    pass
-            await queue.put(event)
+    def __init__(self, capacity: int = 1024) -> None:
+        self._capacity = max(10, capacity)
+        self._frames: List[Optional[EventFrame]] = [None] * self._capacity
+        # Absolute position of the next frame; the ring holds the last
+        # `capacity` positions and subscriber cursors index into it.
+        self._next = 0
+        self._signal = asyncio.Event()
+        self._subscribers: Set[Subscription] = set()
+        self._index: Dict[str, Dict[str, Set[Subscription]]] = {
+            field: {} for field in _ROUTING_FIELDS
+        }
+        self._resyncs = 0
+        # Highest event id overwritten in the ring; replays after it can be
+        # served from memory. None until the ring has been warmed.
+        self._floor: Optional[int] = None
+
+    def subscribe(self, event_filter: Optional[EventFilter] = None) -> Subscription:
+        subscription = Subscription(self, event_filter, self._next)
+        self._subscribers.add(subscription)
+        key = event_filter.index_key() if event_filter else None
+        if key is not None:
+            field, values = key
+            for value in values:
+                self._index[field].setdefault(value, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        event_filter = subscription.event_filter
+        key = event_filter.index_key() if event_filter else None
+        if key is not None:
+            field, values = key
+            for value in values:
+                subscribers = self._index[field].get(value)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._index[field][value]
+
+    def publish(self, frame: EventFrame) -> None:
+        self.publish_many([frame])
+
+    def publish_many(self, frames: List[EventFrame]) -> None:
+        if not frames:
+            return
+        woken: Set[Subscription] = set()
+        for frame in frames:
+            self._store(frame)
+            for field in _ROUTING_FIELDS:
+                value = getattr(frame, field)
+                if value is None:
+                    continue
+                for subscription in self._index[field].get(value, ()):
+                    if subscription.event_filter.matches(frame):
+                        pending = subscription._pending
+                        if len(pending) >= self._capacity:
+                            pending.popleft()
+                            subscription._lagged = True
+                        pending.append(self._next - 1)
+                        woken.add(subscription)
+        self._wake(woken)
+
+    def _store(self, frame: EventFrame) -> None:
+        slot = self._next % self._capacity
+        evicted = self._frames[slot]
+        if evicted is not None and self._floor is not None:
+            self._floor = max(self._floor, evicted.event_id)
+        self._frames[slot] = frame
+        self._next += 1
+
+    def warm(self, frames: List[EventFrame], complete: bool) -> None:
+        # `complete` means `frames` is every stored event, so the database
+        # has nothing older to offer a replay either.
+        frames = frames[-self._capacity :]
+        self._floor = 0 if complete or not frames else frames[0].event_id - 1
+        for frame in frames:
+            self._store(frame)
+        for subscription in self._subscribers:
+            subscription.cursor = self._next
+
+    def replay(
+        self, last_event_id: int, limit: int, event_filter: Optional[EventFilter] = None
+    ) -> Optional[List[EventFrame]]:
+        if self._floor is None or last_event_id < self._floor:
+            return None
+        frames = [
+            frame
+            for frame in self._frames
+            if frame is not None
+            and frame.event_id > last_event_id
+            and (event_filter is None or event_filter.matches(frame))
+        ]
+        frames.sort(key=lambda frame: frame.event_id)
+        return frames[:limit]
+
+    def _wake(self, subscriptions: Iterable[Subscription]) -> None:
+        # Unfiltered subscribers all wait on one shared event that is swapped
+        # out on every publish, so they hold no per-subscriber state here.
+        signal, self._signal = self._signal, asyncio.Event()
+        signal.set()
+        for subscription in subscriptions:
+            subscription._wakeup.set()
+
+    async def run_keepalive(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            self._wake(
+                subscription
+                for subscription in self._subscribers
+                if subscription.event_filter is not None
+            )
+
+    def _read(self, subscription: Subscription) -> List[EventFrame]:
+        frames: List[EventFrame] = []
+        oldest = self._next - self._capacity
+        if subscription.event_filter is None:
+            if subscription.cursor < oldest:
+                subscription.cursor = oldest
+                self._resyncs += 1
+                frames.append(RESYNC_FRAME)
+            for position in range(subscription.cursor, self._next):
+                frames.append(self._frames[position % self._capacity])
+            subscription.cursor = self._next
+            return frames
+        pending = subscription._pending
+        while pending and pending[0] < oldest:
+            pending.popleft()
+            subscription._lagged = True
+        if subscription._lagged:
+            subscription._lagged = False
+            self._resyncs += 1
+            frames.append(RESYNC_FRAME)
+        while pending:
+            frames.append(self._frames[pending.popleft() % self._capacity])
+        subscription.cursor = self._next
+        return frames
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "capacity": self._capacity,
+            "published": self._next,
+            "subscribers": len(self._subscribers),
+            "resyncs": self._resyncs,
+        }
+
+
+class ReplayCache:
+    def __init__(
+        self,
+        broadcaster: EventBroadcaster,
+        load: Callable[[int, int, Optional[EventFilter]], List[EventFrame]],
+    ) -> None:
+        self._broadcaster = broadcaster
+        self._load = load
+        self._inflight: Dict[ReplayKey, asyncio.Future] = {}
+        self._memory_hits = 0
+        self._db_loads = 0
+        self._shared_loads = 0
+
+    async def replay(
+        self, last_event_id: int, limit: int, event_filter: Optional[EventFilter] = None
+    ) -> List[EventFrame]:
+        frames = self._broadcaster.replay(last_event_id, limit, event_filter)
+        if frames is not None:
+            self._memory_hits += 1
+            return frames
+        key = (last_event_id, limit, event_filter)
+        future = self._inflight.get(key)
+        if future is None:
+            self._db_loads += 1
+            future = asyncio.get_running_loop().run_in_executor(
+                None, self._load, last_event_id, limit, event_filter
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._shared_loads += 1
+        # Shielded so one client disconnecting does not cancel the others.
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self._memory_hits,
+            "db_loads": self._db_loads,
+            "shared_loads": self._shared_loads,
+        }
@@ -0,0 +1,370 @@
+import sqlite3
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from .pagination import split_page
+from .recent import RecentReadings
+from .rollup import ROLLUP_TIERS, RollupBucket, bucket_start, get_watermark, rollup_table
+from .timestamps import micros_to_iso
+
+RESOLUTIONS = {"auto", "raw", "lttb", *(name for name, _ in ROLLUP_TIERS)}
+HISTORY_FORMATS = {"rows", "columnar"}
+
+_TIER_SIZES = dict(ROLLUP_TIERS)
+_SQL_CHUNK_SIZE = 500
+# Raw readings one request may load for LTTB; beyond it the minute rollup
+# is used instead.
+LTTB_MAX_ROWS = 100_000
+
+T = TypeVar("T")
+
+
+def lttb(
+    rows: Sequence[T],
+    threshold: int,
+    x: Callable[[T], float],
+    y: Callable[[T], float],
+) -> List[T]:
+    count = len(rows)
+    if threshold >= count or count <= 2:
+        return list(rows)
+    if threshold < 3:
+        return [rows[0], rows[-1]][:threshold]
+    xs = [x(row) for row in rows]
+    ys = [y(row) for row in rows]
+    every = (count - 2) / (threshold - 2)
+    sampled = [rows[0]]
+    anchor = 0
+    for index in range(threshold - 2):
+        avg_start = int((index + 1) * every) + 1
+        avg_end = min(int((index + 2) * every) + 1, count)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+        range_start = int(index * every) + 1
+        range_end = int((index + 1) * every) + 1
+        anchor_x, anchor_y = xs[anchor], ys[anchor]
+        best, best_area = range_start, -1.0
+        for candidate in range(range_start, range_end):
+            area = abs(
+                (anchor_x - avg_x) * (ys[candidate] - anchor_y)
+                - (anchor_x - xs[candidate]) * (avg_y - anchor_y)
+            )
+            if area > best_area:
+                best, best_area = candidate, area
+        sampled.append(rows[best])
+        anchor = best
+    sampled.append(rows[-1])
+    return sampled
+
+
+def stride(rows: Sequence[T], threshold: int) -> List[T]:
+    # Evenly spaced rows including the first and last, for series LTTB
+    # cannot weigh because some rows carry no value.
+    count = len(rows)
+    if threshold >= count:
+        return list(rows)
+    if threshold < 2:
+        return list(rows[:threshold])
+    every = (count - 1) / (threshold - 1)
+    return [rows[int(index * every + 0.5)] for index in range(threshold)]
+
+
+def choose_resolution(span_seconds: float, points: int) -> str:
+    if span_seconds <= points * _TIER_SIZES["minute"]:
+        return "lttb"
+    for name, size in ROLLUP_TIERS:
+        if span_seconds / size <= points:
+            return name
+    return ROLLUP_TIERS[-1][0]
+
+
+def fit_resolution(resolution: str, span_seconds: float, points: int) -> str:
+    # LTTB reads every raw reading in the span, so it is only served for the
+    # spans `choose_resolution` would pick it for.
+    if resolution == "lttb" and choose_resolution(span_seconds, points) != "lttb":
+        return choose_resolution(span_seconds, points)
+    return resolution
+
+
+_RAW_COLUMNS = ("seq_id", "ts", "raw_value", "normalized_value", "state")
+_ROLLUP_COLUMNS = (
+    "ts",
+    "normalized_value",
+    "min_value",
+    "max_value",
+    "last_value",
+    "count",
+    "state",
+)
+
+
+def _load_raw_tuples(
+    conn: sqlite3.Connection,
+    sensor_id: str,
+    since: int,
+    limit: int,
+    after: Optional[Tuple[int, int]] = None,
+    recent: Optional[RecentReadings] = None,
+) -> Tuple[List[Tuple[Any, ...]], Optional[str]]:
+    # Rows are (id, *_RAW_COLUMNS) tuples. Recent readings carry no id, so
+    # they only answer first pages that need no cursor.
+    if recent is not None and after is None:
+        found = recent.readings_since([sensor_id], since).get(sensor_id)
+        if found is not None and len(found) <= limit:
+            return [(None, *row) for row in found], None
+    query = f"""
+        SELECT id, {', '.join(_RAW_COLUMNS)}
+        FROM readings
+        WHERE sensor_id = ? AND ts >= ?
+    """
+    params: List[Any] = [sensor_id, since]
+    if after is not None:
+        query += " AND (ts, id) > (?, ?)"
+        params.extend(after)
+    query += " ORDER BY ts ASC, id ASC LIMIT ?;"
+    params.append(limit + 1)
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(query, params).fetchall()
+    return split_page(rows, limit, lambda row: (row[2], row[0]))
+
+
+def load_raw_history_page(
+    conn: sqlite3.Connection,
+    sensor_id: str,
+    since: int,
+    limit: int,
+    after: Optional[Tuple[int, int]] = None,
+    recent: Optional[RecentReadings] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    rows, cursor = _load_raw_tuples(conn, sensor_id, since, limit, after, recent)
+    return [dict(zip(_RAW_COLUMNS, row[1:])) for row in rows], cursor
+
+
+def _columns(names: Sequence[str], columns: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    # Parallel arrays keyed like the row format; `ts` stays in epoch
+    # microseconds and `state` holds indexes into `states`.
+    result: Dict[str, Any] = {name: [] for name in names}
+    result.update((name, list(column)) for name, column in zip(names, columns))
+    codes: Dict[Optional[str], int] = {}
+    result["state"] = [codes.setdefault(state, len(codes)) for state in result["state"]]
+    return {"length": len(result["ts"]), "columns": result, "states": list(codes)}
+
+
+def load_history_columns(
+    conn: sqlite3.Connection,
+    sensor_id: Optional[str],
+    resolution: str,
+    since: int,
+    budget: int,
+    after: Optional[Tuple[int, int]] = None,
+    recent: Optional[RecentReadings] = None,
+) -> Tuple[str, Dict[str, Any], Optional[str]]:
+    # Returns the resolution served, which differs from the one asked for
+    # when LTTB falls back to the minute rollup.
+    if resolution == "raw":
+        rows: List[Tuple[Any, ...]] = []
+        cursor = None
+        if sensor_id:
+            rows, cursor = _load_raw_tuples(conn, sensor_id, since, budget, after, recent)
+        return resolution, _columns(_RAW_COLUMNS, list(zip(*rows))[1:]), cursor
+    if resolution == "lttb":
+        raw: Optional[Dict[str, List[Tuple[Any, ...]]]] = {}
+        if sensor_id:
+            raw = load_raw_histories(conn, [sensor_id], since, recent, LTTB_MAX_ROWS)
+        if raw is not None:
+            rows = _downsample_raw(raw.get(sensor_id or "", []), budget)
+            return resolution, _columns(_RAW_COLUMNS, list(zip(*rows))), None
+        resolution = ROLLUP_TIERS[0][0]
+    buckets: List[Dict[str, Any]] = []
+    if sensor_id:
+        buckets = downsample(load_rollup_history(conn, sensor_id, resolution, since), budget)
+    return resolution, history_columns(buckets, resolution), None
+
+
+def history_columns(rows: List[Dict[str, Any]], resolution: str) -> Dict[str, Any]:
+    names = _RAW_COLUMNS if resolution in ("raw", "lttb") else _ROLLUP_COLUMNS
+    return _columns(names, [[row[name] for row in rows] for name in names])
+
+
+def _chunks(values: Sequence[str]) -> List[Sequence[str]]:
+    return [
+        values[start : start + _SQL_CHUNK_SIZE]
+        for start in range(0, len(values), _SQL_CHUNK_SIZE)
+    ]
+
+
+def load_raw_histories(
+    conn: sqlite3.Connection,
+    sensor_ids: Sequence[str],
+    since: int,
+    recent: Optional[RecentReadings] = None,
+    max_rows: Optional[int] = None,
+) -> Optional[Dict[str, List[Tuple[Any, ...]]]]:
+    # Rows are _RAW_COLUMNS tuples grouped by sensor. Sensors whose recent
+    # readings cover the range skip SQLite; for the rest the IN list is
+    # answered with one (sensor_id, ts) index range per sensor, and the
+    # result refills their recent readings. Returns None when the sensors
+    # hold more than `max_rows` readings in the range.
+    wanted = list(dict.fromkeys(sensor_ids))
+    generation = 0
+    found: Dict[str, List[Tuple[Any, ...]]] = {}
+    if recent is not None:
+        generation = recent.generation()
+        found = recent.readings_since(wanted, since)
+    histories = {sensor_id: found.get(sensor_id, []) for sensor_id in wanted}
+    missing = [sensor_id for sensor_id in wanted if sensor_id not in found]
+    remaining = -1
+    if max_rows is not None:
+        remaining = max_rows - sum(len(rows) for rows in found.values())
+        if remaining < 0:
+            return None
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    for chunk in _chunks(missing):
+        rows = cursor.execute(
+            f"""
+            SELECT sensor_id, {', '.join(_RAW_COLUMNS)}
+            FROM readings
+            WHERE sensor_id IN ({', '.join('?' for _ in chunk)}) AND ts >= ?
+            ORDER BY sensor_id, ts, id
+            LIMIT ?;
+            """,
+            [*chunk, since, remaining if remaining < 0 else remaining + 1],
+        ).fetchall()
+        if max_rows is not None:
+            if len(rows) > remaining:
+                return None
+            remaining -= len(rows)
+        for row in rows:
+            histories[row[0]].append(row[1:])
+    if recent is not None:
+        for sensor_id in missing:
+            recent.fill(sensor_id, histories[sensor_id], since - 1, generation)
+    return histories
+
+
+def _downsample_raw(rows: List[Tuple[Any, ...]], points: int) -> List[Tuple[Any, ...]]:
+    if len(rows) <= points:
+        return rows
+    # Presence sensors store states without values.
+    if any(row[3] is None for row in rows):
+        return stride(rows, points)
+    return lttb(rows, points, x=itemgetter(1), y=itemgetter(3))
+
+
+def load_histories(
+    conn: sqlite3.Connection,
+    sensor_ids: Sequence[str],
+    resolution: str,
+    since: int,
+    budget: int,
+    recent: Optional[RecentReadings] = None,
+) -> Tuple[str, Dict[str, List[Dict[str, Any]]]]:
+    # Returns the resolution served with the histories; LTTB falls back to
+    # the minute rollup when the range holds more than LTTB_MAX_ROWS readings.
+    if resolution == "lttb":
+        raw = load_raw_histories(conn, sensor_ids, since, recent, LTTB_MAX_ROWS)
+        if raw is not None:
+            return resolution, {
+                sensor_id: [dict(zip(_RAW_COLUMNS, row)) for row in _downsample_raw(rows, budget)]
+                for sensor_id, rows in raw.items()
+            }
+        resolution = ROLLUP_TIERS[0][0]
+    rollups = load_rollup_histories(conn, sensor_ids, resolution, since)
+    return resolution, {
+        sensor_id: downsample(buckets, budget) for sensor_id, buckets in rollups.items()
+    }
+
+
+def _bucket_row(start: int, bucket: RollupBucket) -> Dict[str, Any]:
+    mean = bucket.sum_value / bucket.value_count if bucket.value_count else None
+    return {
+        "ts": start,
+        "normalized_value": mean,
+        "min_value": bucket.min_value,
+        "max_value": bucket.max_value,
+        "last_value": bucket.last_value,
+        "count": bucket.count,
+        "state": bucket.last_state,
+    }
+
+
+def load_rollup_history(
+    conn: sqlite3.Connection, sensor_id: str, tier: str, since: int
+) -> List[Dict[str, Any]]:
+    return load_rollup_histories(conn, [sensor_id], tier, since)[sensor_id]
+
+
+def load_rollup_histories(
+    conn: sqlite3.Connection, sensor_ids: Sequence[str], tier: str, since: int
+) -> Dict[str, List[Dict[str, Any]]]:
+    size = _TIER_SIZES[tier]
+    since_bucket = bucket_start(since, size)
+    buckets: Dict[str, Dict[int, RollupBucket]] = {sensor_id: {} for sensor_id in sensor_ids}
+    for chunk in _chunks(list(buckets)):
+        rows = conn.execute(
+            f"""
+            SELECT sensor_id, bucket_start, count, value_count, min_value, max_value,
+                   sum_value, last_ts, last_value, last_state
+            FROM {rollup_table(tier)}
+            WHERE sensor_id IN ({', '.join('?' for _ in chunk)}) AND bucket_start >= ?;
+            """,
+            [*chunk, since_bucket],
+        ).fetchall()
+        for row in rows:
+            buckets[row["sensor_id"]][row["bucket_start"]] = RollupBucket(
+                count=row["count"],
+                value_count=row["value_count"],
+                min_value=row["min_value"],
+                max_value=row["max_value"],
+                sum_value=row["sum_value"],
+                last_ts=row["last_ts"],
+                last_value=row["last_value"],
+                last_state=row["last_state"],
+            )
+
+    # Readings not rolled up yet, including late ones for older buckets.
+    # Those are the ids past the watermark, so the scan walks readings by id
+    # (the unary plus keeps SQLite off the sensor/ts index, which would visit
+    # every reading in the range). Rows come back in id order; add_reading
+    # keeps the newest ts as the bucket's last value either way.
+    watermark = get_watermark(conn)
+    for chunk in _chunks(list(buckets)):
+        pending = conn.execute(
+            f"""
+            SELECT sensor_id, ts, normalized_value, state
+            FROM readings
+            WHERE id > ? AND +sensor_id IN ({', '.join('?' for _ in chunk)}) AND +ts >= ?;
+            """,
+            [watermark, *chunk, since_bucket],
+        ).fetchall()
+        for row in pending:
+            key = bucket_start(row["ts"], size)
+            bucket = buckets[row["sensor_id"]].setdefault(key, RollupBucket())
+            bucket.add_reading(row["ts"], row["normalized_value"], row["state"])
+
+    return {
+        sensor_id: [_bucket_row(key, sensor_buckets[key]) for key in sorted(sensor_buckets)]
+        for sensor_id, sensor_buckets in buckets.items()
+    }
+
+
+def downsample(rows: List[Dict[str, Any]], points: int) -> List[Dict[str, Any]]:
+    if len(rows) <= points:
+        return rows
+    if any(row["normalized_value"] is None for row in rows):
+        return stride(rows, points)
+    return lttb(
+        rows,
+        points,
+        x=lambda row: row["ts"],
+        y=lambda row: row["normalized_value"],
+    )
+
+
+def with_iso_ts(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for row in rows:
+        row["ts"] = micros_to_iso(row["ts"])
+    return rows
@@ -0,0 +1,455 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .cache import MetadataCache, SensorMetadata
+from .db import dumps_json, record_events
+from .events import EventDraft, EventFrame, draft_event
+from .models import ReadingsBatchIn
+from .state import resolve_state
+from .timestamps import micros_to_iso, parse_ts, to_micros
+
+_SQL_CHUNK_SIZE = 500
+
+ALERT_STATES = {"low", "out"}
+
+
+class InvalidReadingError(ValueError):
+    pass
+
+
+SensorState = Tuple[Optional[str], Optional[float], Optional[int]]
+
+
+@dataclass
+class IngestResult:
+    ack_seq_id: Optional[int]
+    events: List[EventFrame]
+    sensors: List[SensorMetadata]
+    rows: List[Tuple[Any, ...]]
+
+
+# Everything ingest decides before touching the database; built without
+# writes so it can be prepared outside the writer (see ingest_shards.py).
+@dataclass
+class PreparedBatch:
+    device_id: str
+    firmware: Optional[str]
+    ack_seq_id: Optional[int]
+    sensor_upserts: List[Tuple[str, Any]]
+    rows: List[Tuple[Any, ...]]
+    sensor_states: List[Tuple[Any, ...]]
+    # Drafts, or alert_created dicts that still need their alert id.
+    events: List[Union[EventDraft, Dict[str, Any]]]
+    sensors: List[SensorMetadata]
+    # Each sensor's (last_state, last_value, last_update) the batch was
+    # resolved against.
+    base_states: Dict[str, SensorState]
+
+
+def _parse_timestamps(values: Iterable[Union[str, int]]) -> List[Tuple[int, str]]:
+    parsed: Dict[Union[str, int], Tuple[int, str]] = {}
+    result: List[Tuple[int, str]] = []
+    for value in values:
+        entry = parsed.get(value)
+        if entry is None:
+            if isinstance(value, int):
+                entry = (value, micros_to_iso(value))
+            else:
+                moment = parse_ts(value)
+                entry = (to_micros(moment), moment.isoformat())
+            parsed[value] = entry
+        result.append(entry)
+    return result
+
+
+def _chunks(values: Sequence[Any], size: int = _SQL_CHUNK_SIZE) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _placeholders(count: int) -> str:
+    return ", ".join("?" for _ in range(count))
+
+
+def _upsert_device(conn, device_id: str, firmware: Optional[str], last_seen: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO devices (id, firmware, last_seen)
+        VALUES (?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET firmware = excluded.firmware, last_seen = excluded.last_seen;
+        """,
+        (device_id, firmware, last_seen),
+    )
+
+
+def _upsert_sensor(
+    conn,
+    sensor_id: str,
+    device_id: str,
+    sensor_type: Optional[str] = None,
+    thresholds: Optional[Dict[str, float]] = None,
+    state_map: Optional[Dict[str, str]] = None,
+) -> None:
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO sensors (id, device_id)
+        VALUES (?, ?);
+        """,
+        (sensor_id, device_id),
+    )
+    updates = ["device_id = ?"]
+    values: List[Any] = [device_id]
+    if sensor_type is not None:
+        updates.append("type = ?")
+        values.append(sensor_type)
+    if thresholds is not None:
+        updates.append("thresholds = ?")
+        values.append(dumps_json(thresholds))
+    if state_map is not None:
+        updates.append("state_map = ?")
+        values.append(dumps_json(state_map))
+    if updates:
+        values.append(sensor_id)
+        conn.execute(
+            f"UPDATE sensors SET {', '.join(updates)} WHERE id = ?;",
+            values,
+        )
+
+
+def _sensor_needs_upsert(
+    meta: Optional[SensorMetadata], device_id: str, sensor_meta: Any
+) -> bool:
+    if meta is None or meta.device_id != device_id:
+        return True
+    if sensor_meta is None:
+        return False
+    if sensor_meta.type is not None and sensor_meta.type != meta.type:
+        return True
+    if sensor_meta.thresholds is not None and sensor_meta.thresholds != meta.thresholds:
+        return True
+    if sensor_meta.state_map is not None and sensor_meta.state_map != meta.state_map:
+        return True
+    return False
+
+
+def _merge_sensor_meta(
+    meta: Optional[SensorMetadata], sensor_id: str, device_id: str, sensor_meta: Any
+) -> SensorMetadata:
+    # Mirrors what _upsert_sensor writes, so the batch can use the result
+    # before it is committed.
+    merged = meta or SensorMetadata(
+        sensor_id=sensor_id,
+        device_id=device_id,
+        type=None,
+        thresholds=None,
+        state_map=None,
+        last_state=None,
+        last_value=None,
+        last_update=None,
+    )
+    merged.device_id = device_id
+    if sensor_meta is not None:
+        if sensor_meta.type is not None:
+            merged.type = sensor_meta.type
+        if sensor_meta.thresholds is not None:
+            merged.thresholds = sensor_meta.thresholds
+        if sensor_meta.state_map is not None:
+            merged.state_map = sensor_meta.state_map
+    return merged
+
+
+def load_last_states(conn, sensor_ids: Sequence[str]) -> Dict[str, SensorState]:
+    states: Dict[str, SensorState] = {}
+    for chunk in _chunks(sensor_ids):
+        rows = conn.execute(
+            f"""
+            SELECT id, last_state, last_value, last_update
+            FROM sensors
+            WHERE id IN ({_placeholders(len(chunk))});
+            """,
+            list(chunk),
+        ).fetchall()
+        states.update(
+            (row["id"], (row["last_state"], row["last_value"], row["last_update"]))
+            for row in rows
+        )
+    return states
+
+
+def _load_sensor_contexts(
+    conn,
+    cache: MetadataCache,
+    device_id: str,
+    sensor_ids: Sequence[str],
+    sensor_meta: Dict[str, Any],
+    states: Dict[str, SensorState],
+) -> Tuple[Dict[str, SensorMetadata], List[Tuple[str, Any]]]:
+    contexts = cache.get_sensors(conn, sensor_ids)
+    for sensor_id, meta in contexts.items():
+        meta.last_state, meta.last_value, meta.last_update = states.get(
+            sensor_id, (None, None, None)
+        )
+    upserts: List[Tuple[str, Any]] = []
+    for sensor_id in sensor_ids:
+        meta = sensor_meta.get(sensor_id)
+        if _sensor_needs_upsert(contexts.get(sensor_id), device_id, meta):
+            contexts[sensor_id] = _merge_sensor_meta(
+                contexts.get(sensor_id), sensor_id, device_id, meta
+            )
+            upserts.append((sensor_id, meta))
+    return contexts, upserts
+
+
+def _load_existing_keys(
+    conn,
+    device_id: str,
+    sensor_ids: Sequence[str],
+    seq_ids: Iterable[int],
+) -> Set[Tuple[str, int, int]]:
+    seq_list = list(seq_ids)
+    if not seq_list or not sensor_ids:
+        return set()
+    low, high = min(seq_list), max(seq_list)
+    existing: Set[Tuple[str, int, int]] = set()
+    for chunk in _chunks(sensor_ids):
+        rows = conn.execute(
+            f"""
+            SELECT sensor_id, seq_id, ts
+            FROM readings
+            WHERE device_id = ?
+              AND sensor_id IN ({_placeholders(len(chunk))})
+              AND seq_id BETWEEN ? AND ?;
+            """,
+            [device_id, *chunk, low, high],
+        ).fetchall()
+        existing.update((row["sensor_id"], row["seq_id"], row["ts"]) for row in rows)
+    return existing
+
+
+def alert_message(item_name: Optional[str], sensor_id: str, state: str) -> str:
+    return f"{item_name} is {state}" if item_name else f"Sensor {sensor_id} is {state}"
+
+
+def create_alert(
+    conn,
+    sensor_id: str,
+    item_id: Optional[str],
+    alert_type: str,
+    message: str,
+    created_at: int,
+) -> int:
+    cursor = conn.execute(
+        """
+        INSERT INTO alerts (item_id, sensor_id, type, status, message, created_at)
+        VALUES (?, ?, ?, 'active', ?, ?);
+        """,
+        (item_id, sensor_id, alert_type, message, created_at),
+    )
+    return int(cursor.lastrowid)
+
+
+def resolve_alerts(conn, sensor_id: str, resolved_at: int) -> None:
+    conn.execute(
+        """
+        UPDATE alerts
+        SET status = 'resolved', resolved_at = ?
+        WHERE sensor_id = ? AND status = 'active';
+        """,
+        (resolved_at, sensor_id),
+    )
+
+
+def prepare_batch(
+    conn, batch: ReadingsBatchIn, now: int, cache: MetadataCache
+) -> PreparedBatch:
+    try:
+        timestamps = _parse_timestamps(reading.ts for reading in batch.readings)
+    except ValueError as exc:
+        raise InvalidReadingError("Invalid reading timestamp") from exc
+
+    prepared = PreparedBatch(
+        device_id=batch.device_id,
+        firmware=batch.firmware,
+        ack_seq_id=None,
+        sensor_upserts=[],
+        rows=[],
+        sensor_states=[],
+        events=[],
+        sensors=[],
+        base_states={},
+    )
+    if not batch.readings:
+        return prepared
+
+    sensor_meta_lookup: Dict[str, Any] = {}
+    if batch.sensor_meta:
+        sensor_meta_lookup = {meta.sensor_id: meta for meta in batch.sensor_meta}
+    sensor_ids = list(dict.fromkeys(reading.sensor_id for reading in batch.readings))
+
+    # Another worker may have ingested for these sensors since they were
+    # cached, so the state hysteresis starts from is read with the batch.
+    prepared.base_states = load_last_states(conn, sensor_ids)
+    contexts, prepared.sensor_upserts = _load_sensor_contexts(
+        conn, cache, batch.device_id, sensor_ids, sensor_meta_lookup, prepared.base_states
+    )
+    dirty: Set[str] = set()
+    seen = _load_existing_keys(
+        conn,
+        batch.device_id,
+        sensor_ids,
+        (reading.seq_id for reading in batch.readings),
+    )
+
+    rows = prepared.rows
+    events = prepared.events
+    now_iso = micros_to_iso(now)
+    for reading, (reading_ts, reading_iso) in zip(batch.readings, timestamps):
+        key = (reading.sensor_id, reading.seq_id, reading_ts)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        context = contexts[reading.sensor_id]
+        prev_state = context.last_state
+        item = context.item
+        item_id = item.id if item else None
+        resolved_state = resolve_state(
+            reading.normalized_value,
+            reading.state,
+            prev_state,
+            context.effective_thresholds(),
+            context.state_map,
+        )
+        rows.append(
+            (
+                batch.device_id,
+                reading.seq_id,
+                reading.sensor_id,
+                reading_ts,
+                reading.raw_value,
+                reading.normalized_value,
+                resolved_state,
+                now,
+            )
+        )
+
+        if context.last_update is None or reading_ts >= context.last_update:
+            context.last_state = resolved_state
+            context.last_value = reading.normalized_value
+            context.last_update = reading_ts
+            dirty.add(reading.sensor_id)
+
+        events.append(
+            draft_event(
+                {
+                    "type": "item_status_update",
+                    "sensor_id": reading.sensor_id,
+                    "item_id": item_id,
+                    "state": resolved_state,
+                    "normalized_value": reading.normalized_value,
+                    "ts": reading_iso,
+                }
+            )
+        )
+
+        if prev_state == resolved_state:
+            continue
+        if resolved_state in ALERT_STATES:
+            message = alert_message(item.name if item else None, reading.sensor_id, resolved_state)
+            events.append(
+                {
+                    "type": "alert_created",
+                    "alert_id": None,
+                    "sensor_id": reading.sensor_id,
+                    "item_id": item_id,
+                    "state": resolved_state,
+                    "created_at": now_iso,
+                    "message": message,
+                }
+            )
+        if resolved_state == "ok":
+            events.append(
+                draft_event(
+                    {
+                        "type": "alert_resolved",
+                        "sensor_id": reading.sensor_id,
+                        "item_id": item_id,
+                        "resolved_at": now_iso,
+                    }
+                )
+            )
+
+    prepared.sensor_states = [
+        (
+            contexts[sensor_id].last_state,
+            contexts[sensor_id].last_value,
+            contexts[sensor_id].last_update,
+            sensor_id,
+        )
+        for sensor_id in sorted(dirty)
+    ]
+    prepared.ack_seq_id = batch.readings[-1].seq_id
+    prepared.sensors = list(contexts.values())
+    return prepared
+
+
+def write_batch(conn, prepared: PreparedBatch, now: int) -> IngestResult:
+    _upsert_device(conn, prepared.device_id, prepared.firmware, now)
+    for sensor_id, meta in prepared.sensor_upserts:
+        _upsert_sensor(
+            conn,
+            sensor_id,
+            prepared.device_id,
+            sensor_type=meta.type if meta else None,
+            thresholds=meta.thresholds if meta else None,
+            state_map=meta.state_map if meta else None,
+        )
+
+    drafts: List[EventDraft] = []
+    for event in prepared.events:
+        if isinstance(event, dict):
+            event["alert_id"] = create_alert(
+                conn,
+                event["sensor_id"],
+                event["item_id"],
+                event["state"],
+                event["message"],
+                now,
+            )
+            event = draft_event(event)
+        elif event.type == "alert_resolved":
+            resolve_alerts(conn, event.sensor_id, now)
+        drafts.append(event)
+
+    if prepared.rows:
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO readings
+            (device_id, seq_id, sensor_id, ts, raw_value, normalized_value, state, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+            """,
+            prepared.rows,
+        )
+    if prepared.sensor_states:
+        conn.executemany(
+            """
+            UPDATE sensors
+            SET last_state = ?, last_value = ?, last_update = ?
+            WHERE id = ?;
+            """,
+            prepared.sensor_states,
+        )
+    frames = record_events(conn, drafts, now, device_id=prepared.device_id)
+
+    return IngestResult(
+        ack_seq_id=prepared.ack_seq_id,
+        events=frames,
+        sensors=prepared.sensors,
+        rows=prepared.rows,
+    )
+
+
+def ingest_batch(
+    conn, batch: ReadingsBatchIn, now: int, cache: MetadataCache
+) -> IngestResult:
+    return write_batch(conn, prepare_batch(conn, batch, now, cache), now)
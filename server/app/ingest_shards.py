@@ -0,0 +1,276 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Union
+
+from .cache import MetadataCache
+from .config import AppConfig
+from .db import ConnectionPool
+from .ingest import (
+    IngestResult,
+    InvalidReadingError,
+    PreparedBatch,
+    ingest_batch,
+    load_last_states,
+    prepare_batch,
+    write_batch,
+)
+from .models import ReadingsBatchIn
+from .wire import (
+    PackedBatchError,
+    PackedReading,
+    construct_model,
+    decode_packed_batch,
+    packed_device_id,
+)
+
+
+@dataclass
+class _PendingBatch:
+    # Packed batches stay raw bytes until a worker decodes them.
+    batch: Union[ReadingsBatchIn, bytes]
+    now: int
+    future: "Future[IngestResult]" = field(default_factory=Future)
+
+
+@dataclass
+class _Invalidate:
+    sensor_ids: Optional[List[str]]
+
+
+_ShardItem = Union[_PendingBatch, _Invalidate, None]
+
+
+def _portable(batch: ReadingsBatchIn) -> ReadingsBatchIn:
+    # Plain tuples pickle far faster than pydantic models.
+    readings = [
+        reading
+        if isinstance(reading, PackedReading)
+        else PackedReading(
+            reading.seq_id,
+            reading.sensor_id,
+            reading.ts,
+            reading.raw_value,
+            reading.normalized_value,
+            reading.state,
+        )
+        for reading in batch.readings
+    ]
+    return construct_model(
+        ReadingsBatchIn,
+        device_id=batch.device_id,
+        firmware=batch.firmware,
+        sent_at=batch.sent_at,
+        readings=readings,
+        sensor_meta=batch.sensor_meta,
+    )
+
+
+def _worker_main(config: AppConfig, conn: Connection) -> None:
+    db = ConnectionPool(config)
+    cache = MetadataCache()
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            kind, payload = message
+            if kind == "invalidate":
+                cache.invalidate(payload)
+                continue
+            batch, now = payload
+            try:
+                if isinstance(batch, bytes):
+                    batch = decode_packed_batch(batch)
+                with db.reader() as reader:
+                    prepared = prepare_batch(reader, batch, now, cache)
+            except (InvalidReadingError, PackedBatchError) as exc:
+                conn.send(("error", exc))
+                continue
+            except Exception as exc:  # noqa: BLE001 - reported to the waiting request
+                logging.exception("Ingest worker failed to prepare a batch")
+                conn.send(("error", RuntimeError(f"Ingest worker failed: {exc}")))
+                continue
+            # Optimistic; the parent sends an invalidation if the write fails.
+            cache.store_sensors(prepared.sensors)
+            conn.send(("prepared", prepared))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        db.close()
+
+
+class _Shard:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.queue: "queue.Queue[_ShardItem]" = queue.Queue()
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn: Optional[Connection] = None
+        self.thread: Optional[threading.Thread] = None
+
+
+class ShardedIngest:
+    def __init__(
+        self,
+        config: AppConfig,
+        db: ConnectionPool,
+        cache: MetadataCache,
+        workers: int,
+    ) -> None:
+        self._config = config
+        self._db = db
+        self._cache = cache
+        self._context = multiprocessing.get_context("spawn")
+        self._shards = [_Shard(index) for index in range(max(1, workers))]
+        self._stats_lock = threading.Lock()
+        self._batches = [0] * len(self._shards)
+        self._readings = [0] * len(self._shards)
+        self._restarts = 0
+
+    def start(self) -> None:
+        for shard in self._shards:
+            if shard.thread is not None:
+                continue
+            self._spawn(shard)
+            shard.thread = threading.Thread(
+                target=self._run,
+                args=(shard,),
+                name=f"inventory-ingest-shard-{shard.index}",
+                daemon=True,
+            )
+            shard.thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        for shard in self._shards:
+            if shard.thread is not None:
+                shard.queue.put(None)
+        for shard in self._shards:
+            if shard.thread is not None:
+                shard.thread.join(timeout=timeout)
+                shard.thread = None
+            self._terminate(shard, timeout)
+            while True:
+                try:
+                    item = shard.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, _PendingBatch) and not item.future.done():
+                    item.future.set_exception(RuntimeError("Ingest shards stopped"))
+
+    def submit(self, batch: Union[ReadingsBatchIn, bytes], now: int) -> IngestResult:
+        device_id = packed_device_id(batch) if isinstance(batch, bytes) else batch.device_id
+        shard = self._shards[zlib.crc32(device_id.encode("utf-8")) % len(self._shards)]
+        if shard.thread is None:
+            raise RuntimeError("Ingest shards are not running")
+        pending = _PendingBatch(batch=batch, now=now)
+        shard.queue.put(pending)
+        return pending.future.result()
+
+    def invalidate(self, sensor_ids: Optional[List[str]] = None) -> None:
+        for shard in self._shards:
+            shard.queue.put(_Invalidate(sensor_ids))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "workers": len(self._shards),
+                "batches": list(self._batches),
+                "readings": list(self._readings),
+                "queued": [shard.queue.qsize() for shard in self._shards],
+                "restarts": self._restarts,
+            }
+
+    def _spawn(self, shard: _Shard) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._config, child_conn),
+            name=f"inventory-ingest-{shard.index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        shard.process = process
+        shard.conn = parent_conn
+
+    def _terminate(self, shard: _Shard, timeout: float) -> None:
+        if shard.conn is not None:
+            try:
+                shard.conn.send(None)
+            except OSError:
+                pass
+            shard.conn.close()
+            shard.conn = None
+        if shard.process is not None:
+            shard.process.join(timeout=timeout)
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.process = None
+
+    def _run(self, shard: _Shard) -> None:
+        while True:
+            item = shard.queue.get()
+            if item is None:
+                break
+            # A batch that hit a dead worker has not been written yet, so it
+            # gets one more try on the replacement.
+            for attempt in range(2):
+                try:
+                    if isinstance(item, _Invalidate):
+                        shard.conn.send(("invalidate", item.sensor_ids))
+                    else:
+                        self._process(shard, item)
+                    break
+                except (EOFError, OSError) as exc:
+                    logging.warning("Ingest shard %d failed (%s); restarting it", shard.index, exc)
+                    with self._stats_lock:
+                        self._restarts += 1
+                    self._terminate(shard, timeout=1.0)
+                    self._spawn(shard)
+                    if isinstance(item, _PendingBatch) and attempt == 1:
+                        item.future.set_exception(RuntimeError("Ingest worker exited"))
+
+    def _process(self, shard: _Shard, pending: _PendingBatch) -> None:
+        # One batch per shard in flight: a device's next batch is prepared
+        # only after the previous one committed, which keeps per-device order
+        # and lets the worker deduplicate against committed readings.
+        batch = pending.batch
+        if not isinstance(batch, bytes):
+            batch = _portable(batch)
+        shard.conn.send(("batch", (batch, pending.now)))
+        kind, payload = shard.conn.recv()
+        if kind == "error":
+            pending.future.set_exception(payload)
+            return
+        prepared: PreparedBatch = payload
+        try:
+            result = self._write(pending, prepared)
+        except Exception as exc:  # noqa: BLE001 - fail the batch, keep the shard alive
+            shard.conn.send(("invalidate", [meta.sensor_id for meta in prepared.sensors]))
+            pending.future.set_exception(exc)
+            return
+        with self._stats_lock:
+            self._batches[shard.index] += 1
+            self._readings[shard.index] += len(prepared.rows)
+        pending.future.set_result(result)
+
+    def _write(self, pending: _PendingBatch, prepared: PreparedBatch) -> IngestResult:
+        sensor_ids = [meta.sensor_id for meta in prepared.sensors]
+        with self._cache.write_lock:
+            with self._db.writer() as conn:
+                if load_last_states(conn, sensor_ids) == prepared.base_states:
+                    result = write_batch(conn, prepared, pending.now)
+                else:
+                    # Another server worker ingested for these sensors after
+                    # the shard read them; resolve the batch again here.
+                    batch = pending.batch
+                    if isinstance(batch, bytes):
+                        batch = decode_packed_batch(batch)
+                    result = ingest_batch(conn, batch, pending.now, self._cache)
+            self._cache.store_sensors(result.sensors)
+        return result
@@ -0,0 +1,142 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .cache import MetadataCache
+from .db import ConnectionPool
+from .ingest import IngestResult, ingest_batch
+from .models import ReadingsBatchIn
+
+
+@dataclass
+class _PendingBatch:
+    batch: ReadingsBatchIn
+    now: int
+    future: "Future[IngestResult]" = field(default_factory=Future)
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        db: ConnectionPool,
+        cache: MetadataCache,
+        commit_window_ms: int = 20,
+        max_group_readings: int = 5000,
+    ) -> None:
+        self._db = db
+        self._cache = cache
+        self._window = max(0, commit_window_ms) / 1000.0
+        self._max_readings = max(1, max_group_readings)
+        self._queue: "queue.Queue[Optional[_PendingBatch]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._groups = 0
+        self._batches = 0
+        self._readings = 0
+        self._largest_group = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="inventory-ingest-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None and not pending.future.done():
+                pending.future.set_exception(RuntimeError("Ingest writer stopped"))
+
+    def submit(self, batch: ReadingsBatchIn, now: int) -> IngestResult:
+        if self._thread is None:
+            raise RuntimeError("Ingest writer is not running")
+        pending = _PendingBatch(batch=batch, now=now)
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            average = self._batches / self._groups if self._groups else 0.0
+            return {
+                "groups": self._groups,
+                "batches": self._batches,
+                "readings": self._readings,
+                "batches_per_group_avg": round(average, 3),
+                "batches_per_group_max": self._largest_group,
+                "queued": self._queue.qsize(),
+            }
+
+    def _collect(self, first: _PendingBatch) -> Tuple[List[_PendingBatch], bool]:
+        group = [first]
+        readings = len(first.batch.readings)
+        deadline = time.monotonic() + self._window
+        while readings < self._max_readings:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                return group, True
+            group.append(pending)
+            readings += len(pending.batch.readings)
+        return group, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            group, stopping = self._collect(first)
+            try:
+                self._commit(group)
+            except Exception as exc:  # noqa: BLE001 - fail the group, keep the writer alive
+                logging.exception("Group commit failed")
+                for pending in group:
+                    if not pending.future.done():
+                        pending.future.set_exception(exc)
+
+    def _commit(self, group: List[_PendingBatch]) -> None:
+        committed: List[Tuple[_PendingBatch, IngestResult]] = []
+        with self._cache.write_lock:
+            with self._db.writer() as conn:
+                for pending in group:
+                    conn.execute("SAVEPOINT ingest_batch;")
+                    try:
+                        result = ingest_batch(conn, pending.batch, pending.now, self._cache)
+                    except Exception as exc:  # noqa: BLE001 - isolate one bad batch
+                        conn.execute("ROLLBACK TO ingest_batch;")
+                        conn.execute("RELEASE ingest_batch;")
+                        pending.future.set_exception(exc)
+                        continue
+                    conn.execute("RELEASE ingest_batch;")
+                    committed.append((pending, result))
+            # Later batches in the group read their sensors inside the
+            # transaction, so the cache is only updated once it has committed.
+            for _, result in committed:
+                self._cache.store_sensors(result.sensors)
+
+        with self._stats_lock:
+            self._groups += 1
+            self._batches += len(committed)
+            self._readings += sum(len(pending.batch.readings) for pending, _ in committed)
+            self._largest_group = max(self._largest_group, len(committed))
+        for pending, result in committed:
+            pending.future.set_result(result)
@@ -0,0 +1,113 @@
+import json
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from .events import EventFrame
+
+COLLECTIONS = ("items", "sensors", "devices", "alerts")
+
+
+def changed_by_events(frames: Iterable[EventFrame]) -> Set[str]:
+    changed: Set[str] = set()
+    for frame in frames:
+        if frame.type == "item_status_update":
+            changed.update(("items", "sensors", "devices"))
+        elif frame.type.startswith("alert_"):
+            changed.add("alerts")
+    return changed
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def encode_body(content: Any) -> bytes:
+    # Same encoding as Starlette's JSONResponse.
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+# Listing responses are cached as encoded bytes under a per-collection change
+# version. Writers bump the version after committing; a listing reads the
+# version before querying, so a body is never stored under a version newer
+# than the data it was built from.
+class ListingCache:
+    def __init__(self, max_bodies: int = 256) -> None:
+        self._lock = threading.Lock()
+        # Versions restart at zero with the process; the epoch keeps ETags
+        # from an earlier run (or another worker) from matching.
+        self._epoch = uuid.uuid4().hex[:8]
+        self._versions: Dict[str, int] = dict.fromkeys(COLLECTIONS, 0)
+        self._bodies: Dict[Tuple[str, str], Tuple[int, bytes]] = {}
+        self._max_bodies = max_bodies
+        self._renders = 0
+        self._hits = 0
+        self._not_modified = 0
+
+    def bump(self, collections: Iterable[str]) -> None:
+        with self._lock:
+            for collection in collections:
+                self._versions[collection] += 1
+
+    def version(self, collection: str) -> int:
+        with self._lock:
+            return self._versions[collection]
+
+    def etag(self, collection: str, version: int) -> str:
+        return f'"{collection}-{self._epoch}-{version}"'
+
+    def note_not_modified(self) -> None:
+        with self._lock:
+            self._not_modified += 1
+
+    def body(
+        self, collection: str, key: Optional[str], version: int, render: Callable[[], Any]
+    ) -> bytes:
+        # A key of None renders without caching the body.
+        if key is not None:
+            with self._lock:
+                cached = self._bodies.get((collection, key))
+                if cached is not None and cached[0] == version:
+                    self._hits += 1
+                    return cached[1]
+        body = encode_body(render())
+        with self._lock:
+            self._renders += 1
+            if key is not None:
+                self._store(collection, key, version, body)
+        return body
+
+    def _store(self, collection: str, key: str, version: int, body: bytes) -> None:
+        cached = self._bodies.get((collection, key))
+        if cached is not None and cached[0] > version:
+            return
+        if cached is None and len(self._bodies) >= self._max_bodies:
+            # Query parameters make keys client-controlled; drop stale
+            # bodies first and stop caching new keys if that is not enough.
+            self._bodies = {
+                entry: value
+                for entry, value in self._bodies.items()
+                if value[0] == self._versions[entry[0]]
+            }
+            if len(self._bodies) >= self._max_bodies:
+                return
+        self._bodies[(collection, key)] = (version, body)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "versions": dict(self._versions),
+                "renders": self._renders,
+                "hits": self._hits,
+                "not_modified": self._not_modified,
+            }
@@ -1,50 +1,76 @@
 import asyncio
 import datetime as dt
-import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional, Tuple
+from functools import partial
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, HTTPException, Query, Request, status
+from fastapi import Body, FastAPI, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 
 from .auth import require_device_auth, require_ui_auth
+from .cache import ItemMetadata, MetadataCache, SensorMetadata
 from .config import AppConfig, load_config
 from .db import (
+    ConnectionPool,
     dumps_json,
-    get_db,
     init_db,
     load_events_since,
+    load_recent_events,
     loads_json,
-    prune_events,
-    record_event,
+    record_events,
 )
-from .events import EventBroadcaster
+from .event_bus import EventTailer
+from .events import (
+    EVENT_TYPES,
+    KEEPALIVE_FRAME,
+    KEEPALIVE_INTERVAL_SECONDS,
+    RESYNC_FRAME,
+    EventBroadcaster,
+    EventFilter,
+    EventFrame,
+    ReplayCache,
+)
+from .export import EXPORT_FORMATS, ExportFilter, iter_export
+from .history import (
+    HISTORY_FORMATS,
+    RESOLUTIONS,
+    choose_resolution,
+    downsample,
+    fit_resolution,
+    history_columns,
+    load_histories,
+    load_history_columns,
+    load_raw_history_page,
+    load_rollup_history,
+    with_iso_ts,
+)
+from .ingest import IngestResult, InvalidReadingError, ingest_batch
+from .ingest_shards import ShardedIngest
+from .ingest_writer import GroupCommitWriter
+from .listings import ListingCache, changed_by_events, etag_matches
+from .maintenance import EventPruner, ReadingsRollup, run_periodically
 from .models import ItemCreate, ItemUpdate, ReadingsBatchIn, ThresholdsIn
-from .state import resolve_state
+from .pagination import InvalidCursorError, decode_cursor, split_page
+from .recent import RECENT_COLUMNS, RecentReadings
+from .reevaluate import reevaluate_sensor, rewrite_state_history
+from .sync import (
+    ItemChanges,
+    SensorChanges,
+    current_sync_version,
+    load_item_changes,
+    load_sensor_changes,
+)
+from .timestamps import MICROS_PER_SECOND, iso_to_micros, micros_to_iso, now_micros
+from .wire import PACKED_CONTENT_TYPE, PackedBatchError, decode_packed_batch
 
 
 def _utc_now() -> str:
     return dt.datetime.now(dt.timezone.utc).isoformat()
 
 
-def _parse_ts(value: str) -> dt.datetime:
-    if not value:
-        raise ValueError("Missing timestamp")
-    normalized = value.strip()
-    if normalized.endswith("Z"):
-        normalized = normalized[:-1] + "+00:00"
-    parsed = dt.datetime.fromisoformat(normalized)
-    if parsed.tzinfo is None:
-        parsed = parsed.replace(tzinfo=dt.timezone.utc)
-    return parsed.astimezone(dt.timezone.utc)
-
-
-def _normalize_ts(value: str) -> str:
-    return _parse_ts(value).isoformat()
-
-
 def _model_to_dict(model: Any) -> Dict[str, Any]:
     if hasattr(model, "model_dump"):
         return model.model_dump(exclude_unset=True)
@@ -68,13 +94,13 @@ def _parse_range(range_str: Optional[str]) -> dt.timedelta:
     raise HTTPException(status_code=400, detail="Invalid range unit")
 
 
-def _is_newer(new_ts: str, last_ts: Optional[str]) -> bool:
-    if not last_ts:
-        return True
-    try:
-        return _parse_ts(new_ts) >= _parse_ts(last_ts)
-    except ValueError:
-        return new_ts >= last_ts
+def _parse_filter_values(values: Optional[List[str]]) -> Optional[FrozenSet[str]]:
+    if not values:
+        return None
+    parsed = frozenset(
+        part.strip() for value in values for part in value.split(",") if part.strip()
+    )
+    return parsed or None
 
 
 def _parse_last_event_id(request: Request) -> Optional[int]:
@@ -89,144 +115,44 @@ def _parse_last_event_id(request: Request) -> Optional[int]:
         raise HTTPException(status_code=400, detail="Invalid Last-Event-ID") from exc
 
 
-def _upsert_device(conn, device_id: str, firmware: Optional[str], last_seen: str) -> None:
-    conn.execute(
-        """
-        INSERT INTO devices (id, firmware, last_seen)
-        VALUES (?, ?, ?)
-        ON CONFLICT(id) DO UPDATE SET firmware = excluded.firmware, last_seen = excluded.last_seen;
-        """,
-        (device_id, firmware, last_seen),
-    )
-
-
-def _upsert_sensor(
-    conn,
-    sensor_id: str,
-    device_id: str,
-    sensor_type: Optional[str] = None,
-    thresholds: Optional[Dict[str, float]] = None,
-    state_map: Optional[Dict[str, str]] = None,
-) -> None:
-    conn.execute(
-        """
-        INSERT OR IGNORE INTO sensors (id, device_id)
-        VALUES (?, ?);
-        """,
-        (sensor_id, device_id),
-    )
-    updates = ["device_id = ?"]
-    values: List[Any] = [device_id]
-    if sensor_type is not None:
-        updates.append("type = ?")
-        values.append(sensor_type)
-    if thresholds is not None:
-        updates.append("thresholds = ?")
-        values.append(dumps_json(thresholds))
-    if state_map is not None:
-        updates.append("state_map = ?")
-        values.append(dumps_json(state_map))
-    if updates:
-        values.append(sensor_id)
-        conn.execute(
-            f"UPDATE sensors SET {', '.join(updates)} WHERE id = ?;",
-            values,
-        )
-
-
-def _get_sensor_meta(
-    conn, sensor_id: str
-) -> Tuple[
-    Optional[str],
-    Optional[str],
-    Optional[Dict[str, float]],
-    Optional[Dict[str, str]],
-]:
-    row = conn.execute(
-        """
-        SELECT last_state, last_update, thresholds, state_map
-        FROM sensors
-        WHERE id = ?;
-        """,
-        (sensor_id,),
-    ).fetchone()
-    if not row:
-        return None, None, None, None
-    return (
-        row["last_state"],
-        row["last_update"],
-        loads_json(row["thresholds"]),
-        loads_json(row["state_map"]),
-    )
-
+def _parse_cursor(cursor: Optional[str], types: Tuple[type, ...]) -> Optional[Tuple[Any, ...]]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, types)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-def _update_sensor_state(
-    conn,
-    sensor_id: str,
-    state: str,
-    last_value: Optional[float],
-    ts: str,
-) -> None:
-    conn.execute(
-        """
-        UPDATE sensors
-        SET last_state = ?, last_value = ?, last_update = ?
-        WHERE id = ?;
-        """,
-        (state, last_value, ts, sensor_id),
-    )
 
+def _page_limit(request: Request, limit: Optional[int]) -> int:
+    config: AppConfig = request.app.state.config
+    page_limit = max(1, config.page_limit)
+    return page_limit if limit is None else min(limit, page_limit)
 
-def _get_item_for_sensor(conn, sensor_id: str) -> Optional[Dict[str, Any]]:
-    row = conn.execute(
-        """
-        SELECT id, name, thresholds, unit, image_url
-        FROM items
-        WHERE sensor_id = ?;
-        """,
-        (sensor_id,),
-    ).fetchone()
-    if not row:
-        return None
-    item = dict(row)
-    item["thresholds"] = loads_json(item["thresholds"])
-    return item
-
-
-def _create_alert(
-    conn,
-    sensor_id: str,
-    item_id: Optional[str],
-    alert_type: str,
-    message: str,
-    created_at: str,
-) -> int:
-    cursor = conn.execute(
-        """
-        INSERT INTO alerts (item_id, sensor_id, type, status, message, created_at)
-        VALUES (?, ?, ?, 'active', ?, ?);
-        """,
-        (item_id, sensor_id, alert_type, message, created_at),
-    )
-    return int(cursor.lastrowid)
 
-
-def _resolve_alerts(conn, sensor_id: str, resolved_at: str) -> None:
-    conn.execute(
-        """
-        UPDATE alerts
-        SET status = 'resolved', resolved_at = ?
-        WHERE sensor_id = ? AND status = 'active';
-        """,
-        (resolved_at, sensor_id),
-    )
+def _load_replay(
+    db: ConnectionPool, last_event_id: int, limit: int, event_filter: Optional[EventFilter]
+) -> List[EventFrame]:
+    with db.reader() as conn:
+        return load_events_since(conn, last_event_id, limit, event_filter)
 
 
 config_snapshot = load_config()
 
 app = FastAPI(title="Smart Inventory Server", version="0.1.0")
 app.state.config = config_snapshot
-app.state.events = EventBroadcaster(config_snapshot.event_queue_size)
+app.state.events = EventBroadcaster(config_snapshot.event_log_size)
+app.state.metadata = MetadataCache()
+app.state.listings = ListingCache()
+app.state.db = ConnectionPool(config_snapshot)
+app.state.replay = ReplayCache(app.state.events, partial(_load_replay, app.state.db))
+app.state.ingest_writer = None
+app.state.ingest_shards = None
+app.state.pruner = EventPruner(app.state.db, config_snapshot)
+app.state.recent = None
+app.state.rollup = ReadingsRollup(app.state.db, config_snapshot)
+app.state.tailer = None
+app.state.background_tasks = []
 app.state.loop = None
 
 if config_snapshot.cors_origins:
@@ -243,26 +169,132 @@ if config_snapshot.cors_origins:
 async def _startup() -> None:
     config = load_config()
     app.state.config = config
-    app.state.events = EventBroadcaster(config.event_queue_size)
+    app.state.events = EventBroadcaster(config.event_log_size)
+    app.state.metadata = MetadataCache()
+    app.state.listings = ListingCache()
+    app.state.db = ConnectionPool(config)
     app.state.loop = asyncio.get_running_loop()
     init_db(config)
+    with app.state.db.reader() as conn:
+        recent = load_recent_events(conn, config.event_log_size)
+        sync_version = current_sync_version(conn)
+    app.state.events.warm(recent, complete=len(recent) < config.event_log_size)
+    app.state.recent = None
+    if config.recent_readings > 0:
+        app.state.recent = RecentReadings(config.recent_readings)
+        with app.state.db.reader() as conn:
+            sensor_ids = [row["id"] for row in conn.execute("SELECT id FROM sensors;")]
+            app.state.recent.warm(conn, sensor_ids)
+    app.state.replay = ReplayCache(app.state.events, partial(_load_replay, app.state.db))
+    app.state.ingest_writer = None
+    app.state.ingest_shards = None
+    if config.ingest_mode == "group":
+        writer = GroupCommitWriter(
+            app.state.db,
+            app.state.metadata,
+            commit_window_ms=config.ingest_commit_window_ms,
+            max_group_readings=config.ingest_group_max_readings,
+        )
+        writer.start()
+        app.state.ingest_writer = writer
+    elif config.ingest_mode == "sharded":
+        shards = ShardedIngest(
+            config, app.state.db, app.state.metadata, workers=config.ingest_workers
+        )
+        shards.start()
+        app.state.ingest_shards = shards
+    elif config.ingest_mode != "direct":
+        logging.warning("Unknown INVENTORY_INGEST_MODE %r; using direct", config.ingest_mode)
+    app.state.pruner = EventPruner(app.state.db, config)
+    app.state.rollup = ReadingsRollup(app.state.db, config, app.state.recent)
+    app.state.tailer = None
+    if config.event_bus == "db":
+        tailer = EventTailer(
+            app.state.db,
+            app.state.events,
+            app.state.metadata,
+            app.state.pruner,
+            app.state.listings,
+            app.state.recent,
+            app.state.ingest_shards,
+            poll_interval_ms=config.event_poll_interval_ms,
+        )
+        tailer.start_after(recent[-1].event_id if recent else 0, sync_version)
+        app.state.tailer = tailer
+    elif config.event_bus != "local":
+        logging.warning("Unknown INVENTORY_EVENT_BUS %r; using local", config.event_bus)
+    app.state.background_tasks = [
+        asyncio.create_task(app.state.events.run_keepalive(KEEPALIVE_INTERVAL_SECONDS)),
+        asyncio.create_task(
+            run_periodically(
+                "Event pruning",
+                app.state.pruner.run_once,
+                max(1, config.event_prune_interval_seconds),
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                "Readings rollup",
+                app.state.rollup.run_once,
+                max(1, config.rollup_interval_seconds),
+            )
+        ),
+    ]
+    if app.state.tailer is not None:
+        app.state.background_tasks.append(asyncio.create_task(app.state.tailer.run()))
     if not config.device_tokens and not config.allow_unauth:
         logging.warning("Device auth disabled with INVENTORY_ALLOW_UNAUTH=false")
     if not config.ui_token and not config.allow_unauth:
         logging.warning("UI auth disabled with INVENTORY_ALLOW_UNAUTH=false")
 
 
-def _broadcast(request: Request, event: Dict[str, Any]) -> None:
-    config: AppConfig = request.app.state.config
-    now = _utc_now()
-    with get_db(config) as conn:
-        event_id = record_event(conn, event, now)
-        prune_events(conn, config.event_retention_seconds, config.event_max_rows, now)
-    event["event_id"] = event_id
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    for task in app.state.background_tasks:
+        task.cancel()
+    if app.state.ingest_writer is not None:
+        app.state.ingest_writer.stop()
+    if app.state.ingest_shards is not None:
+        app.state.ingest_shards.stop()
+    app.state.db.close()
+
+
+def _invalidate_metadata(request: Request) -> None:
+    request.app.state.metadata.invalidate()
+    # Item edits change thresholds shown with sensors and names joined into alerts.
+    request.app.state.listings.bump(("items", "sensors", "alerts"))
+    shards: Optional[ShardedIngest] = request.app.state.ingest_shards
+    if shards is not None:
+        shards.invalidate()
+
+
+def _listing_response(
+    request: Request, collection: str, key: Optional[str], render: Callable[[], Dict[str, Any]]
+) -> Response:
+    listings: ListingCache = request.app.state.listings
+    version = listings.version(collection)
+    etag = listings.etag(collection, version)
+    # no-cache lets browsers keep the body but revalidate on every poll.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        listings.note_not_modified()
+        return Response(status_code=304, headers=headers)
+    body = listings.body(collection, key, version, render)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _publish_events(request: Request, frames: List[EventFrame]) -> None:
+    if not frames:
+        return
+    request.app.state.pruner.note_recorded(len(frames))
+    tailer: Optional[EventTailer] = request.app.state.tailer
+    if tailer is not None:
+        tailer.note_local(frames)
+        return
     loop = request.app.state.loop
     if loop is None:
         return
-    asyncio.run_coroutine_threadsafe(request.app.state.events.publish(event), loop)
+    loop.call_soon_threadsafe(request.app.state.events.publish_many, frames)
 
 
 @app.get("/api/v1/health")
@@ -270,175 +302,208 @@ def health() -> Dict[str, str]:
     return {"status": "ok", "time": _utc_now()}
 
 
+@app.get("/api/v1/metrics")
+def metrics(request: Request) -> Dict[str, Any]:
+    require_ui_auth(request)
+    writer: Optional[GroupCommitWriter] = request.app.state.ingest_writer
+    shards: Optional[ShardedIngest] = request.app.state.ingest_shards
+    tailer: Optional[EventTailer] = request.app.state.tailer
+    recent: Optional[RecentReadings] = request.app.state.recent
+    return {
+        "metadata_cache": request.app.state.metadata.stats(),
+        "db_pool": request.app.state.db.stats(),
+        "ingest_writer": writer.stats() if writer else None,
+        "ingest_shards": shards.stats() if shards else None,
+        "listings": request.app.state.listings.stats(),
+        "recent_readings": recent.stats() if recent else None,
+        "event_log": request.app.state.events.stats(),
+        "event_replay": request.app.state.replay.stats(),
+        "event_bus": tailer.stats() if tailer else None,
+        "event_pruner": request.app.state.pruner.stats(),
+        "readings_rollup": request.app.state.rollup.stats(),
+    }
+
+
+def _ingest_direct(request: Request, batch: ReadingsBatchIn, now: int) -> IngestResult:
+    db: ConnectionPool = request.app.state.db
+    cache: MetadataCache = request.app.state.metadata
+    with cache.write_lock:
+        with db.writer() as conn:
+            result = ingest_batch(conn, batch, now, cache)
+        cache.store_sensors(result.sensors)
+    return result
+
+
+def _ingest(request: Request, batch: Union[ReadingsBatchIn, bytes]) -> Dict[str, Any]:
+    # Raw packed bytes are only passed when sharded; the workers decode them.
+    now = now_micros()
+    writer: Optional[GroupCommitWriter] = request.app.state.ingest_writer
+    shards: Optional[ShardedIngest] = request.app.state.ingest_shards
+    try:
+        if shards is not None:
+            result = shards.submit(batch, now)
+        elif writer is not None:
+            result = writer.submit(batch, now)
+        else:
+            result = _ingest_direct(request, batch, now)
+    except (InvalidReadingError, PackedBatchError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    recent: Optional[RecentReadings] = request.app.state.recent
+    if recent is not None and result.rows:
+        recent.record(result.rows)
+    changed = changed_by_events(result.events)
+    # Every batch refreshes the device's last_seen.
+    changed.add("devices")
+    if result.sensors:
+        changed.update(("items", "sensors"))
+    request.app.state.listings.bump(changed)
+    _publish_events(request, result.events)
+
+    return {"ack_seq_id": result.ack_seq_id, "server_time": micros_to_iso(now)}
+
+
 @app.post("/api/v1/readings/batch")
 def ingest_readings(batch: ReadingsBatchIn, request: Request) -> Dict[str, Any]:
     require_device_auth(request)
-    config: AppConfig = request.app.state.config
-    now = _utc_now()
-    ack_seq: Optional[int] = None
-    events: List[Dict[str, Any]] = []
-    sensor_meta_lookup: Dict[str, Any] = {}
-    if batch.sensor_meta:
-        sensor_meta_lookup = {meta.sensor_id: meta for meta in batch.sensor_meta}
-
-    with get_db(config) as conn:
-        _upsert_device(conn, batch.device_id, batch.firmware, now)
-
-        for reading in batch.readings:
-            try:
-                reading_ts = _normalize_ts(reading.ts)
-            except ValueError as exc:
-                raise HTTPException(status_code=400, detail="Invalid reading timestamp") from exc
-            meta = sensor_meta_lookup.get(reading.sensor_id)
-            _upsert_sensor(
-                conn,
-                reading.sensor_id,
-                batch.device_id,
-                sensor_type=meta.type if meta else None,
-                thresholds=meta.thresholds if meta else None,
-                state_map=meta.state_map if meta else None,
-            )
-            prev_state, prev_ts, sensor_thresholds, sensor_state_map = _get_sensor_meta(
-                conn, reading.sensor_id
-            )
-            item = _get_item_for_sensor(conn, reading.sensor_id)
-            item_thresholds = item["thresholds"] if item else None
-            effective_thresholds = (
-                item_thresholds if item_thresholds is not None else sensor_thresholds
-            )
-            resolved_state = resolve_state(
-                reading.normalized_value,
-                reading.state,
-                prev_state,
-                effective_thresholds,
-                sensor_state_map,
-            )
-            cursor = conn.execute(
-                """
-                INSERT OR IGNORE INTO readings
-                (device_id, seq_id, sensor_id, ts, raw_value, normalized_value, state, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-                """,
-                (
-                    batch.device_id,
-                    reading.seq_id,
-                    reading.sensor_id,
-                    reading_ts,
-                    reading.raw_value,
-                    reading.normalized_value,
-                    resolved_state,
-                    now,
-                ),
-            )
-            ack_seq = reading.seq_id
-            if cursor.rowcount == 0:
-                continue
-
-            if _is_newer(reading_ts, prev_ts):
-                _update_sensor_state(
-                    conn,
-                    reading.sensor_id,
-                    resolved_state,
-                    reading.normalized_value,
-                    reading_ts,
-                )
+    return _ingest(request, batch)
 
-            events.append(
-                {
-                    "type": "item_status_update",
-                    "sensor_id": reading.sensor_id,
-                    "item_id": item["id"] if item else None,
-                    "state": resolved_state,
-                    "normalized_value": reading.normalized_value,
-                    "ts": reading_ts,
-                }
-            )
 
-            if prev_state != resolved_state:
-                if resolved_state in {"low", "out"}:
-                    item_name = item["name"] if item else None
-                    message = (
-                        f"{item_name} is {resolved_state}"
-                        if item_name
-                        else f"Sensor {reading.sensor_id} is {resolved_state}"
-                    )
-                    alert_id = _create_alert(
-                        conn,
-                        reading.sensor_id,
-                        item["id"] if item else None,
-                        resolved_state,
-                        message,
-                        now,
-                    )
-                    events.append(
-                        {
-                            "type": "alert_created",
-                            "alert_id": alert_id,
-                            "sensor_id": reading.sensor_id,
-                            "item_id": item["id"] if item else None,
-                            "state": resolved_state,
-                            "created_at": now,
-                            "message": message,
-                        }
-                    )
-                if resolved_state == "ok":
-                    _resolve_alerts(conn, reading.sensor_id, now)
-                    events.append(
-                        {
-                            "type": "alert_resolved",
-                            "sensor_id": reading.sensor_id,
-                            "item_id": item["id"] if item else None,
-                            "resolved_at": now,
-                        }
-                    )
-
-    for event in events:
-        _broadcast(request, event)
-
-    return {"ack_seq_id": ack_seq, "server_time": now}
-
-
-@app.get("/api/v1/items")
-def list_items(request: Request) -> Dict[str, Any]:
+@app.post("/api/v1/readings/batch/packed")
+def ingest_packed_readings(
+    request: Request, body: bytes = Body(..., media_type=PACKED_CONTENT_TYPE)
+) -> Dict[str, Any]:
+    require_device_auth(request)
+    if request.app.state.ingest_shards is not None:
+        return _ingest(request, body)
+    try:
+        batch = decode_packed_batch(body)
+    except PackedBatchError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _ingest(request, batch)
+
+
+def _parse_export_time(value: Optional[str], name: str) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return iso_to_micros(value)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}") from exc
+
+
+def _stream_export(
+    db: ConnectionPool, export_filter: ExportFilter, fmt: str, compress: bool
+) -> Iterator[bytes]:
+    with db.detached_reader() as conn:
+        yield from iter_export(conn, export_filter, fmt, compress)
+
+
+@app.get("/api/v1/readings/export")
+def export_readings(
+    request: Request,
+    export_format: str = Query(default="ndjson", alias="format"),
+    sensor_id: Optional[List[str]] = Query(default=None),
+    device_id: Optional[List[str]] = Query(default=None),
+    since: Optional[str] = Query(default=None),
+    until: Optional[str] = Query(default=None),
+    gzip: bool = Query(default=False),
+) -> StreamingResponse:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
-    with get_db(config) as conn:
-        rows = conn.execute(
-            """
-            SELECT items.id, items.name, items.sensor_id, items.thresholds,
-                   items.unit, items.image_url, items.created_at, items.updated_at,
-                   sensors.last_state, sensors.last_update, sensors.last_value
-            FROM items
-            LEFT JOIN sensors ON items.sensor_id = sensors.id
-            ORDER BY items.name ASC;
-            """
-        ).fetchall()
-    items = []
-    for row in rows:
-        thresholds = loads_json(row["thresholds"])
-        items.append(
-            {
-                "id": row["id"],
-                "name": row["name"],
-                "sensor_id": row["sensor_id"],
-                "thresholds": thresholds,
-                "unit": row["unit"],
-                "image_url": row["image_url"],
-                "status": row["last_state"] or "unknown",
-                "last_update": row["last_update"],
-                "last_value": row["last_value"],
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"],
-            }
-        )
-    return {"items": items}
+    fmt = export_format.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid export format")
+    export_filter = ExportFilter(
+        sensor_ids=_parse_filter_values(sensor_id),
+        device_ids=_parse_filter_values(device_id),
+        since=_parse_export_time(since, "since"),
+        until=_parse_export_time(until, "until"),
+    )
+    filename = f"readings.{fmt}" + (".gz" if gzip else "")
+    stream = _stream_export(request.app.state.db, export_filter, fmt, gzip)
+    # Starlette stops iterating when the client disconnects but leaves the
+    # generator suspended; closing it releases the detached connection then
+    # instead of whenever the generator is collected.
+    return StreamingResponse(
+        stream,
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(stream.close),
+    )
+
+
+def _item_entry(item: ItemMetadata, sensor: Optional[SensorMetadata]) -> Dict[str, Any]:
+    return {
+        "id": item.id,
+        "name": item.name,
+        "sensor_id": item.sensor_id,
+        "thresholds": item.thresholds,
+        "unit": item.unit,
+        "image_url": item.image_url,
+        "status": (sensor.last_state if sensor else None) or "unknown",
+        "last_update": micros_to_iso(sensor.last_update) if sensor else None,
+        "last_value": sensor.last_value if sensor else None,
+        "created_at": item.created_at,
+        "updated_at": item.updated_at,
+    }
+
+
+def _sensor_entry(meta: SensorMetadata) -> Dict[str, Any]:
+    return {
+        "id": meta.sensor_id,
+        "device_id": meta.device_id,
+        "type": meta.type,
+        "thresholds": meta.thresholds,
+        "state_map": meta.state_map,
+        "last_state": meta.last_state,
+        "last_value": meta.last_value,
+        "last_update": micros_to_iso(meta.last_update),
+    }
+
+
+def _load_changes(request: Request, load: Callable[[Any, int], Any], since_version: int) -> Any:
+    db: ConnectionPool = request.app.state.db
+    with db.reader() as conn:
+        # One snapshot for the version and the rows it covers.
+        conn.execute("BEGIN;")
+        return load(conn, since_version)
+
+
+@app.get("/api/v1/items", response_model=None)
+def list_items(
+    request: Request, since_version: Optional[int] = Query(default=None, ge=0)
+) -> Union[Response, Dict[str, Any]]:
+    require_ui_auth(request)
+    if since_version is not None:
+        changes: ItemChanges = _load_changes(request, load_item_changes, since_version)
+        return {
+            "items": [_item_entry(item, sensor) for item, sensor in changes.items],
+            "deleted": changes.deleted,
+            "version": changes.version,
+        }
+    return _listing_response(request, "items", "", partial(_render_items, request))
+
+
+def _render_items(request: Request) -> Dict[str, Any]:
+    db: ConnectionPool = request.app.state.db
+    cache: MetadataCache = request.app.state.metadata
+    with db.reader() as conn:
+        item_rows = cache.all_items(conn)
+        sensors = {meta.sensor_id: meta for meta in cache.all_sensors(conn)}
+    return {
+        "items": [
+            _item_entry(item, sensors.get(item.sensor_id) if item.sensor_id else None)
+            for item in item_rows
+        ]
+    }
 
 
 @app.get("/api/v1/items/{item_id}")
 def get_item(item_id: str, request: Request) -> Dict[str, Any]:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
-    with get_db(config) as conn:
+    db: ConnectionPool = request.app.state.db
+    recent: Optional[RecentReadings] = request.app.state.recent
+    with db.reader() as conn:
         item_row = conn.execute(
             """
             SELECT id, name, sensor_id, thresholds, unit, image_url, created_at, updated_at
@@ -450,19 +515,24 @@ def get_item(item_id: str, request: Request) -> Dict[str, Any]:
         if not item_row:
             raise HTTPException(status_code=404, detail="Item not found")
         latest = None
-        if item_row["sensor_id"]:
-            latest_row = conn.execute(
-                """
-                SELECT seq_id, ts, raw_value, normalized_value, state
-                FROM readings
-                WHERE sensor_id = ?
-                ORDER BY ts DESC
-                LIMIT 1;
-                """,
-                (item_row["sensor_id"],),
-            ).fetchone()
+        sensor_id = item_row["sensor_id"]
+        if sensor_id:
+            if recent is not None:
+                latest_row = recent.latest(conn, sensor_id)
+            else:
+                latest_row = conn.execute(
+                    """
+                    SELECT seq_id, ts, raw_value, normalized_value, state
+                    FROM readings
+                    WHERE sensor_id = ?
+                    ORDER BY ts DESC
+                    LIMIT 1;
+                    """,
+                    (sensor_id,),
+                ).fetchone()
             if latest_row:
-                latest = dict(latest_row)
+                latest = dict(zip(RECENT_COLUMNS, latest_row))
+                latest["ts"] = micros_to_iso(latest["ts"])
     return {
         "id": item_row["id"],
         "name": item_row["name"],
@@ -482,76 +552,196 @@ def item_history(
     request: Request,
     range: Optional[str] = Query(default="7d"),
     limit: int = Query(default=500, ge=1),
+    resolution: Optional[str] = Query(default=None),
+    points: Optional[int] = Query(default=None, ge=2),
+    cursor: Optional[str] = Query(default=None),
+    history_format: str = Query(default="rows", alias="format"),
 ) -> Dict[str, Any]:
     require_ui_auth(request)
     config: AppConfig = request.app.state.config
+    db: ConnectionPool = request.app.state.db
+    recent: Optional[RecentReadings] = request.app.state.recent
+    after = _parse_cursor(cursor, (int, int))
+    history_format = history_format.lower()
+    if history_format not in HISTORY_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid history format")
     delta = _parse_range(range)
-    since = (dt.datetime.now(dt.timezone.utc) - delta).isoformat()
+    since = now_micros() - int(delta.total_seconds() * MICROS_PER_SECOND)
     if limit > config.history_limit:
         limit = config.history_limit
-
-    with get_db(config) as conn:
+    legacy = resolution is None and points is None
+    resolution = (resolution or "auto").lower()
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="Invalid resolution")
+    budget = min(points or limit, config.history_limit)
+    if resolution == "auto":
+        resolution = choose_resolution(delta.total_seconds(), budget)
+    resolution = fit_resolution(resolution, delta.total_seconds(), budget)
+    if after is not None and not legacy and resolution != "raw":
+        raise HTTPException(status_code=400, detail="Cursor requires raw history")
+
+    with db.reader() as conn:
         item_row = conn.execute(
             "SELECT sensor_id FROM items WHERE id = ?;", (item_id,)
         ).fetchone()
         if not item_row:
             raise HTTPException(status_code=404, detail="Item not found")
         sensor_id = item_row["sensor_id"]
+        next_cursor = None
+        if history_format == "columnar":
+            if legacy:
+                resolution = "raw"
+            resolution, columns, next_cursor = load_history_columns(
+                conn, sensor_id, resolution, since, budget, after, recent
+            )
+            return {
+                "item_id": item_id,
+                "resolution": resolution,
+                "format": history_format,
+                **columns,
+                "next_cursor": next_cursor,
+            }
+        if legacy:
+            readings = []
+            if sensor_id:
+                readings, next_cursor = load_raw_history_page(
+                    conn, sensor_id, since, limit, after, recent
+                )
+            return {
+                "item_id": item_id,
+                "readings": with_iso_ts(readings),
+                "next_cursor": next_cursor,
+            }
         if not sensor_id:
-            return {"item_id": item_id, "readings": []}
-        rows = conn.execute(
-            """
-            SELECT seq_id, ts, raw_value, normalized_value, state
-            FROM readings
-            WHERE sensor_id = ? AND ts >= ?
-            ORDER BY ts ASC
-            LIMIT ?;
-            """,
-            (sensor_id, since, limit),
-        ).fetchall()
-    return {"item_id": item_id, "readings": [dict(row) for row in rows]}
+            readings = []
+        elif resolution == "raw":
+            readings, next_cursor = load_raw_history_page(
+                conn, sensor_id, since, budget, after, recent
+            )
+        elif resolution == "lttb":
+            resolution, histories = load_histories(
+                conn, [sensor_id], resolution, since, budget, recent
+            )
+            readings = histories[sensor_id]
+        else:
+            readings = downsample(
+                load_rollup_history(conn, sensor_id, resolution, since), budget
+            )
+    return {
+        "item_id": item_id,
+        "resolution": resolution,
+        "readings": with_iso_ts(readings),
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/api/v1/history")
+def bulk_history(
+    request: Request,
+    item_id: Optional[List[str]] = Query(default=None),
+    sensor_id: Optional[List[str]] = Query(default=None),
+    range: Optional[str] = Query(default="7d"),
+    points: int = Query(default=100, ge=2),
+    resolution: Optional[str] = Query(default=None),
+    history_format: str = Query(default="rows", alias="format"),
+) -> Dict[str, Any]:
+    require_ui_auth(request)
+    config: AppConfig = request.app.state.config
+    db: ConnectionPool = request.app.state.db
+    cache: MetadataCache = request.app.state.metadata
+    item_ids = sorted(_parse_filter_values(item_id) or ())
+    sensor_ids = sorted(_parse_filter_values(sensor_id) or ())
+    if not item_ids and not sensor_ids:
+        raise HTTPException(status_code=400, detail="item_id or sensor_id is required")
+    if len(item_ids) + len(sensor_ids) > config.page_limit:
+        raise HTTPException(status_code=400, detail="Too many ids")
+    history_format = history_format.lower()
+    if history_format not in HISTORY_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid history format")
+    delta = _parse_range(range)
+    since = now_micros() - int(delta.total_seconds() * MICROS_PER_SECOND)
+    budget = min(points, config.history_limit)
+    resolution = (resolution or "auto").lower()
+    if resolution not in RESOLUTIONS or resolution == "raw":
+        raise HTTPException(status_code=400, detail="Invalid resolution")
+    if resolution == "auto":
+        resolution = choose_resolution(delta.total_seconds(), budget)
+    resolution = fit_resolution(resolution, delta.total_seconds(), budget)
+
+    with db.reader() as conn:
+        wanted = set(item_ids)
+        series = [
+            {"item_id": item.id, "sensor_id": item.sensor_id}
+            for item in sorted(cache.all_items(conn), key=lambda item: item.id)
+            if item.id in wanted
+        ]
+        series.extend({"item_id": None, "sensor_id": value} for value in sensor_ids)
+        resolution, histories = load_histories(
+            conn,
+            sorted({entry["sensor_id"] for entry in series if entry["sensor_id"]}),
+            resolution,
+            since,
+            budget,
+            request.app.state.recent,
+        )
+    for entry in series:
+        rows = histories.get(entry["sensor_id"], [])
+        if history_format == "columnar":
+            entry.update(history_columns(rows, resolution))
+        else:
+            entry["readings"] = with_iso_ts([dict(row) for row in rows])
+    return {"resolution": resolution, "format": history_format, "series": series}
 
 
 @app.post("/api/v1/items")
 def create_item(payload: ItemCreate, request: Request) -> Dict[str, Any]:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
+    db: ConnectionPool = request.app.state.db
     item_id = str(uuid.uuid4())
     now = _utc_now()
-    with get_db(config) as conn:
-        conn.execute(
-            """
-            INSERT INTO items (id, sensor_id, name, thresholds, unit, image_url, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                item_id,
-                payload.sensor_id,
-                payload.name,
-                dumps_json(payload.thresholds),
-                payload.unit,
-                payload.image_url,
-                now,
-                now,
-            ),
-        )
-        if payload.sensor_id and payload.thresholds is not None:
+    cache: MetadataCache = request.app.state.metadata
+    with cache.write_lock:
+        with db.writer() as conn:
             conn.execute(
-                "UPDATE sensors SET thresholds = ? WHERE id = ?;",
-                (dumps_json(payload.thresholds), payload.sensor_id),
+                """
+                INSERT INTO items (id, sensor_id, name, thresholds, unit, image_url, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+                """,
+                (
+                    item_id,
+                    payload.sensor_id,
+                    payload.name,
+                    dumps_json(payload.thresholds),
+                    payload.unit,
+                    payload.image_url,
+                    now,
+                    now,
+                ),
             )
+            if payload.sensor_id and payload.thresholds is not None:
+                conn.execute(
+                    "UPDATE sensors SET thresholds = ? WHERE id = ?;",
+                    (dumps_json(payload.thresholds), payload.sensor_id),
+                )
+        _invalidate_metadata(request)
     return {"id": item_id, "created_at": now}
 
 
 @app.put("/api/v1/items/{item_id}")
-def update_item(item_id: str, payload: ItemUpdate, request: Request) -> Dict[str, Any]:
+def update_item(
+    item_id: str,
+    payload: ItemUpdate,
+    request: Request,
+    rewrite_history: bool = Query(default=False),
+) -> Dict[str, Any]:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
+    db: ConnectionPool = request.app.state.db
     now = _utc_now()
     fields = []
     values: List[Any] = []
 
-    for key, value in _model_to_dict(payload).items():
+    changes = _model_to_dict(payload)
+    for key, value in changes.items():
         if key == "thresholds":
             fields.append("thresholds = ?")
             values.append(dumps_json(value))
@@ -565,81 +755,147 @@ def update_item(item_id: str, payload: ItemUpdate, request: Request) -> Dict[str
     values.append(now)
     values.append(item_id)
 
-    with get_db(config) as conn:
-        cursor = conn.execute(
-            f"UPDATE items SET {', '.join(fields)} WHERE id = ?;",
-            values,
-        )
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Item not found")
-        row = conn.execute(
-            "SELECT sensor_id, thresholds FROM items WHERE id = ?;", (item_id,)
-        ).fetchone()
-        if row and row["sensor_id"]:
-            conn.execute(
-                "UPDATE sensors SET thresholds = ? WHERE id = ?;",
-                (row["thresholds"], row["sensor_id"]),
+    cache: MetadataCache = request.app.state.metadata
+    with cache.write_lock:
+        with db.writer() as conn:
+            cursor = conn.execute(
+                f"UPDATE items SET {', '.join(fields)} WHERE id = ?;",
+                values,
             )
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Item not found")
+            row = conn.execute(
+                "SELECT sensor_id, thresholds FROM items WHERE id = ?;", (item_id,)
+            ).fetchone()
+            sensor_id = row["sensor_id"] if row else None
+            frames: List[EventFrame] = []
+            if sensor_id:
+                conn.execute(
+                    "UPDATE sensors SET thresholds = ? WHERE id = ?;",
+                    (row["thresholds"], sensor_id),
+                )
+                if "thresholds" in changes or "sensor_id" in changes:
+                    frames = reevaluate_sensor(conn, sensor_id, now_micros())
+        _invalidate_metadata(request)
+    _publish_events(request, frames)
 
-    return {"id": item_id, "updated_at": now}
+    response: Dict[str, Any] = {"id": item_id, "updated_at": now}
+    if rewrite_history and sensor_id:
+        response["rewritten_readings"] = _rewrite_history(request, sensor_id)
+    return response
 
 
 @app.post("/api/v1/items/{item_id}/thresholds")
 def update_thresholds(
-    item_id: str, payload: ThresholdsIn, request: Request
+    item_id: str,
+    payload: ThresholdsIn,
+    request: Request,
+    rewrite_history: bool = Query(default=False),
 ) -> Dict[str, Any]:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
+    db: ConnectionPool = request.app.state.db
     now = _utc_now()
-    with get_db(config) as conn:
-        cursor = conn.execute(
-            """
-            UPDATE items
-            SET thresholds = ?, updated_at = ?
-            WHERE id = ?;
-            """,
-            (dumps_json(_model_to_dict(payload)), now, item_id),
-        )
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Item not found")
-        row = conn.execute(
-            "SELECT sensor_id FROM items WHERE id = ?;", (item_id,)
-        ).fetchone()
-        if row and row["sensor_id"]:
-            conn.execute(
-                "UPDATE sensors SET thresholds = ? WHERE id = ?;",
-                (dumps_json(_model_to_dict(payload)), row["sensor_id"]),
+    cache: MetadataCache = request.app.state.metadata
+    with cache.write_lock:
+        with db.writer() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE items
+                SET thresholds = ?, updated_at = ?
+                WHERE id = ?;
+                """,
+                (dumps_json(_model_to_dict(payload)), now, item_id),
             )
-    return {"id": item_id, "updated_at": now}
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Item not found")
+            row = conn.execute(
+                "SELECT sensor_id FROM items WHERE id = ?;", (item_id,)
+            ).fetchone()
+            sensor_id = row["sensor_id"] if row else None
+            frames: List[EventFrame] = []
+            if sensor_id:
+                conn.execute(
+                    "UPDATE sensors SET thresholds = ? WHERE id = ?;",
+                    (dumps_json(_model_to_dict(payload)), sensor_id),
+                )
+                frames = reevaluate_sensor(conn, sensor_id, now_micros())
+        _invalidate_metadata(request)
+    _publish_events(request, frames)
+
+    response: Dict[str, Any] = {"id": item_id, "updated_at": now}
+    if rewrite_history and sensor_id:
+        response["rewritten_readings"] = _rewrite_history(request, sensor_id)
+    return response
+
+
+def _rewrite_history(request: Request, sensor_id: str) -> int:
+    db: ConnectionPool = request.app.state.db
+    rewritten = rewrite_state_history(db, sensor_id)
+    recent: Optional[RecentReadings] = request.app.state.recent
+    if recent is not None:
+        recent.invalidate([sensor_id])
+    # The rewrite settles the current state from the whole history; pick up
+    # the rare case where hysteresis from older readings changes it.
+    cache: MetadataCache = request.app.state.metadata
+    with cache.write_lock:
+        with db.writer() as conn:
+            frames = reevaluate_sensor(conn, sensor_id, now_micros())
+        if frames:
+            _invalidate_metadata(request)
+    _publish_events(request, frames)
+    return rewritten
 
 
 @app.get("/api/v1/alerts")
 def list_alerts(
-    request: Request, status: str = Query(default="active")
-) -> Dict[str, Any]:
+    request: Request,
+    status: str = Query(default="active"),
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None),
+) -> Response:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
-    with get_db(config) as conn:
-        rows = conn.execute(
-            """
-            SELECT alerts.id, alerts.item_id, alerts.sensor_id, alerts.type, alerts.status,
-                   alerts.message, alerts.created_at, alerts.resolved_at, items.name
-            FROM alerts
-            LEFT JOIN items ON alerts.item_id = items.id
-            WHERE alerts.status = ?
-            ORDER BY alerts.created_at DESC;
-            """,
-            (status,),
-        ).fetchall()
-    return {"alerts": [dict(row) for row in rows]}
+    limit = _page_limit(request, limit)
+    before = _parse_cursor(cursor, (int, int))
+    # Only first pages are worth keeping; later ones are still revalidated.
+    key = f"{status}:{limit}" if before is None else None
+    return _listing_response(
+        request, "alerts", key, partial(_render_alerts, request, status, limit, before)
+    )
+
+
+def _render_alerts(
+    request: Request, alert_status: str, limit: int, before: Optional[Tuple[int, int]]
+) -> Dict[str, Any]:
+    db: ConnectionPool = request.app.state.db
+    query = """
+        SELECT alerts.id, alerts.item_id, alerts.sensor_id, alerts.type, alerts.status,
+               alerts.message, alerts.created_at, alerts.resolved_at, items.name
+        FROM alerts
+        LEFT JOIN items ON alerts.item_id = items.id
+        WHERE alerts.status = ?
+    """
+    params: List[Any] = [alert_status]
+    if before is not None:
+        query += " AND (alerts.created_at, alerts.id) < (?, ?)"
+        params.extend(before)
+    query += " ORDER BY alerts.created_at DESC, alerts.id DESC LIMIT ?;"
+    params.append(limit + 1)
+    with db.reader() as conn:
+        rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+    alerts, next_cursor = split_page(rows, limit, lambda row: (row["created_at"], row["id"]))
+    for alert in alerts:
+        alert["created_at"] = micros_to_iso(alert["created_at"])
+        alert["resolved_at"] = micros_to_iso(alert["resolved_at"])
+    return {"alerts": alerts, "next_cursor": next_cursor}
 
 
 @app.post("/api/v1/alerts/{alert_id}/ack")
 def ack_alert(alert_id: int, request: Request) -> Dict[str, Any]:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
-    now = _utc_now()
-    with get_db(config) as conn:
+    db: ConnectionPool = request.app.state.db
+    now = now_micros()
+    now_iso = micros_to_iso(now)
+    with db.writer() as conn:
         cursor = conn.execute(
             """
             UPDATE alerts
@@ -650,93 +906,139 @@ def ack_alert(alert_id: int, request: Request) -> Dict[str, Any]:
         )
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Alert not found")
-    _broadcast(
-        request,
-        {"type": "alert_acknowledged", "alert_id": alert_id, "acknowledged_at": now},
-    )
-    return {"id": alert_id, "status": "acknowledged", "acknowledged_at": now}
+        alert = conn.execute(
+            """
+            SELECT alerts.item_id, alerts.sensor_id, sensors.device_id
+            FROM alerts
+            LEFT JOIN sensors ON sensors.id = alerts.sensor_id
+            WHERE alerts.id = ?;
+            """,
+            (alert_id,),
+        ).fetchone()
+        event = {
+            "type": "alert_acknowledged",
+            "alert_id": alert_id,
+            "acknowledged_at": now_iso,
+        }
+        frames = record_events(
+            conn,
+            [event],
+            now,
+            device_id=alert["device_id"],
+            sensor_id=alert["sensor_id"],
+            item_id=alert["item_id"],
+        )
+    request.app.state.listings.bump(("alerts",))
+    _publish_events(request, frames)
+    return {"id": alert_id, "status": "acknowledged", "acknowledged_at": now_iso}
 
 
 @app.get("/api/v1/devices")
-def list_devices(request: Request) -> Dict[str, Any]:
+def list_devices(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1),
+    cursor: Optional[str] = Query(default=None),
+) -> Response:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
-    with get_db(config) as conn:
-        rows = conn.execute(
-            "SELECT id, name, location, firmware, last_seen FROM devices ORDER BY id;"
-        ).fetchall()
-    return {"devices": [dict(row) for row in rows]}
+    limit = _page_limit(request, limit)
+    after = _parse_cursor(cursor, (str,))
+    key = str(limit) if after is None else None
+    return _listing_response(
+        request, "devices", key, partial(_render_devices, request, limit, after)
+    )
 
 
-@app.get("/api/v1/sensors")
-def list_sensors(request: Request) -> Dict[str, Any]:
+def _render_devices(
+    request: Request, limit: int, after: Optional[Tuple[str]]
+) -> Dict[str, Any]:
+    db: ConnectionPool = request.app.state.db
+    query = "SELECT id, name, location, firmware, last_seen FROM devices"
+    params: List[Any] = []
+    if after is not None:
+        query += " WHERE id > ?"
+        params.extend(after)
+    query += " ORDER BY id LIMIT ?;"
+    params.append(limit + 1)
+    with db.reader() as conn:
+        rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+    devices, next_cursor = split_page(rows, limit, lambda row: (row["id"],))
+    for device in devices:
+        device["last_seen"] = micros_to_iso(device["last_seen"])
+    return {"devices": devices, "next_cursor": next_cursor}
+
+
+@app.get("/api/v1/sensors", response_model=None)
+def list_sensors(
+    request: Request, since_version: Optional[int] = Query(default=None, ge=0)
+) -> Union[Response, Dict[str, Any]]:
     require_ui_auth(request)
-    config: AppConfig = request.app.state.config
-    with get_db(config) as conn:
-        rows = conn.execute(
-            """
-            SELECT id, device_id, type, thresholds, state_map, last_state, last_value, last_update
-            FROM sensors
-            ORDER BY id;
-            """
-        ).fetchall()
-    sensors = []
-    for row in rows:
-        sensors.append(
-            {
-                "id": row["id"],
-                "device_id": row["device_id"],
-                "type": row["type"],
-                "thresholds": loads_json(row["thresholds"]),
-                "state_map": loads_json(row["state_map"]),
-                "last_state": row["last_state"],
-                "last_value": row["last_value"],
-                "last_update": row["last_update"],
-            }
-        )
-    return {"sensors": sensors}
+    if since_version is not None:
+        changes: SensorChanges = _load_changes(request, load_sensor_changes, since_version)
+        return {
+            "sensors": [_sensor_entry(meta) for meta in changes.sensors],
+            "deleted": changes.deleted,
+            "version": changes.version,
+        }
+    return _listing_response(request, "sensors", "", partial(_render_sensors, request))
+
+
+def _render_sensors(request: Request) -> Dict[str, Any]:
+    db: ConnectionPool = request.app.state.db
+    cache: MetadataCache = request.app.state.metadata
+    with db.reader() as conn:
+        rows = cache.all_sensors(conn)
+    return {"sensors": [_sensor_entry(meta) for meta in rows]}
 
 
 @app.get("/api/v1/stream")
-async def stream(request: Request) -> StreamingResponse:
+async def stream(
+    request: Request,
+    item_id: Optional[List[str]] = Query(default=None),
+    sensor_id: Optional[List[str]] = Query(default=None),
+    device_id: Optional[List[str]] = Query(default=None),
+    event_type: Optional[List[str]] = Query(default=None, alias="type"),
+) -> StreamingResponse:
     require_ui_auth(request)
     config: AppConfig = request.app.state.config
     last_event_id = _parse_last_event_id(request)
-    queue = await request.app.state.events.subscribe()
+    event_filter = EventFilter(
+        item_id=_parse_filter_values(item_id),
+        sensor_id=_parse_filter_values(sensor_id),
+        device_id=_parse_filter_values(device_id),
+        type=_parse_filter_values(event_type),
+    )
+    if event_filter.type is not None and not event_filter.type <= EVENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid event type")
+    if event_filter.is_empty():
+        event_filter = None
+    subscription = request.app.state.events.subscribe(event_filter)
 
     async def event_generator():
         last_sent_id = last_event_id or 0
         try:
             if last_event_id is not None:
-                with get_db(config) as conn:
-                    buffered = load_events_since(
-                        conn, last_event_id, config.event_replay_limit
-                    )
-                for event in buffered:
-                    payload = json.dumps(event, ensure_ascii=True)
-                    event_id = event.get("event_id")
-                    if event_id is not None:
-                        last_sent_id = max(last_sent_id, int(event_id))
-                        yield f"id: {event_id}\n"
-                    yield f"data: {payload}\n\n"
+                buffered = await request.app.state.replay.replay(
+                    last_event_id, config.event_replay_limit, event_filter
+                )
+                for frame in buffered:
+                    last_sent_id = max(last_sent_id, frame.event_id)
+                    yield frame.data
             while True:
                 if await request.is_disconnected():
                     break
-                try:
-                    event = await asyncio.wait_for(queue.get(), timeout=15)
-                except asyncio.TimeoutError:
-                    yield ": keepalive\n\n"
+                frames = await subscription.read()
+                if not frames:
+                    yield KEEPALIVE_FRAME
                     continue
-                event_id = event.get("event_id")
-                if event_id is not None:
-                    if int(event_id) <= last_sent_id:
+                for frame in frames:
+                    if frame is RESYNC_FRAME:
+                        yield frame.data
+                        continue
+                    if frame.event_id <= last_sent_id:
                         continue
-                    last_sent_id = int(event_id)
-                payload = json.dumps(event, ensure_ascii=True)
-                if event_id is not None:
-                    yield f"id: {event_id}\n"
-                yield f"data: {payload}\n\n"
+                    last_sent_id = frame.event_id
+                    yield frame.data
         finally:
-            await request.app.state.events.unsubscribe(queue)
+            request.app.state.events.unsubscribe(subscription)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
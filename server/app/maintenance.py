@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from .config import AppConfig
+from .db import ConnectionPool, count_events, prune_events
+from .recent import RecentReadings
+from .rollup import delete_expired_readings, rollup_pending
+from .timestamps import MICROS_PER_SECOND, now_micros
+
+
+async def run_periodically(
+    name: str, func: Callable[[], Any], interval_seconds: float
+) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, func)
+        except Exception:  # noqa: BLE001 - retry on the next tick
+            logging.exception("%s failed", name)
+        await asyncio.sleep(interval_seconds)
+
+
+class EventPruner:
+    def __init__(self, db: ConnectionPool, config: AppConfig) -> None:
+        self._db = db
+        self._config = config
+        self._lock = threading.Lock()
+        self._row_count: Optional[int] = None
+        self._runs = 0
+        self._deleted = 0
+
+    def note_recorded(self, count: int) -> None:
+        with self._lock:
+            if self._row_count is not None:
+                self._row_count += count
+
+    def run_once(self, now: Optional[int] = None) -> int:
+        now = now or now_micros()
+        with self._db.writer() as conn:
+            with self._lock:
+                if self._row_count is None:
+                    self._row_count = count_events(conn)
+                row_count = self._row_count
+            deleted = prune_events(
+                conn,
+                self._config.event_retention_seconds,
+                self._config.event_max_rows,
+                now,
+                row_count=row_count,
+            )
+            with self._lock:
+                self._row_count = max(0, (self._row_count or 0) - deleted)
+                self._runs += 1
+                self._deleted += deleted
+        return deleted
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        with self._lock:
+            return {
+                "rows": self._row_count,
+                "runs": self._runs,
+                "deleted": self._deleted,
+            }
+
+
+class ReadingsRollup:
+    def __init__(
+        self, db: ConnectionPool, config: AppConfig, recent: Optional[RecentReadings] = None
+    ) -> None:
+        self._db = db
+        self._recent = recent
+        self._retention_days = config.readings_retention_days
+        self._chunk_size = max(1, config.rollup_chunk_size)
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._rolled_up = 0
+        self._deleted = 0
+
+    def run_once(self, now: Optional[int] = None) -> None:
+        now = now or now_micros()
+        rolled_up = 0
+        while True:
+            with self._db.writer() as conn:
+                processed = rollup_pending(conn, self._chunk_size)
+            rolled_up += processed
+            if processed < self._chunk_size:
+                break
+        deleted = 0
+        if self._retention_days > 0:
+            cutoff = now - self._retention_days * 86400 * MICROS_PER_SECOND
+            while True:
+                with self._db.writer() as conn:
+                    removed = delete_expired_readings(conn, cutoff, self._chunk_size)
+                deleted += removed
+                if removed == 0:
+                    break
+            if self._recent is not None:
+                self._recent.trim(cutoff)
+        with self._lock:
+            self._runs += 1
+            self._rolled_up += rolled_up
+            self._deleted += deleted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "runs": self._runs,
+                "rolled_up": self._rolled_up,
+                "deleted": self._deleted,
+            }
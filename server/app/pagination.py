@@ -0,0 +1,43 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+Row = TypeVar("Row")
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+# Cursors are the sort key of the last row on a page, so the next page is a
+# keyset seek (`WHERE (a, b) > (?, ?)`) whose cost does not grow with the
+# number of rows already paged through.
+def encode_cursor(*key: Any) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+    if (
+        not isinstance(key, list)
+        or len(key) != len(types)
+        or not all(type(part) is kind for part, kind in zip(key, types))
+    ):
+        raise InvalidCursorError("Invalid cursor")
+    return tuple(key)
+
+
+def split_page(
+    rows: List[Row], limit: int, key: Callable[[Row], Tuple[Any, ...]]
+) -> Tuple[List[Row], Optional[str]]:
+    # Callers fetch `limit + 1` rows; the extra one only signals another page.
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
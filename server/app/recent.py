@@ -0,0 +1,238 @@
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+RECENT_COLUMNS = ("seq_id", "ts", "raw_value", "normalized_value", "state")
+RecentRow = Tuple[int, int, Optional[float], Optional[float], str]
+
+
+def _to_float(value: Optional[float]) -> float:
+    # SQLite stores NaN as NULL, so NaN can stand in for a missing value.
+    return math.nan if value is None else value
+
+
+def _from_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class _Ring:
+    __slots__ = ("capacity", "floor", "_head", "_seq_ids", "_ts", "_raw", "_values", "_states")
+
+    def __init__(self, capacity: int, floor: Optional[int]) -> None:
+        self.capacity = capacity
+        # Every reading with ts > floor is held; None means all of them.
+        self.floor = floor
+        # Until the ring is full the arrays just grow and _head stays 0.
+        self._head = 0
+        self._seq_ids = array("q")
+        self._ts = array("q")
+        self._raw = array("d")
+        self._values = array("d")
+        self._states: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    def covers(self, since: int) -> bool:
+        return self.floor is None or since > self.floor
+
+    def oldest_ts(self) -> int:
+        return self._ts[self._head]
+
+    def newest_ts(self) -> int:
+        return self._ts[self._head - 1]
+
+    def holds(self, seq_id: int, ts: int) -> bool:
+        # Only the newest readings can share a timestamp with `ts`.
+        for offset in range(1, len(self._ts) + 1):
+            index = (self._head - offset) % len(self._ts)
+            if self._ts[index] != ts:
+                return False
+            if self._seq_ids[index] == seq_id:
+                return True
+        return False
+
+    def append(self, row: RecentRow) -> None:
+        seq_id, ts, raw_value, value, state = row
+        if len(self._ts) < self.capacity:
+            self._seq_ids.append(seq_id)
+            self._ts.append(ts)
+            self._raw.append(_to_float(raw_value))
+            self._values.append(_to_float(value))
+            self._states.append(state)
+            return
+        index = self._head
+        evicted = self._ts[index]
+        self.floor = evicted if self.floor is None else max(self.floor, evicted)
+        self._seq_ids[index] = seq_id
+        self._ts[index] = ts
+        self._raw[index] = _to_float(raw_value)
+        self._values[index] = _to_float(value)
+        self._states[index] = state
+        self._head = (index + 1) % self.capacity
+
+    def _order(self) -> List[int]:
+        return [*range(self._head, len(self._ts)), *range(self._head)]
+
+    def rows(self, since: Optional[int] = None) -> List[RecentRow]:
+        order = self._order()
+        if since is not None:
+            order = order[bisect_left(order, since, key=self._ts.__getitem__) :]
+        return [self._row(index) for index in order]
+
+    def newest(self) -> RecentRow:
+        return self._row((self._head - 1) % len(self._ts))
+
+    def _row(self, index: int) -> RecentRow:
+        return (
+            self._seq_ids[index],
+            self._ts[index],
+            _from_float(self._raw[index]),
+            _from_float(self._values[index]),
+            self._states[index],
+        )
+
+
+# The last `capacity` readings of each sensor, fed by ingest after commit.
+# Rings start cold and are filled from SQLite; a fill is only kept if no
+# write touched the sensor since the fill's query started, and a reading
+# that would land inside a ring out of time order drops the ring instead of
+# patching it, so a ring never disagrees with the table.
+class RecentReadings:
+    def __init__(self, capacity: int) -> None:
+        self._lock = threading.Lock()
+        self._capacity = capacity
+        self._rings: Dict[str, _Ring] = {}
+        self._generation = 0
+        self._written: Dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._dropped = 0
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def fill(
+        self, sensor_id: str, rows: Sequence[RecentRow], floor: Optional[int], generation: int
+    ) -> None:
+        # `rows` are every reading with ts > floor, oldest first.
+        kept = rows[-self._capacity :]
+        if len(rows) > len(kept):
+            dropped = rows[-len(kept) - 1][1]
+            floor = dropped if floor is None else max(floor, dropped)
+        ring = _Ring(self._capacity, floor)
+        for row in kept:
+            ring.append(row)
+        with self._lock:
+            if self._written.get(sensor_id, 0) <= generation:
+                self._rings[sensor_id] = ring
+
+    def warm(self, conn, sensor_ids: Sequence[str]) -> Dict[str, List[RecentRow]]:
+        generation = self.generation()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        loaded: Dict[str, List[RecentRow]] = {}
+        for sensor_id in sensor_ids:
+            rows = cursor.execute(
+                """
+                SELECT seq_id, ts, raw_value, normalized_value, state
+                FROM readings
+                WHERE sensor_id = ?
+                ORDER BY ts DESC, id DESC
+                LIMIT ?;
+                """,
+                (sensor_id, self._capacity),
+            ).fetchall()
+            rows.reverse()
+            floor = rows[0][1] if len(rows) == self._capacity else None
+            self.fill(sensor_id, rows, floor, generation)
+            loaded[sensor_id] = rows
+        return loaded
+
+    def record(self, rows: Sequence[Tuple[Any, ...]]) -> None:
+        # Ingest rows: (device_id, seq_id, sensor_id, ts, raw_value,
+        # normalized_value, state, created_at), in insert order.
+        ordered = sorted(rows, key=itemgetter(2, 3))
+        with self._lock:
+            self._generation += 1
+            for sensor_id, group in groupby(ordered, key=itemgetter(2)):
+                self._written[sensor_id] = self._generation
+                ring = self._rings.get(sensor_id)
+                if ring is None:
+                    continue
+                for row in group:
+                    recent_row = (row[1], row[3], row[4], row[5], row[6])
+                    if not self._append(ring, recent_row):
+                        del self._rings[sensor_id]
+                        self._dropped += 1
+                        break
+
+    def _append(self, ring: _Ring, row: RecentRow) -> bool:
+        seq_id, ts = row[0], row[1]
+        if not ring.covers(ts):
+            return True
+        if len(ring):
+            newest = ring.newest_ts()
+            if ts < newest:
+                return False
+            if ts == newest and ring.holds(seq_id, ts):
+                return True
+        ring.append(row)
+        return True
+
+    def invalidate(self, sensor_ids: Sequence[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for sensor_id in sensor_ids:
+                self._written[sensor_id] = self._generation
+                self._rings.pop(sensor_id, None)
+
+    def trim(self, before: int) -> None:
+        # Retention removed older readings from the table.
+        with self._lock:
+            for sensor_id, ring in list(self._rings.items()):
+                if len(ring) and ring.oldest_ts() < before:
+                    trimmed = _Ring(self._capacity, ring.floor)
+                    for row in ring.rows(before):
+                        trimmed.append(row)
+                    self._rings[sensor_id] = trimmed
+
+    def readings_since(
+        self, sensor_ids: Sequence[str], since: int
+    ) -> Dict[str, List[RecentRow]]:
+        # Only sensors whose ring covers `since` are returned.
+        found: Dict[str, List[RecentRow]] = {}
+        with self._lock:
+            for sensor_id in sensor_ids:
+                ring = self._rings.get(sensor_id)
+                if ring is not None and ring.covers(since):
+                    found[sensor_id] = ring.rows(since)
+            self._hits += len(found)
+            self._misses += len(sensor_ids) - len(found)
+        return found
+
+    def latest(self, conn, sensor_id: str) -> Optional[RecentRow]:
+        with self._lock:
+            ring = self._rings.get(sensor_id)
+            if ring is not None and (len(ring) or ring.floor is None):
+                self._hits += 1
+                return ring.newest() if len(ring) else None
+            self._misses += 1
+        rows = self.warm(conn, [sensor_id])[sensor_id]
+        return rows[-1] if rows else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "capacity": self._capacity,
+                "sensors": len(self._rings),
+                "readings": sum(len(ring) for ring in self._rings.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "dropped": self._dropped,
+            }
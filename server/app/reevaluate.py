@@ -0,0 +1,140 @@
+from typing import List, Optional, Tuple
+
+from .cache import load_sensor_metadata
+from .db import ConnectionPool, record_events
+from .events import EventDraft, EventFrame, draft_event
+from .ingest import ALERT_STATES, alert_message, create_alert, resolve_alerts
+from .rollup import RollupStateRebuild
+from .state import replay_states
+from .timestamps import micros_to_iso
+
+# Readings replayed to settle a sensor's current state after its thresholds
+# change; one more is read to seed the hysteresis.
+_RECENT_READINGS = 1000
+_SEGMENT_SIZE = 5000
+
+
+def reevaluate_sensor(conn, sensor_id: str, now: int) -> List[EventFrame]:
+    # Runs inside the writer transaction that changed the thresholds, so the
+    # new state, its alerts and events commit together with them.
+    meta = load_sensor_metadata(conn, [sensor_id]).get(sensor_id)
+    if meta is None:
+        return []
+    thresholds = meta.effective_thresholds()
+    if not thresholds:
+        return []
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(
+        """
+        SELECT ts, normalized_value, state
+        FROM readings
+        WHERE sensor_id = ?
+        ORDER BY ts DESC, id DESC
+        LIMIT ?;
+        """,
+        (sensor_id, _RECENT_READINGS + 1),
+    ).fetchall()
+    rows.reverse()
+    seed: Optional[str] = None
+    if len(rows) > _RECENT_READINGS:
+        seed = rows.pop(0)[2]
+    if not rows:
+        return []
+    states = replay_states([row[1] for row in rows], [row[2] for row in rows], thresholds, seed)
+    state = states[-1]
+    if state == meta.last_state:
+        return []
+
+    conn.execute("UPDATE sensors SET last_state = ? WHERE id = ?;", (state, sensor_id))
+    item_id = meta.item.id if meta.item else None
+    now_iso = micros_to_iso(now)
+    drafts: List[EventDraft] = [
+        draft_event(
+            {
+                "type": "item_status_update",
+                "sensor_id": sensor_id,
+                "item_id": item_id,
+                "state": state,
+                "normalized_value": rows[-1][1],
+                "ts": micros_to_iso(rows[-1][0]),
+            }
+        )
+    ]
+    if state in ALERT_STATES:
+        message = alert_message(meta.item.name if meta.item else None, sensor_id, state)
+        alert_id = create_alert(conn, sensor_id, item_id, state, message, now)
+        drafts.append(
+            draft_event(
+                {
+                    "type": "alert_created",
+                    "alert_id": alert_id,
+                    "sensor_id": sensor_id,
+                    "item_id": item_id,
+                    "state": state,
+                    "created_at": now_iso,
+                    "message": message,
+                }
+            )
+        )
+    if state == "ok":
+        resolve_alerts(conn, sensor_id, now)
+        drafts.append(
+            draft_event(
+                {
+                    "type": "alert_resolved",
+                    "sensor_id": sensor_id,
+                    "item_id": item_id,
+                    "resolved_at": now_iso,
+                }
+            )
+        )
+    return record_events(conn, drafts, now, device_id=meta.device_id)
+
+
+def rewrite_state_history(db: ConnectionPool, sensor_id: str) -> int:
+    # Replays every stored reading of the sensor with its current thresholds
+    # and rewrites the states that change, oldest first, one writer
+    # transaction per segment so ingest is not held up for the whole run.
+    # Rolled-up buckets get their last state and state durations rebuilt.
+    # Returns the number of readings whose state changed.
+    with db.reader() as conn:
+        meta = load_sensor_metadata(conn, [sensor_id]).get(sensor_id)
+    thresholds = meta.effective_thresholds() if meta else None
+    if not thresholds:
+        return 0
+    rewritten = 0
+    last_state: Optional[str] = None
+    after: Tuple[int, int] = (-1, -1)
+    rebuild: Optional[RollupStateRebuild] = None
+    while True:
+        with db.writer() as conn:
+            if rebuild is None:
+                rebuild = RollupStateRebuild(conn, sensor_id)
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(
+                """
+                SELECT id, ts, normalized_value, state
+                FROM readings
+                WHERE sensor_id = ? AND (ts, id) > (?, ?)
+                ORDER BY ts ASC, id ASC
+                LIMIT ?;
+                """,
+                (sensor_id, *after, _SEGMENT_SIZE),
+            ).fetchall()
+            if not rows:
+                rebuild.finish(conn)
+                return rewritten
+            states = replay_states(
+                [row[2] for row in rows], [row[3] for row in rows], thresholds, last_state
+            )
+            changed = [
+                (state, row[0]) for row, state in zip(rows, states) if state != row[3]
+            ]
+            if changed:
+                conn.executemany("UPDATE readings SET state = ? WHERE id = ?;", changed)
+            rebuild.feed(conn, [(row[0], row[1], state) for row, state in zip(rows, states)])
+            rewritten += len(changed)
+            last_state = states[-1]
+            after = (rows[-1][1], rows[-1][0])
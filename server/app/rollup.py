@@ -0,0 +1,376 @@
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .db import dumps_json, loads_json
+from .timestamps import MICROS_PER_SECOND
+
+ROLLUP_TIERS: Tuple[Tuple[str, int], ...] = (
+    ("minute", 60),
+    ("hour", 3600),
+    ("day", 86400),
+)
+
+_WATERMARK_KEY = "rollup_last_reading_id"
+
+
+def rollup_table(tier: str) -> str:
+    if tier not in {name for name, _ in ROLLUP_TIERS}:
+        raise ValueError(f"Unknown rollup tier: {tier}")
+    return f"readings_rollup_{tier}"
+
+
+def bucket_start(ts: int, size: int) -> int:
+    width = size * MICROS_PER_SECOND
+    return ts // width * width
+
+
+@dataclass
+class RollupBucket:
+    count: int = 0
+    value_count: int = 0
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    sum_value: Optional[float] = None
+    last_ts: Optional[int] = None
+    last_value: Optional[float] = None
+    last_state: Optional[str] = None
+    state_durations: Dict[str, float] = field(default_factory=dict)
+
+    def add_reading(self, ts: int, value: Optional[float], state: str) -> None:
+        self.count += 1
+        if value is not None:
+            self.value_count += 1
+            self.min_value = value if self.min_value is None else min(self.min_value, value)
+            self.max_value = value if self.max_value is None else max(self.max_value, value)
+            self.sum_value = value if self.sum_value is None else self.sum_value + value
+        if self.last_ts is None or ts >= self.last_ts:
+            self.last_ts = ts
+            self.last_value = value
+            self.last_state = state
+
+    def add_duration(self, state: str, seconds: float) -> None:
+        if seconds > 0:
+            self.state_durations[state] = self.state_durations.get(state, 0.0) + seconds
+
+    def merge(self, other: "RollupBucket") -> None:
+        self.count += other.count
+        self.value_count += other.value_count
+        if other.min_value is not None:
+            self.min_value = (
+                other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+            )
+        if other.max_value is not None:
+            self.max_value = (
+                other.max_value if self.max_value is None else max(self.max_value, other.max_value)
+            )
+        if other.sum_value is not None:
+            self.sum_value = other.sum_value + (self.sum_value or 0.0)
+        if other.last_ts is not None and (self.last_ts is None or other.last_ts >= self.last_ts):
+            self.last_ts = other.last_ts
+            self.last_value = other.last_value
+            self.last_state = other.last_state
+        for state, seconds in other.state_durations.items():
+            self.add_duration(state, seconds)
+
+
+def get_watermark(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT value FROM maintenance_state WHERE key = ?;", (_WATERMARK_KEY,)
+    ).fetchone()
+    return int(row["value"]) if row else 0
+
+
+def _set_watermark(conn: sqlite3.Connection, reading_id: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO maintenance_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value;
+        """,
+        (_WATERMARK_KEY, reading_id),
+    )
+
+
+def _load_cursors(
+    conn: sqlite3.Connection, sensor_ids: List[str]
+) -> Dict[str, Tuple[int, str]]:
+    cursors: Dict[str, Tuple[int, str]] = {}
+    for start in range(0, len(sensor_ids), 500):
+        chunk = sensor_ids[start : start + 500]
+        rows = conn.execute(
+            f"""
+            SELECT sensor_id, ts, state FROM rollup_cursors
+            WHERE sensor_id IN ({', '.join('?' for _ in chunk)});
+            """,
+            chunk,
+        ).fetchall()
+        cursors.update({row["sensor_id"]: (row["ts"], row["state"]) for row in rows})
+    return cursors
+
+
+def _aggregate(
+    rows: Iterable[Any], cursors: Dict[str, Tuple[int, str]]
+) -> Dict[str, Dict[Tuple[str, int], RollupBucket]]:
+    tiers: Dict[str, Dict[Tuple[str, int], RollupBucket]] = {
+        name: {} for name, _ in ROLLUP_TIERS
+    }
+    by_sensor: Dict[str, List[Any]] = {}
+    for row in rows:
+        by_sensor.setdefault(row["sensor_id"], []).append(row)
+
+    for sensor_id, sensor_rows in by_sensor.items():
+        sensor_rows.sort(key=lambda row: row["ts"])
+        previous = cursors.get(sensor_id)
+        for row in sensor_rows:
+            ts = row["ts"]
+            for name, size in ROLLUP_TIERS:
+                key = (sensor_id, bucket_start(ts, size))
+                bucket = tiers[name].setdefault(key, RollupBucket())
+                bucket.add_reading(ts, row["normalized_value"], row["state"])
+            if previous is not None and ts < previous[0]:
+                continue
+            if previous is not None:
+                for name, size in ROLLUP_TIERS:
+                    _add_interval(
+                        tiers[name], sensor_id, size, previous[1], previous[0], ts
+                    )
+            previous = (ts, row["state"])
+        if previous is not None:
+            cursors[sensor_id] = previous
+    return tiers
+
+
+def _add_interval(
+    buckets: Dict[Tuple[str, int], RollupBucket],
+    sensor_id: str,
+    size: int,
+    state: str,
+    start: int,
+    end: int,
+) -> None:
+    # Only the buckets holding the two readings are credited; the buckets in
+    # between have no row and are added back by `state_totals`, so a sensor
+    # that stays silent for weeks does not write a row per empty minute.
+    start_key = (sensor_id, bucket_start(start, size))
+    end_key = (sensor_id, bucket_start(end, size))
+    if start_key == end_key:
+        buckets.setdefault(start_key, RollupBucket()).add_duration(
+            state, (end - start) / MICROS_PER_SECOND
+        )
+        return
+    width = size * MICROS_PER_SECOND
+    buckets.setdefault(start_key, RollupBucket()).add_duration(
+        state, (start_key[1] + width - start) / MICROS_PER_SECOND
+    )
+    buckets.setdefault(end_key, RollupBucket()).add_duration(
+        state, (end - end_key[1]) / MICROS_PER_SECOND
+    )
+
+
+def state_totals(buckets: Sequence[Tuple[int, RollupBucket]], size: int) -> Dict[str, float]:
+    # Seconds per state over one sensor's stored buckets of a tier, oldest
+    # first. A gap between two stored buckets was spent in the last state of
+    # the earlier one.
+    width = size * MICROS_PER_SECOND
+    totals: Dict[str, float] = {}
+    previous: Optional[Tuple[int, RollupBucket]] = None
+    for start, bucket in buckets:
+        for state, seconds in bucket.state_durations.items():
+            totals[state] = totals.get(state, 0.0) + seconds
+        if previous is not None and previous[1].last_state is not None:
+            gap = (start - previous[0] - width) / MICROS_PER_SECOND
+            if gap > 0:
+                state = previous[1].last_state
+                totals[state] = totals.get(state, 0.0) + gap
+        previous = (start, bucket)
+    return totals
+
+
+def _bucket_from_row(row: Any) -> RollupBucket:
+    return RollupBucket(
+        count=row["count"],
+        value_count=row["value_count"],
+        min_value=row["min_value"],
+        max_value=row["max_value"],
+        sum_value=row["sum_value"],
+        last_ts=row["last_ts"],
+        last_value=row["last_value"],
+        last_state=row["last_state"],
+        state_durations=loads_json(row["state_durations"]) or {},
+    )
+
+
+def _write_tier(
+    conn: sqlite3.Connection, tier: str, buckets: Dict[Tuple[str, int], RollupBucket]
+) -> None:
+    if not buckets:
+        return
+    table = rollup_table(tier)
+    ranges: Dict[str, Tuple[int, int]] = {}
+    for sensor_id, start in buckets:
+        low, high = ranges.get(sensor_id, (start, start))
+        ranges[sensor_id] = (min(low, start), max(high, start))
+    for sensor_id, (low, high) in ranges.items():
+        rows = conn.execute(
+            f"""
+            SELECT * FROM {table}
+            WHERE sensor_id = ? AND bucket_start BETWEEN ? AND ?;
+            """,
+            (sensor_id, low, high),
+        ).fetchall()
+        for row in rows:
+            key = (sensor_id, row["bucket_start"])
+            if key in buckets:
+                existing = _bucket_from_row(row)
+                existing.merge(buckets[key])
+                buckets[key] = existing
+    conn.executemany(
+        f"""
+        INSERT OR REPLACE INTO {table}
+        (sensor_id, bucket_start, count, value_count, min_value, max_value, sum_value,
+         last_ts, last_value, last_state, state_durations)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+        """,
+        [
+            (
+                sensor_id,
+                start,
+                bucket.count,
+                bucket.value_count,
+                bucket.min_value,
+                bucket.max_value,
+                bucket.sum_value,
+                bucket.last_ts,
+                bucket.last_value,
+                bucket.last_state,
+                dumps_json(bucket.state_durations) if bucket.state_durations else None,
+            )
+            for (sensor_id, start), bucket in buckets.items()
+        ],
+    )
+
+
+def rollup_pending(conn: sqlite3.Connection, chunk_size: int) -> int:
+    watermark = get_watermark(conn)
+    rows = conn.execute(
+        """
+        SELECT id, sensor_id, ts, normalized_value, state
+        FROM readings
+        WHERE id > ?
+        ORDER BY id ASC
+        LIMIT ?;
+        """,
+        (watermark, chunk_size),
+    ).fetchall()
+    if not rows:
+        return 0
+    sensor_ids = sorted({row["sensor_id"] for row in rows})
+    cursors = _load_cursors(conn, sensor_ids)
+    tiers = _aggregate(rows, cursors)
+    for name, _ in ROLLUP_TIERS:
+        _write_tier(conn, name, tiers[name])
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO rollup_cursors (sensor_id, ts, state)
+        VALUES (?, ?, ?);
+        """,
+        [(sensor_id, ts, state) for sensor_id, (ts, state) in cursors.items()],
+    )
+    _set_watermark(conn, int(rows[-1]["id"]))
+    return len(rows)
+
+
+def delete_expired_readings(
+    conn: sqlite3.Connection, cutoff: int, chunk_size: int
+) -> int:
+    cursor = conn.execute(
+        """
+        DELETE FROM readings
+        WHERE id IN (
+            SELECT id FROM readings
+            WHERE ts < ? AND id <= ?
+            ORDER BY ts ASC
+            LIMIT ?
+        );
+        """,
+        (cutoff, get_watermark(conn), chunk_size),
+    )
+    return max(0, cursor.rowcount)
+
+
+# Recomputes `last_state` and `state_durations` of one sensor's rollup buckets
+# after its reading states were rewritten; counts and values do not depend on
+# states. Readings are fed in (ts, id) order, possibly over several
+# transactions. A bucket is only updated when its stored count matches the
+# readings seen, so buckets partly removed by retention (or grown by a
+# concurrent rollup) keep what they have.
+class RollupStateRebuild:
+    def __init__(self, conn: sqlite3.Connection, sensor_id: str) -> None:
+        self._sensor_id = sensor_id
+        self._watermark = get_watermark(conn)
+        self._previous: Optional[Tuple[int, str]] = None
+        self._buckets: Dict[str, Dict[Tuple[str, int], RollupBucket]] = {
+            name: {} for name, _ in ROLLUP_TIERS
+        }
+        # First bucket per tier whose earlier readings are gone; the interval
+        # leading into it cannot be recomputed.
+        self._partial: Dict[str, Optional[int]] = {}
+
+    def feed(self, conn: sqlite3.Connection, rows: Iterable[Tuple[int, int, str]]) -> None:
+        # Rows are (reading id, ts, state).
+        for reading_id, ts, state in rows:
+            if reading_id > self._watermark:
+                continue
+            if self._previous is None:
+                self._find_partial(conn, ts)
+            for name, size in ROLLUP_TIERS:
+                buckets = self._buckets[name]
+                key = (self._sensor_id, bucket_start(ts, size))
+                buckets.setdefault(key, RollupBucket()).add_reading(ts, None, state)
+                if self._previous is not None:
+                    _add_interval(
+                        buckets, self._sensor_id, size, self._previous[1], self._previous[0], ts
+                    )
+                done = [start for _, start in buckets if start < key[1]]
+                self._write(conn, name, done)
+            self._previous = (ts, state)
+
+    def finish(self, conn: sqlite3.Connection) -> None:
+        for name, _ in ROLLUP_TIERS:
+            self._write(conn, name, [start for _, start in self._buckets[name]])
+        if self._previous is not None:
+            conn.execute(
+                "UPDATE rollup_cursors SET state = ? WHERE sensor_id = ? AND ts = ?;",
+                (self._previous[1], self._sensor_id, self._previous[0]),
+            )
+
+    def _find_partial(self, conn: sqlite3.Connection, ts: int) -> None:
+        for name, size in ROLLUP_TIERS:
+            start = bucket_start(ts, size)
+            older = conn.execute(
+                f"""
+                SELECT 1 FROM {rollup_table(name)}
+                WHERE sensor_id = ? AND bucket_start < ?
+                LIMIT 1;
+                """,
+                (self._sensor_id, start),
+            ).fetchone()
+            self._partial[name] = start if older else None
+
+    def _write(self, conn: sqlite3.Connection, tier: str, starts: List[int]) -> None:
+        updates = []
+        for start in starts:
+            bucket = self._buckets[tier].pop((self._sensor_id, start))
+            if start == self._partial.get(tier):
+                continue
+            durations = dumps_json(bucket.state_durations) if bucket.state_durations else None
+            updates.append((bucket.last_state, durations, self._sensor_id, start, bucket.count))
+        if updates:
+            conn.executemany(
+                f"""
+                UPDATE {rollup_table(tier)}
+                SET last_state = ?, state_durations = ?
+                WHERE sensor_id = ? AND bucket_start = ? AND count = ?;
+                """,
+                updates,
+            )
@@ -1,4 +1,5 @@
-from typing import Dict, Optional
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence
 
 
 def evaluate_threshold(
@@ -36,3 +37,36 @@ def resolve_state(
         key = "on" if normalized_value else "off"
         return state_map.get(key, reading_state)
     return reading_state
+
+
+def replay_states(
+    values: Sequence[Optional[float]],
+    states: Sequence[str],
+    thresholds: Dict[str, float],
+    last_state: Optional[str],
+) -> List[str]:
+    # resolve_state over a run of readings in one pass instead of a call per
+    # reading. A value below `low` or at/above `ok` fixes the state, a reading
+    # without a value keeps its stored state, and anything else repeats the
+    # previous state, so the run is a classification plus a forward fill.
+    # Pass the last returned state as `last_state` to continue a run.
+    low = thresholds.get("low")
+    ok = thresholds.get("ok")
+    banded = low is not None and ok is not None and low < ok
+    fixed: List[Optional[str]] = [
+        state
+        if value is None
+        else None
+        if not banded
+        else "low"
+        if value < low
+        else "ok"
+        if value >= ok
+        else None
+        for value, state in zip(values, states)
+    ]
+    source = accumulate(
+        (index if state is not None else -1 for index, state in enumerate(fixed)), max
+    )
+    carried = last_state or ("low" if banded else "ok")
+    return [fixed[index] if index >= 0 else carried for index in source]
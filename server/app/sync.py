@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .cache import ItemMetadata, SensorMetadata, load_items, load_sensor_metadata
+from .db import SYNC_VERSION_KEY
+
+
+@dataclass
+class SensorChanges:
+    version: int
+    sensors: List[SensorMetadata]
+    deleted: List[str]
+
+
+@dataclass
+class ItemChanges:
+    version: int
+    items: List[Tuple[ItemMetadata, Optional[SensorMetadata]]]
+    deleted: List[str]
+
+
+def current_sync_version(conn) -> int:
+    row = conn.execute(
+        "SELECT value FROM maintenance_state WHERE key = ?;", (SYNC_VERSION_KEY,)
+    ).fetchone()
+    return int(row["value"]) if row else 0
+
+
+def _changed_rows(conn, kind: str, since_version: int) -> Tuple[List[str], List[str]]:
+    changed: List[str] = []
+    deleted: List[str] = []
+    rows = conn.execute(
+        """
+        SELECT row_id, deleted FROM sync_rows
+        WHERE kind = ? AND version > ?
+        ORDER BY row_id;
+        """,
+        (kind, since_version),
+    ).fetchall()
+    for row in rows:
+        (deleted if row["deleted"] else changed).append(row["row_id"])
+    return changed, deleted
+
+
+def load_changed_ids(conn, since_version: int) -> Tuple[int, List[str], List[str]]:
+    # Item and sensor ids written or deleted after `since_version`, for
+    # callers that only drop cached copies.
+    version = current_sync_version(conn)
+    if version == since_version:
+        return version, [], []
+    item_ids = [row_id for rows in _changed_rows(conn, "item", since_version) for row_id in rows]
+    sensor_ids = [
+        row_id for rows in _changed_rows(conn, "sensor", since_version) for row_id in rows
+    ]
+    return version, item_ids, sensor_ids
+
+
+# Both loaders expect to run inside a read transaction so the version and the
+# rows come from the same snapshot. A version of 0 means "everything": rows
+# written before change tracking existed have no `sync_rows` entry.
+def load_sensor_changes(conn, since_version: int) -> SensorChanges:
+    version = current_sync_version(conn)
+    if since_version <= 0:
+        sensors = load_sensor_metadata(conn)
+        return SensorChanges(version=version, sensors=list(sensors.values()), deleted=[])
+    changed, deleted = _changed_rows(conn, "sensor", since_version)
+    sensors = load_sensor_metadata(conn, changed) if changed else {}
+    return SensorChanges(version=version, sensors=list(sensors.values()), deleted=deleted)
+
+
+def load_item_changes(conn, since_version: int) -> ItemChanges:
+    version = current_sync_version(conn)
+    if since_version <= 0:
+        items = load_items(conn)
+        deleted: List[str] = []
+    else:
+        changed, deleted = _changed_rows(conn, "item", since_version)
+        # An item's status and value come from its sensor.
+        rows = conn.execute(
+            """
+            SELECT items.id FROM items
+            JOIN sync_rows ON sync_rows.kind = 'sensor' AND sync_rows.row_id = items.sensor_id
+            WHERE sync_rows.version > ?;
+            """,
+            (since_version,),
+        ).fetchall()
+        item_ids = sorted(set(changed).union(row["id"] for row in rows))
+        items = load_items(conn, item_ids) if item_ids else []
+    sensor_ids = sorted({item.sensor_id for item in items if item.sensor_id})
+    sensors = load_sensor_metadata(conn, sensor_ids) if sensor_ids else {}
+    return ItemChanges(
+        version=version,
+        items=[
+            (item, sensors.get(item.sensor_id) if item.sensor_id else None) for item in items
+        ],
+        deleted=deleted,
+    )
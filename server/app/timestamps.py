@@ -0,0 +1,54 @@
+import datetime as dt
+import time
+from typing import Any, Optional
+
+MICROS_PER_SECOND = 1_000_000
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def parse_ts(value: str) -> dt.datetime:
+    if not value:
+        raise ValueError("Missing timestamp")
+    normalized = value.strip()
+    if normalized.endswith("Z"):
+        normalized = normalized[:-1] + "+00:00"
+    parsed = dt.datetime.fromisoformat(normalized)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    return parsed.astimezone(dt.timezone.utc)
+
+
+def to_micros(value: dt.datetime) -> int:
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * MICROS_PER_SECOND + delta.microseconds
+
+
+# Timestamps outside this range have no datetime (or ISO string).
+MIN_MICROS = to_micros(dt.datetime.min.replace(tzinfo=dt.timezone.utc))
+MAX_MICROS = to_micros(dt.datetime.max.replace(tzinfo=dt.timezone.utc))
+
+
+def iso_to_micros(value: str) -> int:
+    return to_micros(parse_ts(value))
+
+
+def micros_to_iso(value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return (_EPOCH + dt.timedelta(microseconds=value)).isoformat()
+
+
+def now_micros() -> int:
+    return time.time_ns() // 1000
+
+
+def coerce_micros(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return iso_to_micros(str(value))
+    except ValueError:
+        return int(value)
@@ -0,0 +1,197 @@
+import json
+import struct
+import sys
+from array import array
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from .models import ReadingsBatchIn, SensorMetaIn
+from .timestamps import MAX_MICROS, MIN_MICROS
+
+# Packed batch layout (little-endian), mirrored by device/smart_inventory/wire.py:
+#   b"SIB1", str device_id, str firmware, str sent_at, str sensor_meta (JSON),
+#   u32 count, sensor-id dictionary, state dictionary, then when count > 0:
+#   i64 first seq_id, i64 first ts (epoch microseconds), int column of seq_id
+#   deltas, int column of ts deltas, int column of sensor indexes, int column of
+#   state indexes, float column raw_value, float column normalized_value.
+# str: u16 length + UTF-8 (0xFFFF = null); dictionary: u16 count + str entries.
+# int column: array typecode byte (b/h/i/q) + values.
+# float column: "n" (all null) or f/d + values; F/D adds a presence bitmap.
+PACKED_CONTENT_TYPE = "application/x-inventory-batch"
+
+_MAGIC = b"SIB1"
+_NULL_STRING = 0xFFFF
+_INT_TYPECODES = {"b", "h", "i", "q", "B", "H"}
+
+
+class PackedBatchError(ValueError):
+    pass
+
+
+class PackedReading(NamedTuple):
+    seq_id: int
+    sensor_id: str
+    ts: int
+    raw_value: Optional[float]
+    normalized_value: Optional[float]
+    state: str
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def take(self, size: int) -> memoryview:
+        end = self._offset + size
+        if size < 0 or end > len(self._data):
+            raise PackedBatchError("Truncated packed batch")
+        chunk = self._data[self._offset : end]
+        self._offset = end
+        return chunk
+
+    def unpack(self, fmt: str) -> Tuple[Any, ...]:
+        return struct.unpack(fmt, self.take(struct.calcsize(fmt)))
+
+    def string(self) -> Optional[str]:
+        (length,) = self.unpack("<H")
+        if length == _NULL_STRING:
+            return None
+        return bytes(self.take(length)).decode("utf-8")
+
+    def strings(self) -> List[str]:
+        (count,) = self.unpack("<H")
+        values = []
+        for _ in range(count):
+            value = self.string()
+            if value is None:
+                raise PackedBatchError("Null dictionary entry")
+            values.append(value)
+        return values
+
+    def ints(self, count: int) -> array:
+        typecode = bytes(self.take(1)).decode("ascii")
+        if typecode not in _INT_TYPECODES:
+            raise PackedBatchError(f"Unknown integer column type: {typecode!r}")
+        return self._array(typecode, count)
+
+    def floats(self, count: int) -> List[Optional[float]]:
+        kind = bytes(self.take(1)).decode("ascii")
+        if kind == "n":
+            return [None] * count
+        if kind.lower() not in {"f", "d"}:
+            raise PackedBatchError(f"Unknown float column type: {kind!r}")
+        present = [True] * count
+        if kind.isupper():
+            bitmap = self.take((count + 7) // 8)
+            present = [bool(bitmap[index >> 3] & (1 << (index & 7))) for index in range(count)]
+        values = iter(self._array(kind.lower(), sum(present)))
+        return [next(values) if flag else None for flag in present]
+
+    def _array(self, typecode: str, count: int) -> array:
+        values = array(typecode)
+        values.frombytes(self.take(values.itemsize * count))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def done(self) -> bool:
+        return self._offset == len(self._data)
+
+
+def construct_model(model: Any, **fields: Any) -> Any:
+    # Fields are already typed by the caller; skip per-field validation.
+    # Works with both pydantic 1 and 2.
+    construct = getattr(model, "model_construct", None) or model.construct
+    return construct(**fields)
+
+
+def _running_sum(first: int, deltas: array) -> List[int]:
+    values = [first]
+    for delta in deltas:
+        first += delta
+        values.append(first)
+    return values
+
+
+def decode_packed_batch(data: bytes) -> ReadingsBatchIn:
+    try:
+        return _decode(data)
+    except PackedBatchError:
+        raise
+    except (struct.error, UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise PackedBatchError("Malformed packed batch") from exc
+
+
+def packed_device_id(data: bytes) -> str:
+    # Reads only the header, so a batch can be routed before it is decoded.
+    try:
+        return _read_device_id(_Reader(data))
+    except UnicodeDecodeError as exc:
+        raise PackedBatchError("Malformed packed batch") from exc
+
+
+def _read_device_id(reader: _Reader) -> str:
+    if bytes(reader.take(len(_MAGIC))) != _MAGIC:
+        raise PackedBatchError("Unsupported packed batch version")
+    device_id = reader.string()
+    if not device_id:
+        raise PackedBatchError("Missing device_id")
+    return device_id
+
+
+def _decode(data: bytes) -> ReadingsBatchIn:
+    reader = _Reader(data)
+    device_id = _read_device_id(reader)
+    firmware = reader.string()
+    sent_at = reader.string()
+    sensor_meta_json = reader.string()
+    (count,) = reader.unpack("<I")
+    if count > len(data):
+        raise PackedBatchError("Reading count exceeds payload size")
+    sensors = reader.strings()
+    states = reader.strings()
+    readings: List[PackedReading] = []
+    if count:
+        first_seq, first_ts = reader.unpack("<qq")
+        seq_ids = _running_sum(first_seq, reader.ints(count - 1))
+        timestamps = _running_sum(first_ts, reader.ints(count - 1))
+        sensor_index = reader.ints(count)
+        state_index = reader.ints(count)
+        raw_values = reader.floats(count)
+        normalized_values = reader.floats(count)
+        if min(seq_ids) < 0:
+            raise PackedBatchError("seq_id must be non-negative")
+        if min(timestamps) < MIN_MICROS or max(timestamps) > MAX_MICROS:
+            raise PackedBatchError("ts out of range")
+        if min(sensor_index) < 0 or min(state_index) < 0:
+            raise PackedBatchError("Dictionary index out of range")
+        try:
+            sensor_ids = [sensors[index] for index in sensor_index]
+            reading_states = [states[index] for index in state_index]
+        except IndexError as exc:
+            raise PackedBatchError("Dictionary index out of range") from exc
+        readings = list(
+            map(
+                PackedReading,
+                seq_ids,
+                sensor_ids,
+                timestamps,
+                raw_values,
+                normalized_values,
+                reading_states,
+            )
+        )
+    if not reader.done():
+        raise PackedBatchError("Trailing bytes after packed batch")
+
+    sensor_meta = None
+    if sensor_meta_json is not None:
+        sensor_meta = [SensorMetaIn(**meta) for meta in json.loads(sensor_meta_json)]
+    return construct_model(
+        ReadingsBatchIn,
+        device_id=device_id,
+        firmware=firmware,
+        sent_at=sent_at,
+        readings=readings,
+        sensor_meta=sensor_meta,
+    )
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from app.events import EventBroadcaster, EventFilter, encode_frame
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _consume(subscription, received: List[int], done: asyncio.Event, expected: int) -> None:
+    while True:
+        frames = await subscription.read()
+        received[0] += len(frames)
+        if received[0] >= expected:
+            done.set()
+
+
+async def run_fanout(subscribers: int, events: int, filtered: bool) -> Dict[str, float]:
+    broadcaster = EventBroadcaster(capacity=max(1024, events))
+    sensors = [f"sensor-{index}" for index in range(subscribers)]
+    received = [0]
+    done = asyncio.Event()
+    tasks = []
+    for sensor_id in sensors:
+        event_filter = EventFilter(sensor_id=frozenset({sensor_id})) if filtered else None
+        tasks.append(
+            asyncio.create_task(
+                _consume(broadcaster.subscribe(event_filter), received, done, subscribers)
+            )
+        )
+    await asyncio.sleep(0)
+
+    publish_us: List[float] = []
+    fanout_ms: List[float] = []
+    for event_id in range(1, events + 1):
+        if filtered:
+            # Every subscriber gets exactly one event per round.
+            frames = [
+                encode_frame({"event_id": event_id, "type": "item_status_update", "sensor_id": s})
+                for s in sensors
+            ]
+        else:
+            frames = [encode_frame({"event_id": event_id, "type": "item_status_update"})]
+        received[0] = 0
+        done.clear()
+        started = time.perf_counter()
+        broadcaster.publish_many(frames)
+        published = time.perf_counter()
+        await asyncio.wait_for(done.wait(), timeout=10)
+        finished = time.perf_counter()
+        publish_us.append((published - started) * 1e6 / len(frames))
+        fanout_ms.append((finished - started) * 1000.0)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "publish_us_per_frame": statistics.mean(publish_us),
+        "fanout_p50_ms": _percentile(fanout_ms, 0.5),
+        "fanout_p99_ms": _percentile(fanout_ms, 0.99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE fan-out benchmark")
+    parser.add_argument("--subscribers", default="10,100,1000")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--filtered", action="store_true")
+    args = parser.parse_args()
+    print(f"{'subscribers':>11} {'publish us/frame':>17} {'fanout p50 ms':>14} {'fanout p99 ms':>14}")
+    for count in [int(value) for value in args.subscribers.split(",")]:
+        result = asyncio.run(run_fanout(count, args.events, args.filtered))
+        print(
+            f"{count:>11} {result['publish_us_per_frame']:>17.2f} "
+            f"{result['fanout_p50_ms']:>14.3f} {result['fanout_p99_ms']:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
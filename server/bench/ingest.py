@@ -0,0 +1,118 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from app.cache import MetadataCache
+from app.config import load_config
+from app.db import ConnectionPool, init_db
+from app.ingest import IngestResult, ingest_batch
+from app.ingest_shards import ShardedIngest
+from app.ingest_writer import GroupCommitWriter
+from app.models import ReadingIn, ReadingsBatchIn
+from app.timestamps import now_micros
+
+_START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _batches(devices: int, batches: int, readings: int) -> List[List[ReadingsBatchIn]]:
+    per_device = []
+    for device in range(devices):
+        device_batches = []
+        for index in range(batches):
+            rows = []
+            for offset in range(readings):
+                seq_id = index * readings + offset
+                value = float((seq_id * 7) % 40)
+                rows.append(
+                    ReadingIn(
+                        seq_id=seq_id,
+                        sensor_id=f"dev{device}-s{seq_id % 4}",
+                        ts=(_START + timedelta(seconds=seq_id)).isoformat(),
+                        raw_value=value,
+                        normalized_value=value,
+                        state="low" if value < 10 else "ok",
+                    )
+                )
+            device_batches.append(ReadingsBatchIn(device_id=f"dev{device}", readings=rows))
+        per_device.append(device_batches)
+    return per_device
+
+
+def run_ingest(mode: str, devices: int, batches: int, readings: int, workers: int) -> Dict[str, float]:
+    tmp = tempfile.mkdtemp(prefix="inventory-bench-")
+    config = replace(
+        load_config(),
+        db_path=os.path.join(tmp, "inventory.db"),
+        ingest_mode=mode,
+        ingest_workers=workers,
+    )
+    init_db(config)
+    db = ConnectionPool(config)
+    cache = MetadataCache()
+    writer = None
+    shards = None
+    if mode == "group":
+        writer = GroupCommitWriter(db, cache, commit_window_ms=config.ingest_commit_window_ms)
+        writer.start()
+        submit: Callable[[ReadingsBatchIn, int], IngestResult] = writer.submit
+    elif mode == "sharded":
+        shards = ShardedIngest(config, db, cache, workers=workers)
+        shards.start()
+        submit = shards.submit
+    else:
+
+        def submit(batch: ReadingsBatchIn, now: int) -> IngestResult:
+            with cache.write_lock:
+                with db.writer() as conn:
+                    result = ingest_batch(conn, batch, now, cache)
+                cache.store_sensors(result.sensors)
+            return result
+
+    per_device = _batches(devices, batches, readings)
+
+    def upload(device_batches: List[ReadingsBatchIn]) -> None:
+        for batch in device_batches:
+            submit(batch, now_micros())
+
+    threads = [threading.Thread(target=upload, args=(device,)) for device in per_device]
+    try:
+        # Leave worker start-up out of the measurement.
+        for device in range(devices):
+            submit(ReadingsBatchIn(device_id=f"dev{device}", readings=[]), now_micros())
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if writer is not None:
+            writer.stop()
+        if shards is not None:
+            shards.stop()
+        db.close()
+    total = devices * batches * readings
+    return {"seconds": elapsed, "readings_per_second": total / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest throughput benchmark")
+    parser.add_argument("--modes", default="direct,group,sharded")
+    parser.add_argument("--devices", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    print(f"{'mode':>8} {'seconds':>8} {'readings/s':>11}")
+    for mode in args.modes.split(","):
+        result = run_ingest(mode, args.devices, args.batches, args.readings, args.workers)
+        print(f"{mode:>8} {result['seconds']:>8.2f} {result['readings_per_second']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NoReturn, Optional, Tuple
+
+from app.config import load_config
+from app.db import ConnectionPool, dumps_json, init_db, record_events
+from app.ingest import ALERT_STATES, alert_message
+from app.rollup import rollup_pending
+from app.state import replay_states
+from app.timestamps import MICROS_PER_SECOND, micros_to_iso, to_micros
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+DATASET_SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Datasets end at a fixed instant so the same arguments always build the same
+# database; benchmarks pin the server clock here.
+CLOCK = to_micros(datetime(2026, 1, 1, tzinfo=timezone.utc))
+
+_SENSORS_PER_DEVICE = 10
+_WINDOWS_PER_DAY = 4
+_STATE_MAP = {"on": "present", "off": "out"}
+# Bump when the generated data changes so cached datasets are rebuilt.
+_FORMAT = 2
+
+
+def limit_memory(megabytes: int) -> None:
+    # Caps the address space so a runaway build or run fails with MemoryError
+    # instead of being killed by the OOM killer. 0 leaves it unlimited.
+    if resource is None or megabytes <= 0:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = megabytes * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def memory_exceeded(megabytes: int) -> NoReturn:
+    sys.exit(
+        f"Ran out of memory under --max-memory-mb {megabytes}; use fewer readings "
+        "or sensors, or raise the limit (0 disables it)."
+    )
+
+
+@dataclass
+class Dataset:
+    name: str
+    path: str
+    readings: int
+    sensors: int
+    days: int
+    seed: int
+    format: int
+    clock: int
+    item_ids: List[str]
+    sensor_ids: List[str]
+    alerts: int
+    events: int
+    seconds: float
+
+
+class _SensorSeries:
+    # One sensor's readings, generated window by window so that all sensors
+    # can be interleaved in time order without holding them all in memory.
+    def __init__(
+        self, rng: random.Random, sensor_id: str, device_id: str, slot: int, count: int, span: int
+    ) -> None:
+        self.sensor_id = sensor_id
+        self.device_id = device_id
+        self.digital = rng.random() < 0.2
+        self.thresholds: Optional[Dict[str, float]] = None
+        if not self.digital:
+            low = rng.choice([100.0, 150.0, 200.0, 250.0])
+            self.thresholds = {"low": low, "ok": low * 1.5}
+        self._rng = random.Random(rng.random())
+        self._slot = slot
+        self._interval = span / max(1, count)
+        self._start = CLOCK - span
+        self._count = count
+        self._index = 0
+        self._pending: Optional[int] = None
+        # Items drain at a steady rate and are restocked some time after they
+        # run low; a full cycle takes one to five days.
+        self._capacity = 1000.0
+        self._level = self._rng.uniform(300.0, self._capacity)
+        self._drain = self._capacity / self._rng.uniform(1.0, 5.0) / 86400
+        self._present = True
+        self.last_state: Optional[str] = None
+        self.last_value: Optional[float] = None
+        self.last_ts: Optional[int] = None
+
+    def _next_ts(self) -> int:
+        # Jitter stays within the slot, so timestamps keep increasing.
+        if self._pending is None:
+            jitter = self._rng.uniform(-0.3, 0.3) * self._interval
+            self._pending = int(self._start + (self._index + 0.5) * self._interval + jitter)
+        return self._pending
+
+    def _value(self, elapsed: float) -> float:
+        if self.digital:
+            if self._rng.random() < min(1.0, elapsed / 86400):
+                self._present = not self._present
+            return 1.0 if self._present else 0.0
+        self._level -= self._drain * elapsed
+        if self._level < 60.0 and self._rng.random() < 0.3:
+            self._level = self._capacity
+        self._level = max(0.0, self._level)
+        return round(self._level + self._rng.gauss(0.0, 2.0), 2)
+
+    def until(self, end: int) -> List[Tuple[Any, ...]]:
+        # Readings with ts before `end`: (device_id, seq_id, sensor_id, ts,
+        # raw_value, normalized_value, state, created_at).
+        timestamps = []
+        while self._index < self._count:
+            ts = self._next_ts()
+            if ts >= end:
+                break
+            timestamps.append(ts)
+            self._index += 1
+            self._pending = None
+        if not timestamps:
+            return []
+        values = []
+        previous = self.last_ts if self.last_ts is not None else timestamps[0]
+        for ts in timestamps:
+            values.append(self._value((ts - previous) / MICROS_PER_SECOND))
+            previous = ts
+        if self.digital:
+            states = [_STATE_MAP["on" if value else "off"] for value in values]
+        else:
+            states = replay_states(values, ["ok"] * len(values), self.thresholds, self.last_state)
+        first = self._index - len(timestamps)
+        rows = [
+            (
+                self.device_id,
+                (first + offset) * _SENSORS_PER_DEVICE + self._slot,
+                self.sensor_id,
+                ts,
+                round(value * 4.2 + 812.0, 1),
+                value,
+                state,
+                ts + 1_500_000,
+            )
+            for offset, (ts, value, state) in enumerate(zip(timestamps, values, states))
+        ]
+        self.last_state = states[-1]
+        self.last_value = values[-1]
+        self.last_ts = timestamps[-1]
+        return rows
+
+
+def _sensor_layout(count: int) -> List[Tuple[str, str, int]]:
+    # (sensor_id, device_id, slot on the device)
+    layout = []
+    for index in range(count):
+        device_id = f"hub-{index // _SENSORS_PER_DEVICE:03d}"
+        slot = index % _SENSORS_PER_DEVICE
+        layout.append((f"{device_id}-s{slot}", device_id, slot))
+    return layout
+
+
+def build_dataset(
+    path: str, readings: int, sensors: int, days: int, seed: int, name: str = "custom"
+) -> Dataset:
+    started = time.perf_counter()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    config = replace(load_config(), db_path=path, db_synchronous="OFF")
+    init_db(config)
+    db = ConnectionPool(config)
+    rng = random.Random(seed)
+    span = days * 86400 * MICROS_PER_SECOND
+    layout = _sensor_layout(sensors)
+    series = [
+        _SensorSeries(
+            rng,
+            sensor_id,
+            device_id,
+            slot,
+            readings // sensors + (1 if index < readings % sensors else 0),
+            span,
+        )
+        for index, (sensor_id, device_id, slot) in enumerate(layout)
+    ]
+    item_ids = {
+        entry.sensor_id: f"item-{index:04d}"
+        for index, entry in enumerate(series)
+        if rng.random() < 0.9
+    }
+    created_at = micros_to_iso(CLOCK - span)
+
+    with db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO devices (id, name, location, firmware, last_seen) "
+            "VALUES (?, ?, ?, ?, ?);",
+            [
+                (device_id, f"Hub {device_id[4:]}", "Pantry", "1.4.2", CLOCK)
+                for device_id in sorted({entry.device_id for entry in series})
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO sensors (id, device_id, type, thresholds, state_map) "
+            "VALUES (?, ?, ?, ?, ?);",
+            [
+                (
+                    entry.sensor_id,
+                    entry.device_id,
+                    "digital_gpio" if entry.digital else "hx711",
+                    dumps_json(entry.thresholds),
+                    dumps_json(_STATE_MAP) if entry.digital else None,
+                )
+                for entry in series
+            ],
+        )
+        conn.executemany(
+            """
+            INSERT INTO items (id, sensor_id, name, thresholds, unit, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            [
+                (
+                    item_id,
+                    entry.sensor_id,
+                    f"Item {item_id[5:]}",
+                    dumps_json(entry.thresholds),
+                    None if entry.digital else "g",
+                    created_at,
+                    created_at,
+                )
+                for entry in series
+                for item_id in [item_ids.get(entry.sensor_id)]
+                if item_id
+            ],
+        )
+
+    config_events = max(1, config.event_max_rows)
+    events: List[Tuple[int, str, Dict[str, Any]]] = []
+    alerts: List[List[Any]] = []
+    active: Dict[str, int] = {}
+    window = 86400 * MICROS_PER_SECOND // _WINDOWS_PER_DAY
+    for end in range(CLOCK - span + window, CLOCK + window, window):
+        rows: List[Tuple[Any, ...]] = []
+        for entry in series:
+            previous = entry.last_state
+            produced = entry.until(end)
+            rows.extend(produced)
+            item_id = item_ids.get(entry.sensor_id)
+            for row in produced:
+                state = row[6]
+                events.append(
+                    (
+                        row[7],
+                        entry.device_id,
+                        {
+                            "type": "item_status_update",
+                            "sensor_id": entry.sensor_id,
+                            "item_id": item_id,
+                            "state": state,
+                            "normalized_value": row[5],
+                            "ts": micros_to_iso(row[3]),
+                        },
+                    )
+                )
+                if state == previous:
+                    continue
+                previous = state
+                if state in ALERT_STATES:
+                    item_name = f"Item {item_id[5:]}" if item_id else None
+                    active[entry.sensor_id] = len(alerts)
+                    alerts.append(
+                        [
+                            item_id,
+                            entry.sensor_id,
+                            state,
+                            "active",
+                            alert_message(item_name, entry.sensor_id, state),
+                            row[7],
+                            None,
+                        ]
+                    )
+                elif entry.sensor_id in active:
+                    alert = alerts[active.pop(entry.sensor_id)]
+                    alert[3] = "resolved"
+                    alert[6] = row[7]
+            del events[: max(0, len(events) - config_events)]
+        rows.sort(key=lambda row: row[3])
+        with db.writer() as conn:
+            conn.executemany(
+                """
+                INSERT INTO readings
+                (device_id, seq_id, sensor_id, ts, raw_value, normalized_value, state, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+                """,
+                rows,
+            )
+
+    with db.writer() as conn:
+        conn.executemany(
+            """
+            INSERT INTO alerts
+            (item_id, sensor_id, type, status, message, created_at, resolved_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            alerts,
+        )
+        for event_created_at, device_id, event in events:
+            record_events(conn, [event], event_created_at, device_id=device_id)
+        conn.executemany(
+            """
+            UPDATE sensors SET last_state = ?, last_value = ?, last_update = ? WHERE id = ?;
+            """,
+            [
+                (entry.last_state, entry.last_value, entry.last_ts, entry.sensor_id)
+                for entry in series
+            ],
+        )
+    while True:
+        with db.writer() as conn:
+            if rollup_pending(conn, 20_000) < 20_000:
+                break
+    # Closing the last connection checkpoints the WAL into the database file.
+    db.close()
+    return Dataset(
+        name=name,
+        path=path,
+        readings=readings,
+        sensors=sensors,
+        days=days,
+        seed=seed,
+        format=_FORMAT,
+        clock=CLOCK,
+        item_ids=sorted(item_ids.values()),
+        sensor_ids=[entry.sensor_id for entry in series],
+        alerts=len(alerts),
+        events=len(events),
+        seconds=time.perf_counter() - started,
+    )
+
+
+def ensure_dataset(data_dir: str, name: str, sensors: int, days: int, seed: int) -> Dataset:
+    # Built datasets are kept in `data_dir` next to a JSON description and
+    # reused while the description matches the requested shape.
+    readings = DATASET_SIZES[name]
+    os.makedirs(data_dir, exist_ok=True)
+    stem = os.path.join(data_dir, f"{name}-{sensors}s-{days}d-{seed}")
+    path, meta_path = f"{stem}.db", f"{stem}.json"
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as handle:
+            cached = Dataset(**json.load(handle))
+        if cached.format == _FORMAT and cached.path == path:
+            return cached
+    dataset = build_dataset(path, readings, sensors, days, seed, name=name)
+    with open(meta_path, "w", encoding="utf-8") as handle:
+        json.dump(asdict(dataset), handle)
+    return dataset
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build seeded benchmark databases")
+    parser.add_argument("--sizes", default="10k,1m")
+    parser.add_argument("--sensors", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default=os.path.join("bench", "data"))
+    parser.add_argument("--max-memory-mb", type=int, default=4096)
+    args = parser.parse_args()
+    limit_memory(args.max_memory_mb)
+    print(f"{'dataset':>8} {'readings':>10} {'alerts':>7} {'seconds':>8}  path")
+    for name in args.sizes.split(","):
+        try:
+            dataset = ensure_dataset(args.data_dir, name, args.sensors, args.days, args.seed)
+        except MemoryError:
+            memory_exceeded(args.max_memory_mb)
+        print(
+            f"{name:>8} {dataset.readings:>10} {dataset.alerts:>7} "
+            f"{dataset.seconds:>8.1f}  {dataset.path}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from unittest import mock
+
+from app.db import load_events_since, prune_events, record_events
+from app.events import EventFilter
+from app.timestamps import MICROS_PER_SECOND, micros_to_iso
+
+from .seed import DATASET_SIZES, Dataset, ensure_dataset, limit_memory, memory_exceeded
+
+HISTORY_RANGES = ("1h", "1d", "7d", "30d")
+_RESULTS_VERSION = 1
+_PRUNE_EVENTS = 1000
+
+Summary = Dict[str, float]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _summary(samples: List[float]) -> Summary:
+    millis = [sample * 1000.0 for sample in samples]
+    return {
+        "ops": len(millis),
+        "mean_ms": statistics.mean(millis),
+        "p50_ms": _percentile(millis, 0.5),
+        "p95_ms": _percentile(millis, 0.95),
+        "min_ms": min(millis),
+    }
+
+
+def _measure(
+    run: Callable[[int], Any],
+    repeat: int,
+    setup: Optional[Callable[[int], Any]] = None,
+    warmup: int = 2,
+) -> Summary:
+    # `setup` runs before every call, outside the timed section.
+    samples = []
+    for index in range(-warmup, repeat):
+        if setup is not None:
+            setup(index)
+        started = time.perf_counter()
+        run(index)
+        elapsed = time.perf_counter() - started
+        if index >= 0:
+            samples.append(elapsed)
+    return _summary(samples)
+
+
+def _server_env(path: str) -> Dict[str, str]:
+    return {
+        "INVENTORY_DB_PATH": path,
+        "INVENTORY_ALLOW_UNAUTH": "true",
+        "INVENTORY_DEVICE_TOKENS": "",
+        "INVENTORY_UI_TOKEN": "",
+        "INVENTORY_EVENT_BUS": "local",
+        "INVENTORY_INGEST_MODE": "direct",
+        # Background maintenance would run against the real clock, not the
+        # dataset's, and compete with the measured requests.
+        "INVENTORY_READINGS_RETENTION_DAYS": "0",
+        "INVENTORY_EVENT_RETENTION_SECONDS": "0",
+        "INVENTORY_ROLLUP_INTERVAL_SECONDS": "86400",
+        "INVENTORY_EVENT_PRUNE_INTERVAL_SECONDS": "86400",
+    }
+
+
+class _IngestLoad:
+    # Batches for one device at a time, round robin. A duplicate re-sends one
+    # of the device's recent readings, as a hub does after a lost ack.
+    def __init__(self, conn: sqlite3.Connection, dataset: Dataset, seed: int) -> None:
+        self._rng = random.Random(seed)
+        self._devices: Dict[str, List[str]] = {}
+        for sensor_id in dataset.sensor_ids:
+            self._devices.setdefault(sensor_id.rsplit("-", 1)[0], []).append(sensor_id)
+        self._order = sorted(self._devices)
+        self._turn = 0
+        self._seq = 10**9
+        self._ts = dataset.clock
+        self._sent: Dict[str, Deque[Dict[str, Any]]] = {}
+        for device_id in self._order:
+            rows = conn.execute(
+                """
+                SELECT seq_id, sensor_id, ts, raw_value, normalized_value, state
+                FROM readings
+                WHERE device_id = ?
+                ORDER BY id DESC
+                LIMIT 200;
+                """,
+                (device_id,),
+            ).fetchall()
+            self._sent[device_id] = deque(
+                (self._reading(*row) for row in reversed(rows)), maxlen=500
+            )
+
+    @staticmethod
+    def _reading(
+        seq_id: int,
+        sensor_id: str,
+        ts: int,
+        raw_value: Optional[float],
+        value: Optional[float],
+        state: str,
+    ) -> Dict[str, Any]:
+        return {
+            "seq_id": seq_id,
+            "sensor_id": sensor_id,
+            "ts": micros_to_iso(ts),
+            "raw_value": raw_value,
+            "normalized_value": value,
+            "state": state,
+        }
+
+    def batch(self, size: int, duplicate_ratio: float) -> Dict[str, Any]:
+        device_id = self._order[self._turn % len(self._order)]
+        self._turn += 1
+        sent = self._sent[device_id]
+        readings = []
+        for _ in range(size):
+            if sent and self._rng.random() < duplicate_ratio:
+                readings.append(self._rng.choice(sent))
+                continue
+            self._seq += 1
+            self._ts += MICROS_PER_SECOND
+            value = round(self._rng.uniform(0.0, 1000.0), 2)
+            reading = self._reading(
+                self._seq,
+                self._rng.choice(self._devices[device_id]),
+                self._ts,
+                round(value * 4.2 + 812.0, 1),
+                value,
+                "ok",
+            )
+            readings.append(reading)
+        sent.extend(readings)
+        return {"device_id": device_id, "firmware": "1.4.2", "readings": readings}
+
+
+def _get(client: Any, url: str) -> Callable[[int], Any]:
+    def run(_: int) -> Any:
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url}: HTTP {response.status_code}")
+        return response
+
+    return run
+
+
+def _get_each(client: Any, template: str, ids: List[str]) -> Callable[[int], Any]:
+    def run(index: int) -> Any:
+        return _get(client, template.format(id=ids[index % len(ids)]))(index)
+
+    return run
+
+
+def _api_benchmarks(
+    client: Any, state: Any, dataset: Dataset, repeat: int, rng: random.Random
+) -> Dict[str, Summary]:
+    items = rng.sample(dataset.item_ids, len(dataset.item_ids))
+    results: Dict[str, Summary] = {}
+    # Listings are cached per version; bump so that every call renders.
+    results["list_items"] = _measure(
+        _get(client, "/api/v1/items"), repeat, setup=lambda _: state.listings.bump(("items",))
+    )
+    results["get_item"] = _measure(_get_each(client, "/api/v1/items/{id}", items), repeat)
+    for range_str in HISTORY_RANGES:
+        url = f"/api/v1/items/{{id}}/history?range={range_str}"
+        results[f"item_history_{range_str}"] = _measure(_get_each(client, url, items), repeat)
+        results[f"item_history_{range_str}_points"] = _measure(
+            _get_each(client, url + "&points=300", items), repeat
+        )
+    for status in ("active", "resolved"):
+        results[f"list_alerts_{status}"] = _measure(
+            _get(client, f"/api/v1/alerts?status={status}"),
+            repeat,
+            setup=lambda _: state.listings.bump(("alerts",)),
+        )
+    return results
+
+
+def _event_benchmarks(
+    state: Any, dataset: Dataset, repeat: int, rng: random.Random
+) -> Dict[str, Summary]:
+    db = state.db
+    config = state.config
+    with db.reader() as conn:
+        newest = conn.execute("SELECT MAX(id) FROM events;").fetchone()[0] or 0
+    sensors = rng.sample(dataset.sensor_ids, len(dataset.sensor_ids))
+
+    def replay(start: int, by_sensor: bool = False) -> Callable[[int], Any]:
+        def run(index: int) -> Any:
+            event_filter = None
+            if by_sensor:
+                event_filter = EventFilter(sensor_id=frozenset({sensors[index % len(sensors)]}))
+            with db.reader() as conn:
+                return load_events_since(conn, start, config.event_replay_limit, event_filter)
+
+        return run
+
+    def add_events(_: int) -> None:
+        drafts = [
+            {"type": "item_status_update", "sensor_id": sensor_id, "state": "ok"}
+            for sensor_id in rng.choices(dataset.sensor_ids, k=_PRUNE_EVENTS)
+        ]
+        with db.writer() as conn:
+            record_events(conn, drafts, dataset.clock)
+
+    def prune(_: int) -> None:
+        # The default retention, measured against the dataset's clock.
+        with db.writer() as conn:
+            prune_events(conn, 7 * 86400, config.event_max_rows, dataset.clock)
+
+    return {
+        "load_events_since_tail": _measure(replay(max(0, newest - 100)), repeat),
+        "load_events_since_backlog": _measure(
+            replay(max(0, newest - config.event_max_rows)), repeat
+        ),
+        "load_events_since_sensor": _measure(replay(0, by_sensor=True), repeat),
+        # Each run deletes the events added before it.
+        "prune_events": _measure(prune, repeat, setup=add_events),
+    }
+
+
+def _ingest_benchmarks(
+    client: Any,
+    load: _IngestLoad,
+    repeat: int,
+    batch_sizes: List[int],
+    duplicate_ratios: List[float],
+    ingest_readings: int,
+) -> Dict[str, Summary]:
+    results: Dict[str, Summary] = {}
+    for size in batch_sizes:
+        for ratio in duplicate_ratios:
+            pending: List[Dict[str, Any]] = []
+
+            def setup(_: int, size: int = size, ratio: float = ratio) -> None:
+                pending[:] = [load.batch(size, ratio)]
+
+            def run(_: int) -> Any:
+                response = client.post("/api/v1/readings/batch", json=pending[0])
+                if response.status_code != 200:
+                    raise RuntimeError(f"ingest: HTTP {response.status_code}")
+                return response
+
+            summary = _measure(run, max(repeat, ingest_readings // size), setup=setup)
+            summary["readings_per_second"] = size * 1000.0 / summary["mean_ms"]
+            results[f"ingest_b{size}_d{ratio:g}"] = summary
+    return results
+
+
+def run_dataset(
+    dataset: Dataset,
+    repeat: int,
+    batch_sizes: List[int],
+    duplicate_ratios: List[float],
+    ingest_readings: int,
+    seed: int,
+) -> Dict[str, Summary]:
+    # Runs against a copy, since ingest and pruning change the database.
+    work_dir = tempfile.mkdtemp(prefix="inventory-bench-")
+    path = os.path.join(work_dir, "inventory.db")
+    shutil.copyfile(dataset.path, path)
+    os.environ.update(_server_env(path))
+    # Imported late so the app picks up the environment above.
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    rng = random.Random(seed)
+    results: Dict[str, Summary] = {}
+    try:
+        # Pin the server's clock to the end of the dataset so history ranges
+        # cover the same readings whenever the dataset was built.
+        with mock.patch.object(main, "now_micros", lambda: dataset.clock):
+            with TestClient(main.app) as client:
+                state = main.app.state
+                results.update(_api_benchmarks(client, state, dataset, repeat, rng))
+                results.update(_event_benchmarks(state, dataset, repeat, rng))
+                with state.db.reader() as conn:
+                    load = _IngestLoad(conn, dataset, seed)
+                results.update(
+                    _ingest_benchmarks(
+                        client, load, repeat, batch_sizes, duplicate_ratios, ingest_readings
+                    )
+                )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {f"{dataset.name}/{name}": summary for name, summary in results.items()}
+
+
+def compare(
+    results: Dict[str, Summary],
+    baseline: Dict[str, Summary],
+    metric: str,
+    tolerance: float,
+) -> List[str]:
+    # Prints one line per benchmark and returns those slower than the
+    # baseline by more than `tolerance` (a fraction).
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, summary in results.items():
+        current = summary[metric]
+        previous = baseline.get(name, {}).get(metric)
+        if previous is None:
+            print(f"{name:<40} {'-':>10} {current:>10.3f} {'new':>8}")
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {previous:>10.3f} {current:>10.3f} {change:>+8.1%}{flag}")
+    for name in sorted(set(baseline) - set(results)):
+        print(f"{name:<40} {baseline[name].get(metric, 0.0):>10.3f} {'-':>10} {'missing':>8}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Server hot path benchmarks on seeded databases")
+    parser.add_argument("--sizes", default="10k,1m", help=f"of {', '.join(DATASET_SIZES)}")
+    parser.add_argument("--sensors", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default=os.path.join("bench", "data"))
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--batch-sizes", default="1,25,250")
+    parser.add_argument("--duplicate-ratios", default="0,0.5")
+    parser.add_argument("--ingest-readings", type=int, default=5000)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--metric", default="p50_ms")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--max-memory-mb", type=int, default=4096)
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="write the results to --baseline"
+    )
+    args = parser.parse_args()
+    limit_memory(args.max_memory_mb)
+
+    results: Dict[str, Summary] = {}
+    datasets: List[Tuple[str, Dict[str, Any]]] = []
+    for name in args.sizes.split(","):
+        try:
+            dataset = ensure_dataset(args.data_dir, name, args.sensors, args.days, args.seed)
+            shape = {
+                "readings": dataset.readings,
+                "sensors": dataset.sensors,
+                "days": dataset.days,
+            }
+            datasets.append((name, shape))
+            print(
+                f"{name}: {dataset.readings} readings, {len(dataset.item_ids)} items", flush=True
+            )
+            results.update(
+                run_dataset(
+                    dataset,
+                    args.repeat,
+                    [int(value) for value in args.batch_sizes.split(",")],
+                    [float(value) for value in args.duplicate_ratios.split(",")],
+                    args.ingest_readings,
+                    args.seed,
+                )
+            )
+        except MemoryError:
+            memory_exceeded(args.max_memory_mb)
+
+    report = {
+        "version": _RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "datasets": dict(datasets),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+    print(f"\n{'benchmark':<40} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    for name, summary in results.items():
+        print(
+            f"{name:<40} {summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f} "
+            f"{summary['mean_ms']:>9.3f}"
+        )
+
+    if not args.baseline:
+        return
+    if args.update_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; record one with --update-baseline")
+        return
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)["results"]
+    regressions = compare(results, baseline, args.metric, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) over {args.tolerance:.0%} slower than baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.cache import MetadataCache  # noqa: E402
+from app.config import load_config  # noqa: E402
+from app.db import ConnectionPool, init_db  # noqa: E402
+from app.event_bus import EventTailer  # noqa: E402
+from app.events import EventBroadcaster  # noqa: E402
+from app.ingest import ingest_batch  # noqa: E402
+from app.listings import ListingCache  # noqa: E402
+from app.maintenance import EventPruner  # noqa: E402
+from app.models import ReadingsBatchIn  # noqa: E402
+from app.sync import current_sync_version  # noqa: E402
+
+_START = 1_767_225_600_000_000
+
+
+def _batch(seq_id: int, value: float) -> ReadingsBatchIn:
+    return ReadingsBatchIn(
+        device_id="d1",
+        readings=[
+            {
+                "seq_id": seq_id,
+                "sensor_id": "s1",
+                "ts": "2026-01-01T00:00:%02dZ" % seq_id,
+                "normalized_value": value,
+                "state": "ok",
+            }
+        ],
+    )
+
+
+# Two caches on one database stand in for two server workers.
+class TestWorkerCoherence(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self.config = replace(
+            load_config(), db_path=os.path.join(self._dir.name, "inventory.db")
+        )
+        init_db(self.config)
+        self.db = ConnectionPool(self.config)
+        with self.db.writer() as conn:
+            conn.execute("INSERT INTO devices (id) VALUES ('d1');")
+            conn.execute("INSERT INTO sensors (id, device_id) VALUES ('s1', 'd1');")
+            conn.execute(
+                """
+                INSERT INTO items (id, sensor_id, name, thresholds)
+                VALUES ('i1', 's1', 'Rice', '{"low": 100, "ok": 150}');
+                """
+            )
+        self.cache = MetadataCache()
+        self.listings = ListingCache()
+        self.tailer = EventTailer(
+            self.db,
+            EventBroadcaster(),
+            self.cache,
+            EventPruner(self.db, self.config),
+            self.listings,
+            None,
+        )
+        with self.db.reader() as conn:
+            self.tailer.start_after(0, current_sync_version(conn))
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self._dir.cleanup()
+
+    def test_item_edits_from_another_worker_drop_cached_items(self) -> None:
+        with self.db.reader() as conn:
+            self.assertEqual([item.name for item in self.cache.all_items(conn)], ["Rice"])
+        version = self.listings.version("items")
+        with self.db.writer() as conn:
+            conn.execute("UPDATE items SET name = 'Basmati' WHERE id = 'i1';")
+        self.tailer._poll()
+        with self.db.reader() as conn:
+            self.assertEqual([item.name for item in self.cache.all_items(conn)], ["Basmati"])
+        self.assertGreater(self.listings.version("items"), version)
+
+    def test_ingest_resolves_against_the_stored_state(self) -> None:
+        other = MetadataCache()
+        with self.db.writer() as conn:
+            result = ingest_batch(conn, _batch(1, 90.0), _START, self.cache)
+        self.cache.store_sensors(result.sensors)
+        # The other worker takes the next batch and moves the sensor to "ok".
+        with self.db.writer() as conn:
+            result = ingest_batch(conn, _batch(2, 200.0), _START, other)
+        other.store_sensors(result.sensors)
+        # Back on the first worker, whose cache still says "low": 120 sits in
+        # the hysteresis band and must stay "ok".
+        with self.db.writer() as conn:
+            result = ingest_batch(conn, _batch(3, 120.0), _START, self.cache)
+        self.assertEqual(result.rows[0][6], "ok")
+        self.assertEqual([event.type for event in result.events], ["item_status_update"])
+
+
+if __name__ == "__main__":
+    unittest.main()
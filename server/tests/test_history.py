@@ -0,0 +1,265 @@
+import os
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest import mock
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.config import load_config  # noqa: E402
+from app.db import ConnectionPool, init_db  # noqa: E402
+from app.history import (  # noqa: E402
+    _columns,
+    _downsample_raw,
+    choose_resolution,
+    downsample,
+    fit_resolution,
+    history_columns,
+    load_histories,
+    load_history_columns,
+    load_rollup_histories,
+    lttb,
+)
+from app.rollup import ROLLUP_TIERS, rollup_pending  # noqa: E402
+from app.timestamps import MICROS_PER_SECOND  # noqa: E402
+
+
+def _xy(rows: list, threshold: int) -> list:
+    return lttb(rows, threshold, x=lambda row: row[0], y=lambda row: row[1])
+
+
+class TestLttb(unittest.TestCase):
+    def test_short_series_is_returned_whole(self) -> None:
+        rows = [(index, float(index)) for index in range(5)]
+        self.assertEqual(_xy(rows, 5), rows)
+        self.assertEqual(_xy(rows, 50), rows)
+        self.assertEqual(_xy(rows[:2], 1), rows[:2])
+
+    def test_keeps_endpoints_and_order(self) -> None:
+        rows = [(index, float((index * 37) % 11)) for index in range(1000)]
+        sampled = _xy(rows, 40)
+        self.assertEqual(len(sampled), 40)
+        self.assertEqual(sampled[0], rows[0])
+        self.assertEqual(sampled[-1], rows[-1])
+        xs = [row[0] for row in sampled]
+        self.assertEqual(xs, sorted(set(xs)))
+
+    def test_picks_peaks(self) -> None:
+        rows = [(index, 0.0) for index in range(300)]
+        for peak in (40, 150, 260):
+            rows[peak] = (peak, 100.0)
+        sampled = _xy(rows, 10)
+        self.assertLessEqual({40, 150, 260}, {row[0] for row in sampled})
+
+    def test_tiny_thresholds(self) -> None:
+        rows = [(index, float(index)) for index in range(10)]
+        self.assertEqual(_xy(rows, 2), [rows[0], rows[-1]])
+        self.assertEqual(_xy(rows, 1), [rows[0]])
+        self.assertEqual(_xy(rows, 0), [])
+
+
+class TestChooseResolution(unittest.TestCase):
+    def test_short_spans_use_lttb(self) -> None:
+        self.assertEqual(choose_resolution(3600, 100), "lttb")
+        self.assertEqual(choose_resolution(100 * 60, 100), "lttb")
+
+    def test_finest_tier_that_fits(self) -> None:
+        sizes = dict(ROLLUP_TIERS)
+        self.assertEqual(choose_resolution(100 * 60 + 1, 100), "hour")
+        self.assertEqual(choose_resolution(100 * sizes["hour"], 100), "hour")
+        self.assertEqual(choose_resolution(100 * sizes["hour"] + 1, 100), "day")
+        self.assertEqual(choose_resolution(10_000 * sizes["day"], 100), "day")
+
+    def test_explicit_lttb_is_rerouted_for_long_spans(self) -> None:
+        self.assertEqual(fit_resolution("lttb", 3600, 100), "lttb")
+        self.assertEqual(fit_resolution("lttb", 30 * 86400, 100), "day")
+        self.assertEqual(fit_resolution("lttb", 30 * 86400, 1000), "hour")
+        self.assertEqual(fit_resolution("minute", 30 * 86400, 100), "minute")
+
+
+class TestLttbRowLimit(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        config = replace(load_config(), db_path=os.path.join(self._dir.name, "inventory.db"))
+        init_db(config)
+        self.db = ConnectionPool(config)
+        start = 1_767_225_600 * MICROS_PER_SECOND
+        with self.db.writer() as conn:
+            conn.execute("INSERT INTO devices (id) VALUES ('d1');")
+            conn.executemany(
+                "INSERT INTO sensors (id, device_id) VALUES (?, 'd1');", [("s1",), ("s2",)]
+            )
+            conn.executemany(
+                """
+                INSERT INTO readings
+                (device_id, seq_id, sensor_id, ts, normalized_value, state, created_at)
+                VALUES ('d1', ?, ?, ?, ?, 'ok', ?);
+                """,
+                [
+                    (index, sensor_id, start + index * MICROS_PER_SECOND, float(index), start)
+                    for sensor_id in ("s1", "s2")
+                    for index in range(30)
+                ],
+            )
+        self.since = start
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self._dir.cleanup()
+
+    def test_within_limit_serves_lttb(self) -> None:
+        with mock.patch("app.history.LTTB_MAX_ROWS", 60), self.db.reader() as conn:
+            resolution, histories = load_histories(conn, ["s1", "s2"], "lttb", self.since, 10)
+        self.assertEqual(resolution, "lttb")
+        self.assertEqual([len(rows) for rows in histories.values()], [10, 10])
+
+    def test_limit_is_shared_and_falls_back_to_minutes(self) -> None:
+        with mock.patch("app.history.LTTB_MAX_ROWS", 59), self.db.reader() as conn:
+            resolution, histories = load_histories(conn, ["s1", "s2"], "lttb", self.since, 10)
+            single = load_history_columns(conn, "s1", "lttb", self.since, 10)
+        self.assertEqual(resolution, "minute")
+        self.assertEqual([rows[0]["count"] for rows in histories.values()], [30, 30])
+        self.assertEqual(single[0], "lttb")
+
+
+class TestRollupPending(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        config = replace(load_config(), db_path=os.path.join(self._dir.name, "inventory.db"))
+        init_db(config)
+        self.db = ConnectionPool(config)
+        self.start = 1_767_225_600 * MICROS_PER_SECOND
+        self.sensor_ids = [f"s{index}" for index in range(600)]
+        with self.db.writer() as conn:
+            conn.execute("INSERT INTO devices (id) VALUES ('d1');")
+            conn.executemany(
+                "INSERT INTO sensors (id, device_id) VALUES (?, 'd1');",
+                [(sensor_id,) for sensor_id in self.sensor_ids],
+            )
+            self._insert(conn, [(1, 0, 1.0), (2, 3600, 2.0)])
+            rollup_pending(conn, 1000)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self._dir.cleanup()
+
+    def _insert(self, conn, readings: list) -> None:
+        conn.executemany(
+            """
+            INSERT INTO readings
+            (device_id, seq_id, sensor_id, ts, normalized_value, state, created_at)
+            VALUES ('d1', ?, 's0', ?, ?, 'ok', ?);
+            """,
+            [
+                (seq_id, self.start + seconds * MICROS_PER_SECOND, value, self.start)
+                for seq_id, seconds, value in readings
+            ],
+        )
+
+    def test_late_readings_for_older_buckets_are_included(self) -> None:
+        with self.db.writer() as conn:
+            # Backfilled into the first hour after both hours were rolled up.
+            self._insert(conn, [(3, 60, 5.0)])
+        with self.db.reader() as conn:
+            histories = load_rollup_histories(conn, self.sensor_ids, "hour", self.start)
+        rows = histories["s0"]
+        self.assertEqual([row["count"] for row in rows], [2, 1])
+        self.assertEqual(rows[0]["max_value"], 5.0)
+        self.assertEqual(rows[0]["last_value"], 5.0)
+        self.assertEqual(len(histories), 600)
+
+
+class TestColumns(unittest.TestCase):
+    def test_states_are_indexes_in_first_seen_order(self) -> None:
+        names = ("ts", "normalized_value", "state")
+        result = _columns(names, [[1, 2, 3, 4], [1.0, None, 3.0, 4.0], ["ok", "low", None, "ok"]])
+        self.assertEqual(result["length"], 4)
+        self.assertEqual(result["states"], ["ok", "low", None])
+        self.assertEqual(
+            result["columns"],
+            {"ts": [1, 2, 3, 4], "normalized_value": [1.0, None, 3.0, 4.0], "state": [0, 1, 2, 0]},
+        )
+
+    def test_empty_series_keeps_every_column(self) -> None:
+        result = _columns(("seq_id", "ts", "state"), [])
+        self.assertEqual(
+            result,
+            {"length": 0, "columns": {"seq_id": [], "ts": [], "state": []}, "states": []},
+        )
+
+    def test_history_columns_matches_row_format(self) -> None:
+        rows = [
+            {
+                "ts": 10,
+                "normalized_value": 2.5,
+                "min_value": 1.0,
+                "max_value": 4.0,
+                "last_value": 4.0,
+                "count": 3,
+                "state": "ok",
+            },
+            {
+                "ts": 20,
+                "normalized_value": None,
+                "min_value": None,
+                "max_value": None,
+                "last_value": None,
+                "count": 1,
+                "state": "low",
+            },
+        ]
+        result = history_columns(rows, "hour")
+        columns = result["columns"]
+        self.assertEqual(result["length"], 2)
+        rebuilt = [
+            {name: values[index] for name, values in columns.items()} for index in range(2)
+        ]
+        for row in rebuilt:
+            row["state"] = result["states"][row["state"]]
+        self.assertEqual(rebuilt, rows)
+
+
+def _presence_rows(count: int) -> list:
+    # (seq_id, ts, raw_value, normalized_value, state) as stored for a
+    # digital sensor: states only.
+    return [
+        (index, index * 1_000_000, 1.0, None, "present" if index % 7 < 4 else "out")
+        for index in range(count)
+    ]
+
+
+class TestDownsampleWithoutValues(unittest.TestCase):
+    def test_raw_presence_series_keeps_rows(self) -> None:
+        rows = _presence_rows(1000)
+        sampled = _downsample_raw(rows, 50)
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual(sampled[0], rows[0])
+        self.assertEqual(sampled[-1], rows[-1])
+        self.assertEqual({row[4] for row in sampled}, {"present", "out"})
+        timestamps = [row[1] for row in sampled]
+        self.assertEqual(timestamps, sorted(set(timestamps)))
+
+    def test_rollup_buckets_without_values_keep_rows(self) -> None:
+        rows = [
+            {"ts": row[1], "normalized_value": None, "state": row[4]}
+            for row in _presence_rows(300)
+        ]
+        sampled = downsample(rows, 20)
+        self.assertEqual(len(sampled), 20)
+        self.assertIs(sampled[0], rows[0])
+        self.assertIs(sampled[-1], rows[-1])
+
+    def test_valued_series_still_uses_lttb(self) -> None:
+        rows = [(index, index, 0.0, float(index % 10 == 5) * 100, "ok") for index in range(100)]
+        sampled = _downsample_raw(rows, 12)
+        self.assertEqual(len(sampled), 12)
+        # Stride sampling would land on spikes only by chance.
+        self.assertGreaterEqual(sum(row[3] == 100 for row in sampled), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
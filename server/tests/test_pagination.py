@@ -0,0 +1,65 @@
+import base64
+import sys
+import unittest
+from pathlib import Path
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.pagination import (  # noqa: E402
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    split_page,
+)
+
+
+class TestCursorCodec(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        for key, types in [
+            ((1_767_225_600_000_000, 42), (int, int)),
+            (("hub-001", "hub-001-s3"), (str, str)),
+            (("2026-01-01T00:00:00+00:00", 7), (str, int)),
+        ]:
+            cursor = encode_cursor(*key)
+            self.assertNotIn("=", cursor)
+            self.assertEqual(decode_cursor(cursor, types), key)
+
+    def test_rejects_malformed_cursors(self) -> None:
+        def encoded(text: str) -> str:
+            return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+        for cursor in [
+            "",
+            "not base64!",
+            encoded("not json"),
+            encoded('{"ts": 1}'),
+            encoded("[1]"),
+            encoded("[1, 2, 3]"),
+            encoded('[1, "2"]'),
+            encoded("[1.5, 2]"),
+            encoded("[true, 2]"),
+        ]:
+            with self.assertRaises(InvalidCursorError, msg=cursor):
+                decode_cursor(cursor, (int, int))
+
+    def test_error_is_a_value_error(self) -> None:
+        self.assertTrue(issubclass(InvalidCursorError, ValueError))
+
+
+class TestSplitPage(unittest.TestCase):
+    def test_last_page_has_no_cursor(self) -> None:
+        rows = [(1, "a"), (2, "b")]
+        self.assertEqual(split_page(rows, 2, lambda row: row), (rows, None))
+        self.assertEqual(split_page([], 2, lambda row: row), ([], None))
+
+    def test_extra_row_yields_cursor_of_last_kept_row(self) -> None:
+        rows = [(1, "a"), (2, "b"), (3, "c")]
+        page, cursor = split_page(rows, 2, lambda row: (row[0], row[1]))
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(decode_cursor(cursor, (int, str)), (2, "b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import sys
+import unittest
+from pathlib import Path
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.history import load_raw_history_page  # noqa: E402
+from app.recent import RecentReadings, _Ring  # noqa: E402
+
+
+def _row(seq_id: int, ts: int, value=1.0) -> tuple:
+    return (seq_id, ts, 2.0, value, "ok")
+
+
+def _ingest(sensor_id: str, seq_id: int, ts: int) -> tuple:
+    # Row layout passed to RecentReadings.record by ingest.
+    return ("d1", seq_id, sensor_id, ts, 2.0, 1.0, "ok", ts)
+
+
+class TestRing(unittest.TestCase):
+    def test_wraps_and_raises_floor(self) -> None:
+        ring = _Ring(3, None)
+        for index in range(5):
+            ring.append(_row(index, index * 10))
+        self.assertEqual(len(ring), 3)
+        self.assertEqual([row[1] for row in ring.rows()], [20, 30, 40])
+        self.assertEqual(ring.floor, 10)
+        self.assertEqual(ring.newest(), _row(4, 40))
+        self.assertFalse(ring.covers(10))
+        self.assertTrue(ring.covers(11))
+
+    def test_rows_since_is_inclusive(self) -> None:
+        ring = _Ring(4, None)
+        for index in range(6):
+            ring.append(_row(index, index * 10))
+        self.assertEqual([row[1] for row in ring.rows(30)], [30, 40, 50])
+        self.assertEqual(ring.rows(60), [])
+
+    def test_missing_values_round_trip(self) -> None:
+        ring = _Ring(2, None)
+        ring.append((1, 10, None, None, "present"))
+        self.assertEqual(ring.rows(), [(1, 10, None, None, "present")])
+
+    def test_holds_checks_readings_sharing_the_newest_ts(self) -> None:
+        ring = _Ring(4, None)
+        for seq_id, ts in [(1, 10), (2, 20), (3, 20)]:
+            ring.append(_row(seq_id, ts))
+        self.assertTrue(ring.holds(2, 20))
+        self.assertFalse(ring.holds(4, 20))
+        self.assertFalse(ring.holds(1, 10))
+
+
+class TestRecentReadings(unittest.TestCase):
+    def test_fill_keeps_newest_rows(self) -> None:
+        recent = RecentReadings(2)
+        recent.fill("s1", [_row(index, index * 10) for index in range(5)], None, 0)
+        found = recent.readings_since(["s1", "s2"], 35)
+        self.assertEqual(list(found), ["s1"])
+        self.assertEqual([row[1] for row in found["s1"]], [40])
+        # Readings at or before ts 20 were dropped, so the ring cannot answer.
+        self.assertEqual(recent.readings_since(["s1"], 20), {})
+
+    def test_fill_is_discarded_after_a_newer_write(self) -> None:
+        recent = RecentReadings(4)
+        generation = recent.generation()
+        recent.record([_ingest("s1", 1, 10)])
+        recent.fill("s1", [], None, generation)
+        self.assertEqual(recent.readings_since(["s1"], 0), {})
+
+    def test_record_extends_ring(self) -> None:
+        recent = RecentReadings(3)
+        recent.fill("s1", [_row(1, 10)], None, recent.generation())
+        recent.record([_ingest("s1", 3, 30), _ingest("s1", 2, 20), _ingest("s2", 1, 5)])
+        self.assertEqual([row[0] for row in recent.readings_since(["s1"], 0)["s1"]], [1, 2, 3])
+        # Duplicates of the newest reading are ignored.
+        recent.record([_ingest("s1", 3, 30)])
+        self.assertEqual(len(recent.readings_since(["s1"], 0)["s1"]), 3)
+        self.assertEqual(recent.stats()["dropped"], 0)
+
+    def test_late_reading_drops_ring(self) -> None:
+        recent = RecentReadings(4)
+        recent.fill("s1", [_row(1, 10), _row(2, 30)], None, recent.generation())
+        recent.record([_ingest("s1", 3, 20)])
+        self.assertEqual(recent.readings_since(["s1"], 0), {})
+        self.assertEqual(recent.stats()["dropped"], 1)
+
+    def test_trim_and_invalidate(self) -> None:
+        recent = RecentReadings(4)
+        recent.fill("s1", [_row(index, index * 10) for index in range(4)], None, 0)
+        recent.trim(15)
+        self.assertEqual([row[1] for row in recent.readings_since(["s1"], 0)["s1"]], [20, 30])
+        recent.invalidate(["s1"])
+        self.assertEqual(recent.readings_since(["s1"], 0), {})
+
+    def test_first_raw_page_is_served_from_memory(self) -> None:
+        recent = RecentReadings(4)
+        recent.fill("s1", [_row(index, index * 10) for index in range(3)], None, 0)
+        # No connection is needed when the held readings answer the page.
+        readings, cursor = load_raw_history_page(None, "s1", 10, 5, None, recent)
+        self.assertEqual([reading["seq_id"] for reading in readings], [1, 2])
+        self.assertIsNone(cursor)
+
+
+if __name__ == "__main__":
+    unittest.main()
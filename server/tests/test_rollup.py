@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.config import load_config  # noqa: E402
+from app.db import ConnectionPool, init_db  # noqa: E402
+from app.rollup import (  # noqa: E402
+    ROLLUP_TIERS,
+    _aggregate,
+    bucket_start,
+    delete_expired_readings,
+    rollup_pending,
+    state_totals,
+)
+from app.timestamps import MICROS_PER_SECOND  # noqa: E402
+
+HOUR = 3600 * MICROS_PER_SECOND
+
+
+def _reading(ts: int, state: str) -> dict:
+    return {"sensor_id": "s1", "ts": ts, "normalized_value": 1.0, "state": state}
+
+
+class TestRollupDurations(unittest.TestCase):
+    def test_long_interval_is_totalled_across_gaps(self) -> None:
+        start = 1_767_225_600 * MICROS_PER_SECOND + 17 * 60 * MICROS_PER_SECOND
+        end = start + 3 * HOUR + 5 * 60 * MICROS_PER_SECOND
+        tiers = _aggregate([_reading(start, "low"), _reading(end, "ok")], {})
+        for name, size in ROLLUP_TIERS:
+            buckets = sorted((start, bucket) for (_, start), bucket in tiers[name].items())
+            totals = state_totals(buckets, size)
+            self.assertAlmostEqual(totals["low"], (end - start) / MICROS_PER_SECOND, msg=name)
+        hours = tiers["hour"]
+        first = bucket_start(start, 3600)
+        self.assertEqual(sorted(hours), [("s1", first), ("s1", first + 3 * HOUR)])
+
+    def test_silent_sensor_writes_no_empty_buckets(self) -> None:
+        start = 1_767_225_600 * MICROS_PER_SECOND
+        end = start + 30 * 24 * HOUR
+        tiers = _aggregate([_reading(start, "low"), _reading(end, "ok")], {})
+        self.assertEqual([len(tiers[name]) for name, _ in ROLLUP_TIERS], [2, 2, 2])
+        days = sorted((key[1], bucket) for key, bucket in tiers["day"].items())
+        totals = state_totals(days, 86400)
+        self.assertAlmostEqual(totals["low"], 30 * 86400)
+
+    def test_interval_resumes_from_cursor(self) -> None:
+        start = 1_767_225_600 * MICROS_PER_SECOND
+        end = start + 2 * HOUR
+        tiers = _aggregate([_reading(end, "ok")], {"s1": (start, "out")})
+        minutes = sorted((key[1], bucket) for key, bucket in tiers["minute"].items())
+        self.assertEqual(len(minutes), 2)
+        # The cursor's bucket is stored already; only the reading's bucket is new.
+        self.assertAlmostEqual(minutes[0][1].state_durations["out"], 60.0)
+
+
+class TestRetention(unittest.TestCase):
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        config = replace(load_config(), db_path=os.path.join(self._dir.name, "inventory.db"))
+        init_db(config)
+        self.db = ConnectionPool(config)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self._dir.cleanup()
+
+    def test_expired_rows_behind_a_recent_low_id_are_deleted(self) -> None:
+        now = 1_767_225_600 * MICROS_PER_SECOND
+        day = 86400 * MICROS_PER_SECOND
+        # The lowest ids are recent (e.g. a device with a wrong clock), the
+        # expired readings come after them.
+        timestamps = [now] * 5 + [now - 100 * day + index for index in range(20)]
+        with self.db.writer() as conn:
+            conn.execute("INSERT INTO devices (id) VALUES ('d1');")
+            conn.execute("INSERT INTO sensors (id, device_id) VALUES ('s1', 'd1');")
+            conn.executemany(
+                """
+                INSERT INTO readings
+                (device_id, seq_id, sensor_id, ts, normalized_value, state, created_at)
+                VALUES ('d1', ?, 's1', ?, 1.0, 'ok', ?);
+                """,
+                [(index, ts, now) for index, ts in enumerate(timestamps)],
+            )
+            rollup_pending(conn, 100)
+        deleted = []
+        with self.db.writer() as conn:
+            while True:
+                removed = delete_expired_readings(conn, now - 90 * day, 5)
+                if not removed:
+                    break
+                deleted.append(removed)
+            remaining = conn.execute("SELECT COUNT(*) FROM readings;").fetchone()[0]
+        self.assertEqual(deleted, [5, 5, 5, 5])
+        self.assertEqual(remaining, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
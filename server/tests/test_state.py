@@ -0,0 +1,74 @@
+import random
+import sys
+import unittest
+from pathlib import Path
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.state import replay_states, resolve_state  # noqa: E402
+
+
+def _one_by_one(values, states, thresholds, last_state):
+    replayed = []
+    for value, state in zip(values, states):
+        last_state = resolve_state(value, state, last_state, thresholds, None)
+        replayed.append(last_state)
+    return replayed
+
+
+class TestReplayStates(unittest.TestCase):
+    def test_hysteresis(self) -> None:
+        thresholds = {"low": 100.0, "ok": 150.0}
+        values = [200.0, 120.0, 90.0, 120.0, 149.9, 150.0, 120.0]
+        self.assertEqual(
+            replay_states(values, ["ok"] * len(values), thresholds, None),
+            ["ok", "ok", "low", "low", "low", "ok", "ok"],
+        )
+
+    def test_seed_state_carries_into_the_band(self) -> None:
+        thresholds = {"low": 100.0, "ok": 150.0}
+        self.assertEqual(replay_states([120.0], ["ok"], thresholds, "low"), ["low"])
+        self.assertEqual(replay_states([120.0], ["ok"], thresholds, "ok"), ["ok"])
+        self.assertEqual(replay_states([120.0], ["ok"], thresholds, None), ["low"])
+
+    def test_readings_without_values_set_the_state(self) -> None:
+        thresholds = {"low": 100.0, "ok": 150.0}
+        self.assertEqual(
+            replay_states([90.0, None, 120.0], ["ok", "out", "ok"], thresholds, None),
+            ["low", "out", "out"],
+        )
+
+    def test_matches_resolve_state(self) -> None:
+        # Callers only replay sensors that have thresholds.
+        rng = random.Random(7)
+        for thresholds in [
+            {"low": 100.0, "ok": 150.0},
+            {"low": 150.0, "ok": 100.0},
+            {"low": 100.0},
+        ]:
+            for seed in (None, "ok", "low", "out"):
+                values = [
+                    None if rng.random() < 0.1 else rng.uniform(50.0, 200.0)
+                    for _ in range(500)
+                ]
+                states = [rng.choice(["ok", "out", "present"]) for _ in values]
+                self.assertEqual(
+                    replay_states(values, states, thresholds, seed),
+                    _one_by_one(values, states, thresholds, seed),
+                    msg=f"{thresholds} {seed}",
+                )
+
+    def test_run_can_be_continued(self) -> None:
+        thresholds = {"low": 100.0, "ok": 150.0}
+        values = [160.0, 90.0, 120.0, 130.0, 155.0, 110.0]
+        states = ["ok"] * len(values)
+        whole = replay_states(values, states, thresholds, None)
+        first = replay_states(values[:3], states[:3], thresholds, None)
+        rest = replay_states(values[3:], states[3:], thresholds, first[-1])
+        self.assertEqual(first + rest, whole)
+
+
+if __name__ == "__main__":
+    unittest.main()
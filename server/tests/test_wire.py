@@ -0,0 +1,123 @@
+import json
+import struct
+import sys
+import unittest
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+SERVER_ROOT = Path(__file__).resolve().parents[1]
+if str(SERVER_ROOT) not in sys.path:
+    sys.path.insert(0, str(SERVER_ROOT))
+
+from app.wire import (  # noqa: E402
+    PackedBatchError,
+    PackedReading,
+    decode_packed_batch,
+    packed_device_id,
+)
+
+
+def _string(value: Optional[str]) -> bytes:
+    if value is None:
+        return struct.pack("<H", 0xFFFF)
+    encoded = value.encode("utf-8")
+    return struct.pack("<H", len(encoded)) + encoded
+
+
+def _strings(values: List[str]) -> bytes:
+    return struct.pack("<H", len(values)) + b"".join(_string(value) for value in values)
+
+
+def _column(typecode: str, values: list) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return typecode.encode("ascii") + packed.tobytes()
+
+
+def _header(count: int, sensors: List[str], states: List[str], meta=None) -> bytes:
+    return b"".join(
+        [
+            b"SIB1",
+            _string("pi-kitchen-01"),
+            _string("0.1.0"),
+            _string(None),
+            _string(json.dumps(meta) if meta is not None else None),
+            struct.pack("<I", count),
+            _strings(sensors),
+            _strings(states),
+        ]
+    )
+
+
+def _batch(normalized: bytes = b"") -> bytes:
+    # Three readings of two sensors; the last one has no raw value.
+    return b"".join(
+        [
+            _header(3, ["s1", "s2"], ["ok", "low"]),
+            struct.pack("<qq", 1000, 1_767_225_600_000_000),
+            _column("b", [1, 1]),
+            _column("i", [1_000_000, 2_500_000]),
+            _column("b", [0, 1, 0]),
+            _column("b", [0, 1, 1]),
+            b"D" + bytes([0b011]) + _column("d", [812.5, 813.0])[1:],
+            normalized or _column("f", [180.25, 90.5, 91.0]),
+        ]
+    )
+
+
+class TestDecodePackedBatch(unittest.TestCase):
+    def test_decodes_readings(self) -> None:
+        batch = decode_packed_batch(_batch())
+        self.assertEqual(batch.device_id, "pi-kitchen-01")
+        self.assertEqual(batch.firmware, "0.1.0")
+        self.assertIsNone(batch.sent_at)
+        self.assertIsNone(batch.sensor_meta)
+        self.assertEqual(
+            batch.readings,
+            [
+                PackedReading(1000, "s1", 1_767_225_600_000_000, 812.5, 180.25, "ok"),
+                PackedReading(1001, "s2", 1_767_225_601_000_000, 813.0, 90.5, "low"),
+                PackedReading(1002, "s1", 1_767_225_603_500_000, None, 91.0, "low"),
+            ],
+        )
+
+    def test_all_null_column_and_sensor_meta(self) -> None:
+        batch = decode_packed_batch(_batch(normalized=b"n"))
+        self.assertEqual([reading.normalized_value for reading in batch.readings], [None] * 3)
+        meta = [{"sensor_id": "s1", "thresholds": {"low": 150, "ok": 200}}]
+        empty = decode_packed_batch(_header(0, [], [], meta))
+        self.assertEqual(empty.readings, [])
+        self.assertEqual(empty.sensor_meta[0].sensor_id, "s1")
+
+    def test_rejects_malformed_batches(self) -> None:
+        valid = _batch()
+        first = struct.pack("<qq", 1000, 1_767_225_600_000_000)
+        for data, message in [
+            (b"", "Truncated"),
+            (b"SIB2" + valid[4:], "version"),
+            (valid[:-1], "Truncated"),
+            (valid + b"\x00", "Trailing"),
+            (b"SIB1" + _string(None) + valid[4 + len(_string("pi-kitchen-01")) :], "device_id"),
+            (valid.replace(_column("b", [0, 1, 0]), _column("b", [0, 2, 0]), 1), "index"),
+            (valid.replace(first, struct.pack("<qq", -5, 0), 1), "seq_id"),
+            (valid.replace(first, struct.pack("<qq", 1000, 2**62), 1), "ts out of range"),
+            (valid.replace(first, struct.pack("<qq", 1000, -(2**62)), 1), "ts out of range"),
+            (valid.replace(_column("b", [1, 1]), b"x\x01\x01", 1), "column type"),
+            (_header(1 << 30, [], []), "count"),
+        ]:
+            with self.assertRaisesRegex(PackedBatchError, message):
+                decode_packed_batch(data)
+
+    def test_device_id_is_read_from_the_header(self) -> None:
+        self.assertEqual(packed_device_id(_batch()[:40]), "pi-kitchen-01")
+        with self.assertRaisesRegex(PackedBatchError, "version"):
+            packed_device_id(b"SIB2" + _batch()[4:])
+
+    def test_error_is_a_value_error(self) -> None:
+        self.assertTrue(issubclass(PackedBatchError, ValueError))
+
+
+if __name__ == "__main__":
+    unittest.main()
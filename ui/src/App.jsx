@@ -165,7 +165,7 @@ const App = () => {
         return;
       }
       refreshAll(true);
-      if (payload.type === "item_status_update") {
+      if (payload.type === "item_status_update" || payload.type === "resync") {
         if (!payload.item_id || payload.item_id === selectedItemId) {
           refreshItem();
         }